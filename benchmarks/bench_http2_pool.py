@@ -0,0 +1,175 @@
+"""Пропускная способность общего пула соединений к WB: HTTP/1.1 против HTTP/2.
+
+Запуск: ``python benchmarks/bench_http2_pool.py --users 500 --polls 5 --latency-ms 30``.
+Локальный сервер-заглушка отвечает с задержкой ``latency-ms`` (как кабинет WB)
+и говорит HTTP/1.1 либо HTTP/2 без TLS (h2c, prior knowledge). Каждый
+«пользователь» — отдельный ``WBHttpClient`` поверх общего транспорта, как в
+``WBClientRegistry``; все пользователи одновременно опрашивают ``GET /``.
+Лимиты пула берутся из настроек (``WB_MAX_CONNECTIONS``, ``WB_MAX_KEEPALIVE``).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import h2.config
+import h2.connection
+import h2.events
+import httpx
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+os.environ.setdefault("BOT_TOKEN", "benchmark")
+# лимитер и breaker мешают мерить сам транспорт
+os.environ.setdefault("WB_RATE_GLOBAL", "1000000")
+os.environ.setdefault("WB_RATE_GLOBAL_BURST", "1000000")
+os.environ.setdefault("WB_RATE_ACCOUNT", "1000000")
+os.environ.setdefault("WB_RATE_ACCOUNT_BURST", "1000000")
+
+from bot_wb.services.client_registry import SharedTransport  # noqa: E402
+from bot_wb.services.transport import wb_limits  # noqa: E402
+from bot_wb.services.wb_http_client import WBHttpClient  # noqa: E402
+from bot_wb.storage.session import CookieStorage  # noqa: E402
+
+BODY = b"<!DOCTYPE html><html><title>WB Seller</title></html>"
+
+
+class _H2Server(asyncio.Protocol):
+    def __init__(self, latency: float) -> None:
+        self._latency = latency
+        self._conn = h2.connection.H2Connection(
+            h2.config.H2Configuration(client_side=False, header_encoding="utf-8"),
+        )
+        self._transport: asyncio.Transport | None = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        assert isinstance(transport, asyncio.Transport)
+        self._transport = transport
+        self._conn.initiate_connection()
+        transport.write(self._conn.data_to_send())
+
+    def data_received(self, data: bytes) -> None:
+        for event in self._conn.receive_data(data):
+            if isinstance(event, h2.events.RequestReceived):
+                asyncio.get_running_loop().call_later(
+                    self._latency,
+                    self._respond,
+                    event.stream_id,
+                )
+        self._flush()
+
+    def _respond(self, stream_id: int) -> None:
+        if self._transport is None or self._transport.is_closing():
+            return
+        self._conn.send_headers(
+            stream_id,
+            [
+                (":status", "200"),
+                ("content-type", "text/html"),
+                ("content-length", str(len(BODY))),
+            ],
+        )
+        self._conn.send_data(stream_id, BODY, end_stream=True)
+        self._flush()
+
+    def _flush(self) -> None:
+        if self._transport is not None:
+            self._transport.write(self._conn.data_to_send())
+
+
+class _H1Server(asyncio.Protocol):
+    def __init__(self, latency: float) -> None:
+        self._latency = latency
+        self._buffer = b""
+        self._transport: asyncio.Transport | None = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        assert isinstance(transport, asyncio.Transport)
+        self._transport = transport
+
+    def data_received(self, data: bytes) -> None:
+        self._buffer += data
+        while b"\r\n\r\n" in self._buffer:
+            _, self._buffer = self._buffer.split(b"\r\n\r\n", 1)
+            asyncio.get_running_loop().call_later(self._latency, self._respond)
+
+    def _respond(self) -> None:
+        if self._transport is None or self._transport.is_closing():
+            return
+        head = f"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nContent-Length: {len(BODY)}\r\n\r\n"
+        self._transport.write(head.encode() + BODY)
+
+
+async def _run(protocol: str, users: int, polls: int, latency: float, tmp: Path) -> None:
+    loop = asyncio.get_running_loop()
+    server_cls = _H2Server if protocol == "h2" else _H1Server
+    server = await loop.create_server(lambda: server_cls(latency), "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    base = f"http://127.0.0.1:{port}/"
+    inner = httpx.AsyncHTTPTransport(
+        http1=protocol == "h1",
+        http2=protocol == "h2",
+        limits=wb_limits(),
+    )
+    clients = []
+    for tg_id in range(users):
+        client = WBHttpClient(
+            tg_id,
+            storage=CookieStorage(tg_id, root=tmp),
+            transport=SharedTransport(inner),
+        )
+        client.client.base_url = httpx.URL(base)
+        clients.append(client)
+
+    latencies: list[float] = []
+
+    async def poll(client: WBHttpClient) -> None:
+        for _ in range(polls):
+            started = time.perf_counter()
+            response = await client._request("GET", "", params={"user": client.tg_user_id})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(poll(c) for c in clients))
+    elapsed = time.perf_counter() - started
+
+    for client in clients:
+        await client.aclose()
+    await inner.aclose()
+    server.close()
+    await server.wait_closed()
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{protocol:>3}: {len(latencies) / elapsed:8.0f} req/s  "
+        f"median {statistics.median(latencies) * 1000:7.1f} ms  p95 {p95 * 1000:7.1f} ms",
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--polls", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    args = parser.parse_args()
+    limits = wb_limits()
+    print(
+        f"users={args.users} polls={args.polls} latency={args.latency_ms}ms "
+        f"max_connections={limits.max_connections} keepalive={limits.max_keepalive_connections}",
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for protocol in ("h1", "h2"):
+            await _run(protocol, args.users, args.polls, args.latency_ms / 1000, Path(tmp))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
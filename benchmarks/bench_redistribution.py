@@ -0,0 +1,81 @@
+"""Скорость планировщика перераспределения остатков на синтетических данных.
+
+Запуск: ``python benchmarks/bench_redistribution.py --skus 100000 --warehouses 100``.
+По умолчанию остатки лежат на нескольких складах-хабах, а продажи размазаны
+по регионам (типичная картина после поставок). ``--dense`` заполняет матрицы
+случайно и целиком — худший случай, где время упирается в размер плана.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+os.environ.setdefault("BOT_TOKEN", "benchmark")
+
+from bot_wb.services.redistribution import StockMatrix, plan_transfers  # noqa: E402
+
+
+def _sparse(rng: np.random.Generator, shape: tuple[int, int], share: float) -> np.ndarray:
+    """Маска, в которой заполнена примерно доля ``share`` ячеек."""
+
+    return rng.random(shape) < share
+
+
+def synthetic(skus: int, warehouses: int, *, dense: bool, seed: int) -> StockMatrix:
+    rng = np.random.default_rng(seed)
+    shape = (skus, warehouses)
+    if dense:
+        stock = rng.poisson(20, shape) * _sparse(rng, shape, 0.5)
+        velocity = rng.gamma(0.8, 0.8, shape) * _sparse(rng, shape, 0.6)
+    else:
+        hubs = rng.choice(warehouses, size=max(1, warehouses // 20), replace=False)
+        stock = np.zeros(shape)
+        stock[:, hubs] = rng.poisson(60, (skus, len(hubs))) * _sparse(rng, (skus, len(hubs)), 0.5)
+        stock += rng.poisson(2, shape) * _sparse(rng, shape, 0.1)
+        velocity = rng.gamma(0.5, 0.3, shape) * _sparse(rng, shape, 0.15)
+    return StockMatrix(
+        [f"sku-{i}" for i in range(skus)],
+        [f"wh-{i}" for i in range(warehouses)],
+        stock.astype(np.float32),
+        velocity.astype(np.float32),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--skus", type=int, default=100_000)
+    parser.add_argument("--warehouses", type=int, default=100)
+    parser.add_argument("--target-days", type=float, default=14.0)
+    parser.add_argument("--dense", action="store_true")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    matrix = synthetic(args.skus, args.warehouses, dense=args.dense, seed=args.seed)
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        plan = plan_transfers(matrix, target_days=args.target_days)
+        timings.append(time.perf_counter() - started)
+    print(
+        f"{args.skus} SKU × {args.warehouses} складов: план {len(plan)} перемещений, "
+        f"{plan.total_units} шт., лучшее {min(timings) * 1000:.0f} мс",
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        rows = plan.write_csv(Path(tmp) / "plan.csv", matrix.skus, matrix.warehouses)
+        print(f"CSV: {rows} строк за {(time.perf_counter() - started) * 1000:.0f} мс")
+
+
+if __name__ == "__main__":
+    main()
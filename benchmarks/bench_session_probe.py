@@ -0,0 +1,95 @@
+"""Сравнение стратегий проверки сессии WB на локальном «кабинете».
+
+Запуск: ``python benchmarks/bench_session_probe.py --size-kb 600 --rounds 200``.
+Сервер на aiohttp отдаёт HTML заданного размера чанками, как реальный
+кабинет; для каждой стратегии меряется среднее время проверки и пик памяти.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from aiohttp import web
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+os.environ.setdefault("BOT_TOKEN", "benchmark")
+
+from bot_wb.services.session_probe import PROBES, SessionProbe  # noqa: E402
+from bot_wb.services.wb_http_client import WBHttpClient  # noqa: E402
+from bot_wb.storage.session import CookieStorage  # noqa: E402
+
+CHUNK = 16 * 1024
+
+
+def _page(size_kb: int) -> bytes:
+    head = b"<!DOCTYPE html><html><head><title>WB Seller</title></head><body>"
+    filler = b"<div class='row'>" + b"x" * 100 + b"</div>"
+    return head + filler * (size_kb * 1024 // len(filler))
+
+
+async def _start_server(page: bytes) -> tuple[web.AppRunner, str]:
+    async def index(request: web.Request) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": "text/html; charset=utf-8"})
+        await response.prepare(request)
+        for offset in range(0, len(page), CHUNK):
+            await response.write(page[offset : offset + CHUNK])
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_get("/", index)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore[union-attr]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+async def _measure(base: str, probe: SessionProbe, rounds: int, tmp: Path) -> None:
+    client = WBHttpClient(1, storage=CookieStorage(1, root=tmp), probe=probe)
+    client.client.base_url = base
+    client.client.cookies.set("wbx-validation-key", "bench")
+    try:
+        await client.is_logged_in()  # прогрев соединения
+        tracemalloc.start()
+        started = time.perf_counter()
+        for _ in range(rounds):
+            assert await client.is_logged_in()
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        await client.aclose()
+    print(f"{probe.name:<10} {elapsed / rounds * 1000:8.2f} ms/check  peak {peak / 1024:8.1f} KiB")
+
+
+async def run(size_kb: int, rounds: int) -> None:
+    runner, base = await _start_server(_page(size_kb))
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            print(f"page {size_kb} KiB, {rounds} checks per strategy")
+            for factory in PROBES.values():
+                await _measure(base, factory(), rounds, Path(tmp))
+    finally:
+        await runner.cleanup()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-kb", type=int, default=600)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.size_kb, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
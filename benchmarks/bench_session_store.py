@@ -0,0 +1,70 @@
+"""Сравнение файлового и SQLite-хранилища cookie-сессий.
+
+Запуск: ``python benchmarks/bench_session_store.py --users 5000``.
+Меряется то, что бот делает на каждый рендер (проверка наличия + загрузка),
+а также первичная запись и повторные чтения «горячих» пользователей.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+os.environ.setdefault("BOT_TOKEN", "benchmark")
+
+from bot_wb.storage.session import CookieStorage  # noqa: E402
+from bot_wb.storage.session_db import SqliteCookieStorage, SqliteSessionStore  # noqa: E402
+
+JAR = {"wbx-validation-key": "x" * 64, "wbx-refresh": "y" * 256, "locale": "ru"}
+
+
+def _timed(label: str, ops: int, fn: Callable[[], None]) -> None:
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<32} {elapsed * 1000:9.1f} ms  {elapsed / ops * 1e6:8.1f} us/op")
+
+
+def run(users: int, reads: int) -> None:
+    ids = list(range(1, users + 1))
+    hot = [random.choice(ids) for _ in range(reads)]
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        files_root = root / "sessions"
+        store = SqliteSessionStore(root / "sessions.db", cache_size=users)
+
+        def files_storage(tg_id: int) -> CookieStorage:
+            return CookieStorage(tg_id, root=files_root)
+
+        def sqlite_storage(tg_id: int) -> SqliteCookieStorage:
+            return SqliteCookieStorage(tg_id, store)
+
+        for name, factory in (("files", files_storage), ("sqlite", sqlite_storage)):
+            print(f"--- {name} backend, {users} users, {reads} reads")
+            _timed("save", users, lambda f=factory: [f(i).save(JAR) for i in ids])
+            _timed(
+                "exists+load (render path)",
+                reads,
+                lambda f=factory: [f(i).exists() and f(i).load() for i in hot],
+            )
+        store.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--reads", type=int, default=20000)
+    args = parser.parse_args()
+    run(args.users, args.reads)
+
+
+if __name__ == "__main__":
+    main()
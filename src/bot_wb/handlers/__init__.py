@@ -1 +1 @@
-__all__ = ["start", "auth", "profile"]
+__all__ = ["start", "auth", "profile", "supplies"]
@@ -5,11 +5,11 @@ from aiogram.exceptions import TelegramBadRequest
 
 from bot_wb.logging import logger
 from bot_wb.services.auth_service import AuthService
-from bot_wb.storage.repo import UserRepo
+from bot_wb.storage.cache import CachedUserRepo
 from bot_wb.ui.keyboards import kb_home
 from bot_wb.ui.texts import home_text
 
-_repo = UserRepo()
+_repo = CachedUserRepo()
 _auth = AuthService(_repo)
 
 
@@ -1,84 +1,51 @@
 from aiogram import F, Router
-from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, Message
 
 from bot_wb.logging import logger
 from bot_wb.services.auth_service import AuthService
-from bot_wb.storage.repo import UserRepo
+from bot_wb.services.login_jobs import LoginJob, LoginState, login_jobs
+from bot_wb.storage.cache import CachedUserRepo
 from bot_wb.ui import texts
-from bot_wb.ui.keyboards import kb_home
+from bot_wb.ui.keyboards import kb_home, kb_login_cancel
 
-from ._render import render_home
+from ._render import _edit_or_send, render_home
 
 router = Router(name=__name__)
-_repo = UserRepo()
+_repo = CachedUserRepo()
 _auth = AuthService(_repo)
 
 
 @router.callback_query(F.data == "auth")
 async def on_auth(cb: CallbackQuery, state: FSMContext):
+    if cb.bot is None:
+        raise RuntimeError("Callback does not contain bot instance")
+    bot = cb.bot
     user_name = cb.from_user.full_name if cb.from_user else "друг"
-    auth_prompt = (
-        "Открыл окно входа WB Seller.\n"
-        "Пожалуйста, авторизуйтесь в появившемся окне "
-        "(телефон → SMS → код с e-mail).\n\n"
-        "Окно останется открытым до успешного входа или таймаута, "
-        "не закрывайте его вручную."
-    )
-
-    message_obj = cb.message
-    if message_obj and hasattr(message_obj, "edit_text"):
-        await message_obj.edit_text(auth_prompt, reply_markup=None)
+    chat = getattr(cb.message, "chat", None)
+    chat_id = getattr(chat, "id", cb.from_user.id)
     await state.clear()
-    await cb.answer()
+    logger.info("User {} requested interactive auth", cb.from_user.id)
 
-    if cb.bot is None:
-        raise RuntimeError("Callback does not contain bot instance")
+    async def notify(job: LoginJob) -> None:
+        if job.state is LoginState.SUCCEEDED:
+            await render_home(bot, chat_id, user_name, force_replace=True)
+            logger.info("Auth flow completed successfully for user {}", job.tg_user_id)
+            return
+        if job.state is LoginState.FAILED:
+            logger.warning("Auth flow failed for user {}", job.tg_user_id)
+        markup = kb_home(authorized=False) if job.state.final else kb_login_cancel()
+        await _edit_or_send(bot, chat_id, texts.login_status_text(job), markup)
+
+    # вход идёт в фоне: обработчик не держит апдейт до 420 секунд
+    await login_jobs.submit(cb.from_user.id, _auth.interactive_login, notify)
+    await cb.answer()
 
-    logger.info(
-        "User {} requested interactive auth",
-        cb.from_user.id if cb.from_user else "?",
-    )
-    ok = await _auth.interactive_login(cb.from_user.id)
-    chat = getattr(message_obj, "chat", None)
-    chat_id = getattr(chat, "id", cb.from_user.id)
 
-    if ok:
-        await render_home(cb.bot, chat_id, user_name, force_replace=True)
-        logger.info("Auth flow completed successfully for user {}", cb.from_user.id)
-    else:
-        logger.warning("Auth flow failed for user {}", cb.from_user.id)
-        failure_text = (
-            "Не удалось завершить авторизацию. " "Попробуйте ещё раз: нажмите «Авторизация»."
-        )
-        if message_obj and hasattr(message_obj, "edit_text"):
-            try:
-                await message_obj.edit_text(
-                    failure_text,
-                    reply_markup=kb_home(authorized=False),
-                )
-            except TelegramBadRequest:
-                if hasattr(message_obj, "answer"):
-                    msg = await message_obj.answer(
-                        failure_text,
-                        reply_markup=kb_home(authorized=False),
-                    )
-                    await _repo.set_anchor(cb.from_user.id, msg.message_id)
-                else:
-                    msg = await cb.bot.send_message(
-                        chat_id,
-                        failure_text,
-                        reply_markup=kb_home(authorized=False),
-                    )
-                    await _repo.set_anchor(cb.from_user.id, msg.message_id)
-        else:
-            msg = await cb.bot.send_message(
-                chat_id,
-                failure_text,
-                reply_markup=kb_home(authorized=False),
-            )
-            await _repo.set_anchor(cb.from_user.id, msg.message_id)
+@router.callback_query(F.data == "auth_cancel")
+async def on_auth_cancel(cb: CallbackQuery):
+    cancelled = await login_jobs.cancel(cb.from_user.id)
+    await cb.answer("Вход отменён" if cancelled else "Нет активного входа")
 
 
 @router.callback_query(F.data == "logout")
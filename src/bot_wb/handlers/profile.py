@@ -4,15 +4,17 @@ from aiogram import F, Router
 from aiogram.types import CallbackQuery
 
 from bot_wb.logging import logger
-from bot_wb.services.wb_http_client import WBHttpClient
-from bot_wb.storage.repo import UserRepo
+from bot_wb.services.client_registry import client_registry
+from bot_wb.settings import settings
+from bot_wb.storage.cache import CachedUserRepo
 from bot_wb.ui import texts
 from bot_wb.ui.keyboards import kb_profile_switch, kb_profile_view
 
 from ._render import _edit_or_send, _replace_message
 
 router = Router(name=__name__)
-_repo = UserRepo()
+_repo = CachedUserRepo()
+_clients = client_registry
 
 
 async def _render_profile(cb: CallbackQuery, *, force_replace: bool = False) -> None:
@@ -21,11 +23,8 @@ async def _render_profile(cb: CallbackQuery, *, force_replace: bool = False) ->
     tg_id = cb.from_user.id
     profiles = await _repo.get_profiles(tg_id)
     if not profiles:
-        client = WBHttpClient(tg_id)
-        try:
+        async with _clients.client(tg_id) as client:
             profiles = await client.list_organizations()
-        finally:
-            await client.aclose()
         await _repo.set_profiles(tg_id, profiles)
         if len(profiles) == 1:
             first_id = profiles[0].get("id")
@@ -37,10 +36,16 @@ async def _render_profile(cb: CallbackQuery, *, force_replace: bool = False) ->
     if len(profiles) <= 1:
         org_name = profiles[0].get("name") if profiles else None
         text = texts.profile_text_single(org_name)
-        markup = kb_profile_view(has_multiple=False)
+        markup = kb_profile_view(
+            has_multiple=False,
+            supply_upload=settings.supply_upload_enabled,
+        )
     else:
         text = texts.profile_text_multi(profiles, active_id)
-        markup = kb_profile_view(has_multiple=True)
+        markup = kb_profile_view(
+            has_multiple=True,
+            supply_upload=settings.supply_upload_enabled,
+        )
 
     chat = getattr(cb.message, "chat", None)
     chat_id = getattr(chat, "id", cb.from_user.id)
@@ -94,12 +99,8 @@ async def on_set_profile(cb: CallbackQuery):
     pid = cb.data.split(":", 1)[1]
     tg_id = cb.from_user.id
 
-    client = WBHttpClient(tg_id)
-    ok = True
-    try:
+    async with _clients.client(tg_id) as client:
         ok = await client.set_active_organization(pid)
-    finally:
-        await client.aclose()
 
     if ok:
         await _repo.set_active_profile(tg_id, pid)
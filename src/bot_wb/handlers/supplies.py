@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from contextlib import suppress
+from pathlib import Path
+
+from aiogram import F, Router
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.types import CallbackQuery, Message
+
+from bot_wb.logging import logger
+from bot_wb.services.client_registry import client_registry
+from bot_wb.services.supply_import import SUPPORTED_SUFFIXES, ImportReport, import_supplies
+from bot_wb.settings import settings
+from bot_wb.ui import texts
+from bot_wb.ui.keyboards import kb_auth_stub
+
+from ._render import _edit_or_send
+
+router = Router(name=__name__)
+_clients = client_registry
+
+
+class SupplyUpload(StatesGroup):
+    waiting_file = State()
+
+
+@router.callback_query(F.data == "supply_upload")
+async def on_supply_upload(cb: CallbackQuery, state: FSMContext):
+    if cb.bot is None:
+        raise RuntimeError("Callback does not contain bot instance")
+    chat = getattr(cb.message, "chat", None)
+    chat_id = getattr(chat, "id", cb.from_user.id)
+    await _edit_or_send(cb.bot, chat_id, texts.supply_upload_prompt_text(), kb_auth_stub())
+    await state.set_state(SupplyUpload.waiting_file)
+    await cb.answer()
+
+
+@router.message(SupplyUpload.waiting_file, F.document)
+async def on_supply_document(message: Message, state: FSMContext):
+    if message.bot is None or message.document is None or message.from_user is None:
+        raise RuntimeError("Message does not contain bot, document or user")
+    bot = message.bot
+    chat_id = message.chat.id
+    document = message.document
+    suffix = Path(document.file_name or "").suffix.lower()
+    if suffix not in SUPPORTED_SUFFIXES:
+        await message.answer("Нужен файл .csv или .xlsx.")
+        return
+    if (document.file_size or 0) > settings.supply_upload_max_mb * 1024 * 1024:
+        await message.answer(f"Файл больше {settings.supply_upload_max_mb} МБ.")
+        return
+    await state.clear()
+
+    tg_id = message.from_user.id
+    path = settings.data_dir / "uploads" / f"{tg_id}_{document.file_unique_id}{suffix}"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    last_text = ""
+
+    async def show(text: str) -> None:
+        nonlocal last_text
+        # одинаковый текст Telegram не примет, а _edit_or_send тогда пришлёт новое сообщение
+        if text != last_text:
+            last_text = text
+            await _edit_or_send(bot, chat_id, text, None)
+
+    async def on_progress(report: ImportReport) -> None:
+        if not report.finished:
+            await show(texts.supply_import_progress_text(report))
+
+    try:
+        await show(texts.supply_import_progress_text(ImportReport()))
+        await bot.download(document, destination=path)
+        async with _clients.client(tg_id) as client:
+            report = await import_supplies(
+                path,
+                client,
+                batch_size=settings.supply_batch_size,
+                concurrency=settings.supply_concurrency,
+                on_progress=on_progress,
+                progress_interval=settings.supply_progress_interval,
+            )
+    except ValueError as exc:
+        logger.info("Supply file of user {} rejected: {}", tg_id, exc)
+        await _edit_or_send(bot, chat_id, f"❌ {exc}", kb_auth_stub())
+        return
+    finally:
+        with suppress(OSError):
+            path.unlink()
+    await _edit_or_send(bot, chat_id, texts.supply_import_done_text(report), kb_auth_stub())
+
+
+@router.message(SupplyUpload.waiting_file)
+async def on_supply_not_document(message: Message):
+    await message.answer("Пришлите файл документом (.csv или .xlsx).")
@@ -14,11 +14,26 @@ from filelock import FileLock, Timeout
 from .handlers.auth import router as auth_router
 from .handlers.profile import router as profile_router
 from .handlers.start import router as start_router
+from .handlers.supplies import router as supplies_router
 from .logging import logger, setup_logging
 from .middlewares.context import ContextMiddleware
 from .middlewares.error import ErrorMiddleware
+from .middlewares.send_pacing import SendPacingMiddleware
+from .middlewares.uow import UnitOfWorkMiddleware
+from .services.booking import BookingExecutor, BookingResult, make_booking_executor
+from .services.browser_pool import browser_pool, refresh_pool
+from .services.client_registry import client_registry
+from .services.login_jobs import login_jobs
+from .services.session_refresh import session_refresher
+from .services.slot_watcher import Slot, SlotWatcher, make_slot_watcher
+from .services.tg_send import Lane, send_lane
 from .settings import settings
-from .storage.db import ensure_db
+from .storage.cache import user_cache
+from .storage.db import DB_PATH, ensure_db
+from .storage.pool import close_pool, open_pool
+from .storage.session_db import close_session_store
+from .storage.slots import SlotSubscription
+from .ui.texts import booking_done_text, slots_found_text
 
 PORT_LOCK = 58112
 CONFLICT_DIAG_WINDOW = 10.0
@@ -46,9 +61,11 @@ def _acquire_file_lock(lock: FileLock, lock_path: Path) -> bool:
 
 def _setup_middlewares(dp: Dispatcher) -> None:
     context_mw = ContextMiddleware()
+    uow_mw = UnitOfWorkMiddleware()
     error_mw = ErrorMiddleware()
     for router in (dp.message, dp.callback_query, dp.my_chat_member, dp.chat_member):
         router.middleware(context_mw)
+        router.middleware(uow_mw)
         router.middleware(error_mw)
 
 
@@ -57,9 +74,13 @@ def _build_app() -> tuple[Bot, Dispatcher]:
         token=settings.bot_token,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML),
     )
+    # все отправки, правки и удаления сообщений идут через лимиты Telegram
+    bot.session.middleware(SendPacingMiddleware())
 
     dp = Dispatcher()
     dp.include_routers(start_router, auth_router, profile_router)
+    if settings.supply_upload_enabled:
+        dp.include_router(supplies_router)
     _setup_middlewares(dp)
     return bot, dp
 
@@ -97,6 +118,23 @@ async def _start_polling_with_retries(dp: Dispatcher, bot: Bot) -> None:
             await asyncio.sleep(min(2.0 + retries * 0.5, 5.0))
 
 
+def _build_slot_watcher(bot: Bot) -> SlotWatcher:
+    async def notify(sub: SlotSubscription, slots: list[Slot]) -> None:
+        # рассылка о слотах пропускает вперёд ответы на действия пользователей
+        with send_lane(Lane.ALERT):
+            await bot.send_message(sub.tg_user_id, slots_found_text(slots))
+
+    return make_slot_watcher(notify)
+
+
+def _build_booking_executor(bot: Bot, watcher: SlotWatcher) -> BookingExecutor:
+    async def on_booked(result: BookingResult) -> None:
+        with send_lane(Lane.ALERT):
+            await bot.send_message(result.draft.tg_user_id, booking_done_text(result))
+
+    return make_booking_executor(watcher, on_booked)
+
+
 async def _run_bot(bot: Bot, dp: Dispatcher) -> None:
     data_dir = Path(getattr(settings, "data_dir", "data"))
     lock_path = data_dir / "bot_wb.lock"
@@ -108,6 +146,8 @@ async def _run_bot(bot: Bot, dp: Dispatcher) -> None:
         return
 
     port_guard: socket.socket | None = None
+    watcher = _build_slot_watcher(bot)
+    booking = _build_booking_executor(bot, watcher)
     try:
         port_guard = _acquire_port_lock()
         if not port_guard:
@@ -122,9 +162,34 @@ async def _run_bot(bot: Bot, dp: Dispatcher) -> None:
             )
             await bot.delete_webhook(drop_pending_updates=True)
 
+        user_cache.start()
+        client_registry.start()
+        if await watcher.load():
+            logger.info(
+                "Slot watcher: {} subscriptions on {} warehouses",
+                len(watcher),
+                watcher.warehouses,
+            )
+        watcher.start()
+        booking.start()
+        if settings.session_refresh_enabled:
+            session_refresher.start()
+        if settings.browser_prewarm:
+            await browser_pool.warm()
         logger.info("BOT_WB started")
         await _start_polling_with_retries(dp, bot)
     finally:
+        await login_jobs.stop()
+        await session_refresher.stop()
+        await watcher.stop()
+        await booking.stop()
+        try:
+            await user_cache.stop()
+        except Exception:  # noqa: BLE001
+            logger.opt(exception=True).error("Failed to flush user cache on shutdown")
+        await client_registry.aclose()
+        await browser_pool.aclose()
+        await refresh_pool.aclose()
         await _close_bot(bot)
         with suppress(Exception):
             if port_guard:
@@ -137,12 +202,17 @@ async def _run_bot(bot: Bot, dp: Dispatcher) -> None:
 async def main() -> None:
     setup_logging(settings.log_level)
     logger.info("Bootstrapping BOT_WB")
-    await ensure_db()
+    pool = await open_pool(DB_PATH)
+    try:
+        await ensure_db(pool)
 
-    bot, dp = _build_app()
+        bot, dp = _build_app()
 
-    await setup_commands(bot)
-    await _run_bot(bot, dp)
+        await setup_commands(bot)
+        await _run_bot(bot, dp)
+    finally:
+        close_session_store()
+        await close_pool()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,63 @@
+"""Простейшие in-process метрики: счётчики и гистограммы для логов и диагностики."""
+
+from __future__ import annotations
+
+import bisect
+from collections import defaultdict
+
+# верхние границы корзин гистограмм, мс (последняя корзина — всё, что больше)
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_counters: defaultdict[str, int] = defaultdict(int)
+_histograms: dict[str, list[int]] = {}
+
+
+def inc(name: str, value: int = 1) -> None:
+    _counters[name] += value
+
+
+def get(name: str) -> int:
+    return _counters.get(name, 0)
+
+
+def snapshot() -> dict[str, int]:
+    return dict(_counters)
+
+
+def observe(name: str, value_ms: float) -> None:
+    buckets = _histograms.get(name)
+    if buckets is None:
+        buckets = _histograms[name] = [0] * (len(BUCKETS_MS) + 1)
+    buckets[bisect.bisect_left(BUCKETS_MS, value_ms)] += 1
+
+
+def histogram(name: str) -> dict[str, int]:
+    """Число наблюдений по корзинам: ``{"<=5": .., ..., ">10000": ..}``."""
+
+    buckets = _histograms.get(name) or [0] * (len(BUCKETS_MS) + 1)
+    labels = [f"<={b}" for b in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}"]
+    return dict(zip(labels, buckets, strict=True))
+
+
+def percentile(name: str, q: float) -> float | None:
+    """Оценка перцентиля ``q`` (0..1) по верхней границе корзины."""
+
+    buckets = _histograms.get(name)
+    total = sum(buckets) if buckets else 0
+    if not buckets or not total:
+        return None
+    rank = q * total
+    seen = 0
+    for bound, count in zip((*BUCKETS_MS, float("inf")), buckets, strict=True):
+        seen += count
+        if seen >= rank:
+            return bound
+    return float("inf")
+
+
+def reset() -> None:
+    _counters.clear()
+    _histograms.clear()
+
+
+__all__ = ["inc", "get", "snapshot", "observe", "histogram", "percentile", "reset"]
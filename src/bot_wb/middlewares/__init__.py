@@ -2,5 +2,12 @@
 
 from .context import ContextMiddleware
 from .error import ErrorMiddleware
+from .send_pacing import SendPacingMiddleware
+from .uow import UnitOfWorkMiddleware
 
-__all__ = ["ContextMiddleware", "ErrorMiddleware"]
+__all__ = [
+    "ContextMiddleware",
+    "ErrorMiddleware",
+    "SendPacingMiddleware",
+    "UnitOfWorkMiddleware",
+]
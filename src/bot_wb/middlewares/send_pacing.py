@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from collections.abc import Hashable
+from functools import partial
+from typing import TYPE_CHECKING, Any
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendChatAction, TelegramMethod
+
+from bot_wb.services.tg_send import SendScheduler, send_scheduler
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+    from aiogram.methods.base import TelegramType
+
+# методы, которые Telegram считает отправкой в чат и ограничивает по частоте
+PACED_PREFIXES = ("Send", "Edit", "Delete", "Copy", "Forward")
+
+
+def paced_chat(method: TelegramMethod[Any]) -> Hashable | None:
+    """Чат, в лимит которого идёт запрос, или ``None`` для прочих методов."""
+
+    if isinstance(method, SendChatAction) or not type(method).__name__.startswith(PACED_PREFIXES):
+        return None
+    return getattr(method, "chat_id", None)
+
+
+class SendPacingMiddleware(BaseRequestMiddleware):
+    """Request middleware that paces outgoing messages through ``SendScheduler``."""
+
+    def __init__(self, scheduler: SendScheduler | None = None) -> None:
+        self._scheduler = scheduler if scheduler is not None else send_scheduler
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Any:
+        chat_id = paced_chat(method)
+        if chat_id is None:
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as exc:
+                # флуд-контроль не привязан к чату — притормаживаем все отправки
+                self._scheduler.penalize(None, exc.retry_after)
+                raise
+        return await self._scheduler.send(chat_id, partial(make_request, bot, method))
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from bot_wb.logging import logger
+from bot_wb.storage.uow import unit_of_work
+
+Handler = Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]]
+
+
+class UnitOfWorkMiddleware(BaseMiddleware):
+    """Middleware that buffers repo writes of one update and commits them once."""
+
+    async def __call__(
+        self,
+        handler: Handler,
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        async with unit_of_work() as uow:
+            data["uow"] = uow
+            result = await handler(event, data)
+        if uow.writes:
+            logger.debug(
+                "Unit of work merged {} writes into {} user rows ({} merged)",
+                uow.writes,
+                uow.rows,
+                uow.merged,
+            )
+        return result
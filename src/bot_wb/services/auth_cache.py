@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+from bot_wb import metrics
+from bot_wb.logging import logger
+from bot_wb.settings import settings
+from bot_wb.storage.uow import detached_context
+
+Check = Callable[[], Awaitable[bool]]
+
+
+@dataclass
+class _Status:
+    value: bool
+    checked_at: float
+
+
+class AuthStatusCache:
+    """TTL + stale-while-revalidate кэш результата проверки сессии WB.
+
+    Свежий результат (моложе ``ttl``) отдаётся сразу. Устаревший, но не старше
+    ``ttl + stale_ttl``, тоже отдаётся сразу, а проверка перезапускается в фоне.
+    Без сохранённого результата вызывающий ждёт проверку; параллельные
+    проверки одного пользователя склеиваются в одну. Хранится не больше
+    ``max_entries`` результатов (LRU), совсем устаревшие выбрасываются.
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl: float = 60.0,
+        stale_ttl: float = 600.0,
+        max_entries: int = 10_000,
+    ) -> None:
+        self._ttl = ttl
+        self._stale_ttl = stale_ttl
+        self._max_entries = max_entries
+        self._entries: OrderedDict[int, _Status] = OrderedDict()
+        self._inflight: dict[int, asyncio.Task[bool]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, tg_user_id: int, check: Check) -> bool:
+        entry = self._entries.get(tg_user_id)
+        age = time.monotonic() - entry.checked_at if entry else None
+        if entry is not None and age is not None and age < self._ttl:
+            metrics.inc("auth_cache.hit")
+            self._entries.move_to_end(tg_user_id)
+            return entry.value
+        if entry is not None and age is not None and age < self._ttl + self._stale_ttl:
+            metrics.inc("auth_cache.stale")
+            self._entries.move_to_end(tg_user_id)
+            self._revalidate(tg_user_id, check)
+            return entry.value
+        metrics.inc("auth_cache.miss")
+        self._entries.pop(tg_user_id, None)
+        return await asyncio.shield(self._revalidate(tg_user_id, check))
+
+    def _revalidate(self, tg_user_id: int, check: Check) -> asyncio.Task[bool]:
+        task = self._inflight.get(tg_user_id)
+        if task is None:
+            # без UoW: фоновая проверка не должна писать в буфер завершённого апдейта
+            task = asyncio.create_task(
+                self._run_check(tg_user_id, check),
+                context=detached_context(),
+            )
+            task.add_done_callback(_consume_exception)
+            self._inflight[tg_user_id] = task
+        return task
+
+    async def _run_check(self, tg_user_id: int, check: Check) -> bool:
+        task = asyncio.current_task()
+        try:
+            value = await check()
+        except Exception:
+            logger.opt(exception=True).warning("Auth revalidation failed for {}", tg_user_id)
+            raise
+        finally:
+            # после invalidate в _inflight другая задача (или ничего): результат устарел
+            current = self._inflight.get(tg_user_id) is task
+            if current:
+                del self._inflight[tg_user_id]
+        if current:
+            self.set(tg_user_id, value)
+        return value
+
+    def set(self, tg_user_id: int, value: bool) -> None:
+        self._entries[tg_user_id] = _Status(value, time.monotonic())
+        self._entries.move_to_end(tg_user_id)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, tg_user_id: int) -> None:
+        self._entries.pop(tg_user_id, None)
+        self._inflight.pop(tg_user_id, None)
+
+
+def _consume_exception(task: asyncio.Task[bool]) -> None:
+    # ошибка фоновой проверки уже залогирована в _run_check
+    if not task.cancelled():
+        task.exception()
+
+
+auth_status_cache = AuthStatusCache(
+    ttl=settings.auth_cache_ttl,
+    stale_ttl=settings.auth_cache_stale_ttl,
+    max_entries=settings.auth_cache_size,
+)
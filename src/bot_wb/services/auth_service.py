@@ -1,36 +1,60 @@
+import asyncio
+
 from bot_wb.logging import logger
+from bot_wb.settings import settings
 from bot_wb.storage.repo import UserRepo
-from bot_wb.storage.session import CookieStorage
+from bot_wb.storage.session import BrowserStateStorage, open_cookie_storage
 
+from .auth_cache import AuthStatusCache, auth_status_cache
 from .browser_login import BrowserLogin
-from .wb_http_client import WBHttpClient
+from .client_registry import WBClientRegistry, client_registry
+from .session_refresh import SessionRefresher, session_refresher
 
 
 class AuthService:
-    def __init__(self, repo: UserRepo):
+    def __init__(
+        self,
+        repo: UserRepo,
+        clients: WBClientRegistry | None = None,
+        status_cache: AuthStatusCache | None = None,
+        refresher: SessionRefresher | None = None,
+    ):
         self.repo = repo
+        self.clients = clients if clients is not None else client_registry
+        self.status_cache = status_cache if status_cache is not None else auth_status_cache
+        self.refresher = refresher if refresher is not None else session_refresher
 
     async def is_authorized(self, tg_id: int) -> bool:
-        storage = CookieStorage(tg_id)
-        if not storage.cookies_path.exists():
+        if not await asyncio.to_thread(open_cookie_storage(tg_id).exists):
+            self.status_cache.invalidate(tg_id)
             await self.repo.set_authorized(tg_id, False)
             return False
-        client = WBHttpClient(tg_id, storage=storage)
-        try:
+        return await self.status_cache.get(tg_id, lambda: self._check_session(tg_id))
+
+    async def _check_session(self, tg_id: int) -> bool:
+        async with self.clients.client(tg_id) as client:
             ok = await client.is_logged_in()
-            await self.repo.set_authorized(tg_id, ok)
-            return ok
-        finally:
-            await client.aclose()
+        await self.repo.set_authorized(tg_id, ok)
+        return ok
 
     async def interactive_login(self, tg_id: int) -> bool:
-        logger.info("Starting interactive login for user {}", tg_id)
-        async with BrowserLogin(tg_id) as bl:
-            ok = await bl.run_flow(timeout_sec=420)
+        # сохранённое состояние браузера часто позволяет обойтись без окна входа;
+        # пользователь ждёт, поэтому кабинет грузим недолго и в очередь не встаём
+        ok = await self.refresher.refresh(
+            tg_id,
+            page_timeout=settings.session_refresh_interactive_timeout,
+            wait=False,
+        )
+        if not ok:
+            logger.info("Starting interactive login for user {}", tg_id)
+            async with BrowserLogin(tg_id) as bl:
+                ok = await bl.run_flow(timeout_sec=420)
+        # клиент и статус с прежними cookies больше не актуальны
+        await self.clients.invalidate(tg_id)
+        self.status_cache.invalidate(tg_id)
         if ok:
             logger.info("Interactive login succeeded for user {}", tg_id)
-            client = WBHttpClient(tg_id)
-            try:
+            async with self.clients.client(tg_id) as client:
                 profiles = await client.list_organizations()
                 await self.repo.set_profiles(tg_id, profiles)
                 if profiles:
@@ -41,9 +65,8 @@ class AuthService:
                     org = await client.get_organization_name()
                     if org:
                         await self.repo.set_profile_org(tg_id, org)
-                await self.repo.set_authorized(tg_id, True)
-            finally:
-                await client.aclose()
+            await self.repo.set_authorized(tg_id, True)
+            self.status_cache.set(tg_id, True)
         else:
             logger.warning("Interactive login failed for user {}", tg_id)
             await self.repo.set_authorized(tg_id, False)
@@ -51,5 +74,10 @@ class AuthService:
 
     async def logout(self, tg_id: int):
         logger.info("Clearing session for user {}", tg_id)
-        CookieStorage(tg_id).clear()
+        # идущее обновление иначе пересоздало бы jar и state.json после очистки
+        async with self.refresher.lock(tg_id):
+            await self.clients.invalidate(tg_id)
+            self.status_cache.invalidate(tg_id)
+            await asyncio.to_thread(open_cookie_storage(tg_id).clear)
+            await asyncio.to_thread(BrowserStateStorage(tg_id).clear)
         await self.repo.clear_auth(tg_id)
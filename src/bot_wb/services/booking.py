@@ -0,0 +1,309 @@
+"""Автобронирование слотов приёмки для «взведённых» черновиков поставок.
+
+Для каждого черновика заранее собирается тело запроса, а клиент аккаунта
+держится открытым и периодически «прогревается», чтобы TCP/TLS-соединение и
+сессия были готовы. Слоты приходят напрямую от ``SlotWatcher`` (без
+Telegram-апдейтов). По одной поставке в WB уходит не больше одного запроса
+бронирования за раз: подходящие слоты пробуются по очереди, следующий — только
+после явного отказа WB (4xx). Если исход неизвестен (сеть, 5xx), черновик
+снимается, чтобы не забронировать поставку дважды; проверить её нужно в кабинете.
+
+Задержки пишутся в гистограммы ``metrics``: ``booking.detect_to_send_ms``
+(от обнаружения слота до отправки запроса, после ожидания в лимитере) и
+``booking.detect_to_booked_ms``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from collections.abc import Awaitable, Callable
+from contextlib import AsyncExitStack, suppress
+from dataclasses import dataclass
+from datetime import date
+from enum import Enum
+from typing import Any
+
+import httpx
+
+from bot_wb import metrics
+from bot_wb.logging import logger
+from bot_wb.settings import settings
+
+from .client_registry import WBClientRegistry, client_registry
+from .session_probe import RedirectProbe
+from .slot_watcher import Slot, SlotWatcher
+from .wb_http_client import WBHttpClient
+
+
+@dataclass(frozen=True)
+class BookingDraft:
+    """Черновик поставки, который нужно забронировать на первый подходящий слот."""
+
+    tg_user_id: int
+    supply_id: str
+    warehouse_id: int
+    date_from: date
+    date_to: date
+    max_coefficient: int = 0
+    box_type_id: int | None = None
+
+    def accepts(self, slot: Slot) -> bool:
+        return (
+            slot.warehouse_id == self.warehouse_id
+            and self.date_from <= slot.date <= self.date_to
+            and slot.coefficient <= self.max_coefficient
+            and (self.box_type_id is None or slot.box_type_id == self.box_type_id)
+        )
+
+
+class _Outcome(Enum):
+    BOOKED = "booked"
+    REJECTED = "rejected"
+    # 429: запрос не обработан, но и следующий слот сейчас не пройдёт
+    THROTTLED = "throttled"
+    UNKNOWN = "unknown"
+
+
+@dataclass
+class _Armed:
+    draft: BookingDraft
+    # тело запроса без даты: дата подставляется в момент отправки
+    body_prefix: bytes
+    firing: bool = False
+
+    def body_for(self, slot: Slot) -> bytes:
+        return self.body_prefix + json.dumps(slot.date.isoformat()).encode() + b"}"
+
+
+@dataclass(frozen=True)
+class BookingResult:
+    draft: BookingDraft
+    slot: Slot
+    latency_ms: float
+
+
+OnBooked = Callable[[BookingResult], Awaitable[None]]
+
+
+def _prepare(draft: BookingDraft) -> _Armed:
+    payload: dict[str, Any] = {
+        "supplyId": draft.supply_id,
+        "warehouseId": draft.warehouse_id,
+        "boxTypeId": draft.box_type_id,
+    }
+    # сериализуем всё, кроме даты, заранее; "date" всегда последний ключ
+    prefix = json.dumps(payload, ensure_ascii=False)[:-1] + ', "date": '
+    return _Armed(draft=draft, body_prefix=prefix.encode())
+
+
+class BookingExecutor:
+    """Держит взведённые черновики и бронирует их по сигналу ``SlotWatcher``."""
+
+    def __init__(
+        self,
+        watcher: SlotWatcher,
+        *,
+        on_booked: OnBooked | None = None,
+        clients: WBClientRegistry | None = None,
+        max_slots: int = 3,
+        warm_interval: float = 20.0,
+    ) -> None:
+        self._watcher = watcher
+        self._on_booked = on_booked
+        self._clients = clients if clients is not None else client_registry
+        self._max_slots = max_slots
+        self._warm_interval = warm_interval
+        self._probe = RedirectProbe()
+        self._armed: dict[tuple[int, str], _Armed] = {}
+        # аренды клиентов аккаунтов со взведёнными черновиками
+        self._leases: dict[int, tuple[AsyncExitStack, WBHttpClient]] = {}
+        self._inflight: set[asyncio.Task[None]] = set()
+        self._warmer: asyncio.Task[None] | None = None
+        watcher.add_listener(self.on_slots)
+
+    def __len__(self) -> int:
+        return len(self._armed)
+
+    async def arm(self, draft: BookingDraft) -> None:
+        key = (draft.tg_user_id, draft.supply_id)
+        if key in self._armed:
+            await self.disarm(draft.tg_user_id, draft.supply_id)
+        # сначала клиент: если его не получить, черновик не остаётся взведённым
+        client = await self._client(draft.tg_user_id)
+        self._armed[key] = _prepare(draft)
+        self._watcher.watch(draft.warehouse_id, draft.tg_user_id)
+        await self._warm(client)
+        logger.info(
+            "Armed booking for supply {} of user {} on warehouse {}",
+            draft.supply_id,
+            draft.tg_user_id,
+            draft.warehouse_id,
+        )
+
+    async def disarm(self, tg_user_id: int, supply_id: str) -> bool:
+        armed = self._armed.pop((tg_user_id, supply_id), None)
+        if armed is None:
+            return False
+        self._watcher.unwatch(armed.draft.warehouse_id, tg_user_id)
+        if not any(k[0] == tg_user_id for k in self._armed):
+            await self._release(tg_user_id)
+        return True
+
+    async def _client(self, tg_user_id: int) -> WBHttpClient:
+        lease = self._leases.get(tg_user_id)
+        if lease is not None and not self._clients.is_current(tg_user_id, lease[1]):
+            # реестр сбросил клиента (перелогин) — отпускаем старый и берём новый
+            await self._release(tg_user_id)
+            lease = None
+        if lease is None:
+            stack = AsyncExitStack()
+            client = await stack.enter_async_context(self._clients.client(tg_user_id))
+            lease = self._leases[tg_user_id] = (stack, client)
+        return lease[1]
+
+    async def _release(self, tg_user_id: int) -> None:
+        lease = self._leases.pop(tg_user_id, None)
+        if lease is not None:
+            await lease[0].aclose()
+
+    async def _warm(self, client: WBHttpClient) -> None:
+        """Поддерживает соединение и проверяет сессию лёгким запросом."""
+
+        if not await client.is_logged_in(self._probe):
+            logger.warning(
+                "WB session of user {} looks expired, booking may fail",
+                client.tg_user_id,
+            )
+
+    async def on_slots(self, slots: list[Slot], detected_at: float) -> None:
+        """Слушатель ``SlotWatcher``: запускает бронирование и сразу возвращает управление."""
+
+        for armed in list(self._armed.values()):
+            if armed.firing:
+                continue
+            candidates = sorted(
+                (s for s in slots if armed.draft.accepts(s)),
+                key=lambda s: (s.coefficient, s.date),
+            )[: self._max_slots]
+            if not candidates:
+                continue
+            armed.firing = True
+            task = asyncio.create_task(self._book(armed, candidates, detected_at))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _book(self, armed: _Armed, candidates: list[Slot], detected_at: float) -> None:
+        draft = armed.draft
+        winner: Slot | None = None
+        outcome = _Outcome.REJECTED
+        try:
+            try:
+                client = await self._client(draft.tg_user_id)
+            except Exception:  # noqa: BLE001
+                # задачу никто не ждёт: без этого ошибка всплыла бы только при сборке мусора
+                logger.opt(exception=True).warning(
+                    "No WB client to book supply {} of user {}",
+                    draft.supply_id,
+                    draft.tg_user_id,
+                )
+                metrics.inc("booking.missed")
+                return
+            for slot in candidates:
+                outcome = await self._send(client, armed, slot, detected_at)
+                if outcome is _Outcome.REJECTED:
+                    continue
+                if outcome is not _Outcome.THROTTLED:
+                    winner = slot
+                break
+        finally:
+            armed.firing = False
+
+        if winner is None:
+            metrics.inc("booking.missed")
+            logger.info("Booking for supply {} missed {} slots", draft.supply_id, len(candidates))
+            return
+        await self.disarm(draft.tg_user_id, draft.supply_id)
+        if outcome is _Outcome.UNKNOWN:
+            metrics.inc("booking.unknown")
+            logger.warning(
+                "Booking of supply {} for {} has unknown outcome, disarmed; check the cabinet",
+                draft.supply_id,
+                winner.date,
+            )
+            return
+        latency_ms = (time.monotonic() - detected_at) * 1000
+        metrics.inc("booking.booked")
+        metrics.observe("booking.detect_to_booked_ms", latency_ms)
+        logger.info(
+            "Booked supply {} on warehouse {} for {} in {:.0f} ms",
+            draft.supply_id,
+            winner.warehouse_id,
+            winner.date,
+            latency_ms,
+        )
+        if self._on_booked is not None:
+            await self._on_booked(BookingResult(draft, winner, latency_ms))
+
+    async def _send(
+        self,
+        client: WBHttpClient,
+        armed: _Armed,
+        slot: Slot,
+        detected_at: float,
+    ) -> _Outcome:
+        def sent() -> None:
+            metrics.observe("booking.detect_to_send_ms", (time.monotonic() - detected_at) * 1000)
+
+        supply_id = armed.draft.supply_id
+        try:
+            response = await client.book_supply(supply_id, armed.body_for(slot), on_send=sent)
+        except httpx.HTTPError as exc:
+            # запрос мог дойти до WB: повторять по другому слоту нельзя
+            logger.warning("Booking request for supply {} failed: {}", supply_id, exc)
+            return _Outcome.UNKNOWN
+        if response.is_success:
+            return _Outcome.BOOKED
+        logger.info(
+            "WB rejected booking of supply {} for {}: {}",
+            supply_id,
+            slot.date,
+            response.status_code,
+        )
+        if response.status_code == httpx.codes.TOO_MANY_REQUESTS:
+            return _Outcome.THROTTLED
+        if response.is_client_error:
+            return _Outcome.REJECTED
+        return _Outcome.UNKNOWN
+
+    def start(self) -> None:
+        if self._warmer is None or self._warmer.done():
+            self._warmer = asyncio.create_task(self._warm_loop(), name="booking-warmer")
+
+    async def _warm_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._warm_interval)
+            for _, client in list(self._leases.values()):
+                await self._warm(client)
+
+    async def stop(self) -> None:
+        warmer, self._warmer = self._warmer, None
+        if warmer is not None:
+            warmer.cancel()
+            with suppress(asyncio.CancelledError):
+                await warmer
+        for task in list(self._inflight):
+            task.cancel()
+        await asyncio.gather(*self._inflight, return_exceptions=True)
+        for tg_user_id in list(self._leases):
+            await self._release(tg_user_id)
+
+
+def make_booking_executor(watcher: SlotWatcher, on_booked: OnBooked) -> BookingExecutor:
+    return BookingExecutor(
+        watcher,
+        on_booked=on_booked,
+        max_slots=settings.booking_max_slots,
+        warm_interval=settings.booking_warm_interval,
+    )
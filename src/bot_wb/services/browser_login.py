@@ -2,15 +2,20 @@ from __future__ import annotations
 
 import asyncio
 from collections.abc import Iterable, Mapping
+from contextlib import AsyncExitStack, suppress
 from typing import Any
 from urllib.parse import urlparse
 
-from playwright.async_api import Browser, BrowserContext, Playwright, async_playwright
+import httpx
+from playwright.async_api import BrowserContext, Error, Frame, Response
 
+from bot_wb import metrics
 from bot_wb.logging import logger
 from bot_wb.settings import settings
-from bot_wb.storage.session import CookieStorage
+from bot_wb.storage.session import BrowserStateStorage, open_cookie_storage
 
+from .browser_pool import BrowserPool, browser_pool
+from .client_registry import client_registry
 from .wb_http_client import WBHttpClient
 
 WB_AUTH_DOMAINS = {"seller-auth.wildberries.ru", "seller.wildberries.ru"}
@@ -20,29 +25,80 @@ IMPORTANT_COOKIES = {
     "wbx-refresh",
 }
 
+# страховочная проверка cookie без событий страницы, секунд
+COOKIE_FALLBACK_INTERVAL = 5.0
+
+
+def _is_wb_host(host: str) -> bool:
+    # cookie сессии могут прийти с любого поддомена WB, не только со страницы входа
+    return host == "wildberries.ru" or host.endswith(".wildberries.ru")
+
+
+def pick_cookies(
+    cookies: Iterable[Mapping[str, Any]],
+    allowed_domains: set[str] = WB_AUTH_DOMAINS,
+) -> dict[str, str]:
+    jar: dict[str, str] = {}
+    for c in cookies:
+        domain = (c.get("domain") or "").lstrip(".")
+        name = c.get("name")
+        value = c.get("value")
+        if not name or value is None:
+            continue
+        if any(domain.endswith(d) for d in allowed_domains):
+            jar[name] = value
+    return jar
+
+
+async def validate_session(tg_user_id: int, jar: dict[str, str]) -> bool:
+    """HTTP-проверка сессии с cookie из браузера; при успехе cookie сохраняются.
+
+    Сетевые ошибки (в том числе открытый breaker и пауза лимитера) не считаются
+    ответом «не залогинен»: ``httpx.HTTPError`` летит вызывающему.
+    """
+
+    storage = open_cookie_storage(tg_user_id)
+    # конструктор читает сохранённые cookies — не на event loop
+    client = await asyncio.to_thread(
+        WBHttpClient,
+        tg_user_id,
+        storage=storage,
+        transport=client_registry.shared_transport(),
+    )
+    try:
+        client.update_cookies(jar)
+        ok = await client.check_session()
+        if ok:
+            await asyncio.to_thread(storage.save, jar)
+        return ok
+    finally:
+        await client.aclose()
+
+
+async def save_browser_state(tg_user_id: int, ctx: BrowserContext) -> None:
+    """Сохраняет полный ``storage_state`` контекста для тихого обновления сессии."""
+
+    state = await ctx.storage_state()
+    await asyncio.to_thread(BrowserStateStorage(tg_user_id).save, dict(state))
+
 
 class BrowserLogin:
     """
     Открывает реальное окно авторизации WB Seller. Пользователь проходит вход вручную.
     После редиректа/успешного входа — сохраняем куки для доменов WB_AUTH_DOMAINS.
+
+    Окно — отдельный контекст общего Chromium из ``BrowserPool``.
     """
 
-    def __init__(self, tg_user_id: int):
+    def __init__(self, tg_user_id: int, pool: BrowserPool | None = None):
         self.tg_user_id = tg_user_id
-        self._pw: Playwright | None = None
-        self._browser: Browser | None = None
+        self._pool = pool if pool is not None else browser_pool
+        self._stack = AsyncExitStack()
         self._ctx: BrowserContext | None = None
 
     async def __aenter__(self) -> BrowserLogin:
         try:
-            self._pw = await async_playwright().start()
-            self._browser = await self._pw.chromium.launch(
-                headless=False,
-                args=["--no-sandbox", "--disable-dev-shm-usage"],
-            )
-            self._ctx = await self._browser.new_context(
-                viewport={"width": 1280, "height": 860},
-            )
+            self._ctx = await self._stack.enter_async_context(self._pool.context(self.tg_user_id))
         except Exception as exc:
             logger.opt(exception=True).error(
                 "Failed to initialize Playwright browser: {}",
@@ -52,73 +108,96 @@ class BrowserLogin:
         return self
 
     async def __aexit__(self, exc_type, exc, tb) -> None:  # noqa: ANN001
-        try:
-            if self._ctx:
-                await self._ctx.close()
-        finally:
-            if self._browser:
-                await self._browser.close()
-            if self._pw:
-                await self._pw.stop()
+        self._ctx = None
+        await self._stack.aclose()
 
     async def run_flow(self, timeout_sec: int = 420) -> bool:
         """
         Открывает страницу логина и ждёт реальную валидную сессию.
         Успех фиксируется только после появления нужных cookie и успешной HTTP-проверки.
+
+        Вместо опроса раз в секунду поток просыпается от событий страницы:
+        навигации главного фрейма и ответов доменов WB с ``Set-Cookie``
+        (плюс редкая страховочная проверка — cookie может выставить и JS).
+        Чтение cookie локально и дёшево; HTTP-проверка в WB идёт только когда
+        набор важных cookie изменился с прошлой проверки.
         """
 
-        assert self._ctx is not None
         ctx = self._ctx
         if ctx is None:
             raise RuntimeError("Browser context is not initialized")
         page = await ctx.new_page()
-        await page.goto(settings.wb_seller_auth_url, wait_until="domcontentloaded")
-
-        logger.info("WB auth window opened for user {}", self.tg_user_id)
-
-        deadline = asyncio.get_event_loop().time() + timeout_sec
-
-        async def collect_and_check() -> bool:
-            cookies = await ctx.cookies()
-            jar = self._pick_cookies(cookies, WB_AUTH_DOMAINS)
-            if not any(name in jar for name in IMPORTANT_COOKIES):
-                return False
-            storage = CookieStorage(self.tg_user_id)
-            client = WBHttpClient(self.tg_user_id, storage=storage)
-            try:
-                client.update_cookies(jar)
-                ok = await client.is_logged_in()
+        changed = asyncio.Event()
+
+        def on_navigated(frame: Frame) -> None:
+            if frame is page.main_frame:
+                changed.set()
+
+        async def on_response(response: Response) -> None:
+            host = urlparse(response.url).hostname or ""
+            if not _is_wb_host(host):
+                return
+            # ``response.headers`` не содержит cookie-заголовков — только полный набор
+            with suppress(Error):
+                if await response.header_value("set-cookie") is not None:
+                    changed.set()
+
+        page.on("framenavigated", on_navigated)
+        ctx.on("response", on_response)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout_sec
+        checked: dict[str, str] | None = None
+        try:
+            await page.goto(settings.wb_seller_auth_url, wait_until="domcontentloaded")
+            logger.info("WB auth window opened for user {}", self.tg_user_id)
+            opened = loop.time()
+
+            while (left := deadline - loop.time()) > 0:
+                with suppress(TimeoutError):
+                    await asyncio.wait_for(changed.wait(), min(left, COOKIE_FALLBACK_INTERVAL))
+                changed.clear()
+                jar = self._pick_cookies(await ctx.cookies(), WB_AUTH_DOMAINS)
+                important = {k: v for k, v in jar.items() if k in IMPORTANT_COOKIES}
+                if not important or important == checked:
+                    continue
+                try:
+                    ok = await self._validate(jar)
+                except httpx.HTTPError as exc:
+                    # ответа нет — те же cookie проверим снова на следующем пробуждении
+                    logger.info(
+                        "WB session check for user {} failed, will retry: {}",
+                        self.tg_user_id,
+                        exc,
+                    )
+                    continue
+                checked = important
                 if ok:
-                    storage.save(jar)
-                return ok
-            finally:
-                await client.aclose()
-
-        while asyncio.get_event_loop().time() < deadline:
-            url = page.url or ""
-            host = urlparse(url).hostname or ""
-            if host.endswith("seller.wildberries.ru"):
-                await asyncio.sleep(1.0)
-                if await collect_and_check():
-                    logger.info("WB auth completed for user {}", self.tg_user_id)
+                    await save_browser_state(self.tg_user_id, ctx)
+                    logger.info(
+                        "WB auth completed for user {} in {:.1f}s",
+                        self.tg_user_id,
+                        loop.time() - opened,
+                    )
                     return True
-            await asyncio.sleep(1.0)
+        finally:
+            page.remove_listener("framenavigated", on_navigated)
+            ctx.remove_listener("response", on_response)
 
         logger.warning("WB auth timed out for user {}", self.tg_user_id)
         return False
 
+    async def _validate(self, jar: dict[str, str]) -> bool:
+        """HTTP-проверка сессии с новыми cookie; при успехе cookie сохраняются.
+
+        Сетевая ошибка пробрасывается как ``httpx.HTTPError`` (см. ``validate_session``).
+        """
+
+        metrics.inc("login.validations")
+        return await validate_session(self.tg_user_id, jar)
+
     def _pick_cookies(
         self,
         cookies: Iterable[Mapping[str, Any]],
         allowed_domains: set[str],
     ) -> dict[str, str]:
-        jar: dict[str, str] = {}
-        for c in cookies:
-            domain = (c.get("domain") or "").lstrip(".")
-            name = c.get("name")
-            value = c.get("value")
-            if not name or value is None:
-                continue
-            if any(domain.endswith(d) for d in allowed_domains):
-                jar[name] = value
-        return jar
+        return pick_cookies(cookies, allowed_domains)
@@ -0,0 +1,210 @@
+"""Общий Chromium для окон входа WB с изолированным контекстом на пользователя.
+
+Драйвер Playwright и браузер запускаются один раз (лениво или через
+``warm``) и остаются «тёплыми»; каждому входу выдаётся свой
+``BrowserContext`` — отдельные cookies и storage, — который закрывается
+сразу после входа. Одновременно открыто не больше ``capacity`` контекстов:
+ёмкость считается из бюджета памяти ``BROWSER_MEMORY_BUDGET_MB`` за вычетом
+самого браузера, остальные ждут очереди. Упавший браузер перезапускается при
+следующей выдаче контекста, а после ``recycle_after`` контекстов браузер
+перезапускается в момент простоя, чтобы не копить утечки памяти.
+
+Тихое обновление сессий идёт в headless-браузере; если окна входа не headless,
+это второй Chromium, и его память (браузер плюс ``SESSION_REFRESH_CONCURRENCY``
+контекстов) вычитается из того же бюджета.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager, suppress
+from typing import Any, cast
+
+from playwright.async_api import (
+    Browser,
+    BrowserContext,
+    Error,
+    Playwright,
+    StorageState,
+    ViewportSize,
+    async_playwright,
+)
+
+from bot_wb import metrics
+from bot_wb.logging import logger
+from bot_wb.settings import settings
+
+Launcher = Callable[[], Awaitable[Browser]]
+
+LAUNCH_ARGS = ["--no-sandbox", "--disable-dev-shm-usage"]
+VIEWPORT: ViewportSize = {"width": 1280, "height": 860}
+
+
+def capacity_for(budget_mb: int, base_mb: int, context_mb: int, *, reserved_mb: int = 0) -> int:
+    """Сколько контекстов помещается в бюджет памяти (не меньше одного).
+
+    ``reserved_mb`` — часть бюджета, уже занятая другим браузером.
+    """
+
+    return max(1, (budget_mb - reserved_mb - base_mb) // max(1, context_mb))
+
+
+class BrowserPool:
+    def __init__(
+        self,
+        *,
+        capacity: int = 4,
+        recycle_after: int = 50,
+        headless: bool = False,
+        launcher: Launcher | None = None,
+    ) -> None:
+        self.capacity = capacity
+        self._recycle_after = recycle_after
+        self._headless = headless
+        self._launcher = launcher or self._launch_chromium
+        self._slots = asyncio.Semaphore(capacity)
+        self._lock = asyncio.Lock()
+        self._playwright: Playwright | None = None
+        self._browser: Browser | None = None
+        self._active = 0
+        self._served = 0
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def full(self) -> bool:
+        """Все контексты заняты: новый запрос встанет в очередь."""
+
+        return self._slots.locked()
+
+    @property
+    def running(self) -> bool:
+        return self._browser is not None and self._browser.is_connected()
+
+    async def _launch_chromium(self) -> Browser:
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        return await self._playwright.chromium.launch(headless=self._headless, args=LAUNCH_ARGS)
+
+    async def _ensure_browser(self) -> Browser:
+        async with self._lock:
+            browser = self._browser
+            if browser is not None and browser.is_connected():
+                return browser
+            if browser is not None:
+                logger.warning("Chromium is gone, relaunching")
+                metrics.inc("browser.restarts")
+            browser = await self._launcher()
+            browser.on("disconnected", self._on_disconnected)
+            self._browser = browser
+            self._served = 0
+            metrics.inc("browser.launches")
+            logger.info("Chromium launched for login pool (capacity {})", self.capacity)
+            return browser
+
+    def _on_disconnected(self, browser: Any) -> None:
+        if browser is self._browser:
+            logger.warning("Chromium disconnected, {} login contexts affected", self._active)
+
+    async def warm(self) -> None:
+        """Запускает браузер заранее, чтобы первый вход не ждал старта Chromium."""
+
+        try:
+            await self._ensure_browser()
+        except Error as exc:
+            logger.warning("Chromium pre-warm failed: {}", exc)
+
+    async def _new_context(self, storage_state: dict[str, Any] | None) -> BrowserContext:
+        state = cast("StorageState | None", storage_state)
+        browser = await self._ensure_browser()
+        try:
+            return await browser.new_context(viewport=VIEWPORT, storage_state=state)
+        except Error:
+            if browser.is_connected():
+                raise
+            # браузер упал между проверкой и запросом — одна попытка на новом
+            browser = await self._ensure_browser()
+            return await browser.new_context(viewport=VIEWPORT, storage_state=state)
+
+    @asynccontextmanager
+    async def context(
+        self,
+        tg_user_id: int,
+        *,
+        storage_state: dict[str, Any] | None = None,
+    ) -> AsyncIterator[BrowserContext]:
+        """Изолированный контекст на время входа; ``storage_state`` — сохранённая сессия."""
+
+        if self._slots.locked():
+            metrics.inc("browser.queued")
+            logger.info("Login browser pool is full, user {} waits for a slot", tg_user_id)
+        async with self._slots:
+            self._active += 1
+            try:
+                ctx = await self._new_context(storage_state)
+                metrics.inc("browser.contexts")
+                try:
+                    yield ctx
+                finally:
+                    with suppress(Error):
+                        await ctx.close()
+            finally:
+                self._active -= 1
+                self._served += 1
+                await self._maybe_recycle()
+
+    async def _maybe_recycle(self) -> None:
+        if self._active or self._served < self._recycle_after:
+            return
+        async with self._lock:
+            browser, self._browser = self._browser, None
+        if browser is not None:
+            logger.info("Recycling Chromium after {} login contexts", self._served)
+            with suppress(Error):
+                await browser.close()
+        self._served = 0
+
+    async def aclose(self) -> None:
+        async with self._lock:
+            browser, self._browser = self._browser, None
+            playwright, self._playwright = self._playwright, None
+        if browser is not None:
+            with suppress(Error):
+                await browser.close()
+        if playwright is not None:
+            with suppress(Error):
+                await playwright.stop()
+
+
+# отдельный headless-браузер тихого обновления нужен, только если окна входа с окном
+REFRESH_RESERVED_MB = (
+    0
+    if settings.browser_headless
+    else settings.browser_base_mb
+    + settings.session_refresh_concurrency * settings.browser_context_mb
+)
+
+browser_pool = BrowserPool(
+    capacity=capacity_for(
+        settings.browser_memory_budget_mb,
+        settings.browser_base_mb,
+        settings.browser_context_mb,
+        reserved_mb=REFRESH_RESERVED_MB,
+    ),
+    recycle_after=settings.browser_recycle_after,
+    headless=settings.browser_headless,
+)
+
+# тихое обновление сессий всегда без окна; если окна входа тоже headless — один браузер
+refresh_pool = (
+    browser_pool
+    if settings.browser_headless
+    else BrowserPool(
+        capacity=settings.session_refresh_concurrency,
+        recycle_after=settings.browser_recycle_after,
+        headless=True,
+    )
+)
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager, suppress
+from dataclasses import dataclass
+
+import httpx
+
+from bot_wb.logging import logger
+from bot_wb.settings import settings
+
+from .transport import make_transport
+from .wb_http_client import WBHttpClient
+
+ClientFactory = Callable[..., WBHttpClient]
+
+
+class SharedTransport(httpx.AsyncBaseTransport):
+    """Обёртка над общим транспортом: клиенты не закрывают пул соединений сами."""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport) -> None:
+        self._inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._inner.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        return None
+
+
+@dataclass
+class _Lease:
+    client: WBHttpClient
+    last_used: float
+    active: int = 0
+    # выброшен через invalidate, пока был занят: закрывается последним освобождающим
+    stale: bool = False
+
+
+class WBClientRegistry:
+    """Долгоживущие per-user ``WBHttpClient`` поверх общего keep-alive пула.
+
+    Cookies у каждого пользователя свои, а TCP/TLS-соединения к WB общие и
+    переживают отдельные нажатия кнопок. Простаивающие клиенты закрываются
+    фоновой задачей, число клиентов ограничено ``max_clients``.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_clients: int = 1000,
+        idle_ttl: float = 300.0,
+        factory: ClientFactory = WBHttpClient,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self._max_clients = max_clients
+        self._idle_ttl = idle_ttl
+        self._factory = factory
+        self._transport = transport
+        self._clients: OrderedDict[int, _Lease] = OrderedDict()
+        self._sweeper: asyncio.Task[None] | None = None
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def shared_transport(self) -> SharedTransport:
+        if self._transport is None:
+            self._transport = make_transport()
+        return SharedTransport(self._transport)
+
+    @asynccontextmanager
+    async def client(self, tg_user_id: int) -> AsyncIterator[WBHttpClient]:
+        lease = self._clients.get(tg_user_id)
+        created = False
+        spare: WBHttpClient | None = None
+        if lease is None:
+            # конструктор читает cookies из хранилища (файл или SQLite) — не на event loop
+            client = await asyncio.to_thread(
+                self._factory,
+                tg_user_id,
+                transport=self.shared_transport(),
+            )
+            lease = self._clients.get(tg_user_id)
+            if lease is None:
+                lease = self._clients[tg_user_id] = _Lease(client, time.monotonic())
+                created = True
+            else:
+                # параллельный вызов успел создать клиента раньше
+                spare = client
+        self._clients.move_to_end(tg_user_id)
+        lease.active += 1
+        if spare is not None:
+            await self._close(_Lease(spare, time.monotonic()), persist=False)
+        if created:
+            await self._enforce_limit()
+        try:
+            yield lease.client
+        finally:
+            lease.active -= 1
+            lease.last_used = time.monotonic()
+            if lease.stale and not lease.active:
+                await self._close(lease, persist=False)
+
+    def is_current(self, tg_user_id: int, client: WBHttpClient) -> bool:
+        """False, если клиента сбросил ``invalidate``: долгим арендаторам пора взять новый."""
+
+        lease = self._clients.get(tg_user_id)
+        return lease is not None and lease.client is client
+
+    async def invalidate(self, tg_user_id: int) -> None:
+        """Закрывает клиента пользователя (после логина/логаута cookies другие).
+
+        Несохранённые cookies клиента отбрасываются, чтобы не затереть новую сессию.
+        Занятый клиент только помечается устаревшим: следующий ``client()`` получит
+        новый, а старый закроется, когда его отпустит последний держатель.
+        """
+
+        lease = self._clients.pop(tg_user_id, None)
+        if lease is None:
+            return
+        if lease.active:
+            lease.stale = True
+            # держатели ещё шлют запросы, но их cookies уже не должны попасть на диск
+            await lease.client.discard_cookies()
+            return
+        await self._close(lease, persist=False)
+
+    async def _enforce_limit(self) -> None:
+        excess = len(self._clients) - self._max_clients
+        if excess <= 0:
+            return
+        idle = [tg_id for tg_id, lease in self._clients.items() if not lease.active]
+        for tg_id in idle[:excess]:
+            await self._close(self._clients.pop(tg_id))
+        if len(self._clients) > self._max_clients:
+            logger.warning(
+                "WB client registry over limit: {} busy clients (max {})",
+                len(self._clients),
+                self._max_clients,
+            )
+
+    async def evict_idle(self) -> int:
+        deadline = time.monotonic() - self._idle_ttl
+        expired = [
+            tg_id
+            for tg_id, lease in self._clients.items()
+            if not lease.active and lease.last_used < deadline
+        ]
+        for tg_id in expired:
+            await self._close(self._clients.pop(tg_id))
+        return len(expired)
+
+    async def _close(self, lease: _Lease, *, persist: bool = True) -> None:
+        try:
+            await lease.client.aclose(persist=persist)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Failed to close WB client {}: {}", lease.client.tg_user_id, exc)
+
+    def start(self) -> None:
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_loop(), name="wb-client-sweeper")
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(max(self._idle_ttl / 2, 1.0))
+            evicted = await self.evict_idle()
+            if evicted:
+                logger.debug("Evicted {} idle WB clients", evicted)
+
+    async def aclose(self) -> None:
+        sweeper, self._sweeper = self._sweeper, None
+        if sweeper is not None:
+            sweeper.cancel()
+            with suppress(asyncio.CancelledError):
+                await sweeper
+        clients, self._clients = self._clients, OrderedDict()
+        for lease in clients.values():
+            await self._close(lease)
+        transport, self._transport = self._transport, None
+        if transport is not None:
+            await transport.aclose()
+
+
+client_registry = WBClientRegistry(
+    max_clients=settings.wb_max_clients,
+    idle_ttl=settings.wb_client_idle_ttl,
+)
@@ -0,0 +1,221 @@
+"""Очередь интерактивных входов WB с ограничением параллельности.
+
+Каждый вход — фоновая задача, не связанная с обработчиком апдейта: её не
+отменит ни таймаут, ни отмена обработчика, только ``cancel`` (кнопка
+пользователя) или остановка бота. Одновременно выполняется не больше
+``concurrency`` входов, остальные ждут в очереди FIFO длиной до
+``queue_limit`` — сверх неё новые входы отклоняются. Повторное нажатие
+«Авторизация» возвращает уже идущий вход пользователя. Каждое изменение
+(позиция в очереди, старт, итог) передаётся в ``notify`` задачи; новые
+позиции ожидающих рассылает отдельная задача, чтобы правки сообщений не
+задерживали старт входа.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from contextlib import suppress
+from dataclasses import dataclass, field
+from enum import Enum
+
+from bot_wb import metrics
+from bot_wb.logging import logger
+from bot_wb.settings import settings
+from bot_wb.storage.uow import detached_context
+
+from .browser_pool import browser_pool
+
+
+class LoginState(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+    REJECTED = "rejected"
+
+    @property
+    def final(self) -> bool:
+        return self not in (LoginState.QUEUED, LoginState.RUNNING)
+
+
+Notify = Callable[["LoginJob"], Awaitable[None]]
+RunLogin = Callable[[int], Awaitable[bool]]
+
+
+@dataclass(eq=False)
+class LoginJob:
+    tg_user_id: int
+    run: RunLogin
+    notify: Notify
+    state: LoginState = LoginState.QUEUED
+    position: int = 0
+    enqueued_at: float = field(default_factory=time.monotonic)
+    task: asyncio.Task[None] | None = None
+    # правки статуса одного входа не обгоняют друг друга
+    notify_lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)
+
+
+class LoginJobManager:
+    def __init__(self, *, concurrency: int = 2, queue_limit: int = 50) -> None:
+        self._concurrency = concurrency
+        self._queue_limit = queue_limit
+        self._jobs: dict[int, LoginJob] = {}
+        self._queue: deque[LoginJob] = deque()
+        self._running = 0
+        self._wakeup = asyncio.Condition()
+        # ожидающие, чья позиция изменилась (упорядоченное множество)
+        self._moved: dict[LoginJob, None] = {}
+        self._notifier: asyncio.Task[None] | None = None
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    def get(self, tg_user_id: int) -> LoginJob | None:
+        return self._jobs.get(tg_user_id)
+
+    async def submit(self, tg_user_id: int, run: RunLogin, notify: Notify) -> LoginJob:
+        """Ставит вход в очередь; если вход пользователя уже идёт — возвращает его."""
+
+        job = self._jobs.get(tg_user_id)
+        if job is not None:
+            metrics.inc("login.deduplicated")
+            # кнопку могли нажать из другого сообщения — показываем статус туда
+            job.notify = notify
+            await self._notify(job)
+            return job
+        job = LoginJob(tg_user_id, run, notify)
+        # свободные слоты разберут головы очереди сразу — ждать будут остальные
+        free = max(0, self._concurrency - self._running)
+        if len(self._queue) - free >= self._queue_limit:
+            metrics.inc("login.rejected")
+            job.state = LoginState.REJECTED
+            await self._notify(job)
+            return job
+        self._jobs[tg_user_id] = job
+        self._queue.append(job)
+        job.position = len(self._queue)
+        # задача не наследует UoW апдейта и не отменяется вместе с обработчиком
+        job.task = asyncio.create_task(
+            self._run(job),
+            name=f"login-{tg_user_id}",
+            context=detached_context(),
+        )
+        metrics.inc("login.queued")
+        return job
+
+    async def cancel(self, tg_user_id: int) -> bool:
+        job = self._jobs.get(tg_user_id)
+        if job is None or job.task is None:
+            return False
+        job.task.cancel()
+        with suppress(asyncio.CancelledError):
+            await job.task
+        return True
+
+    async def _run(self, job: LoginJob) -> None:
+        try:
+            await self._notify(job)
+            async with self._wakeup:
+                await self._wakeup.wait_for(
+                    lambda: self._running < self._concurrency and self._queue[0] is job,
+                )
+                self._queue.popleft()
+                self._running += 1
+                job.position = 0
+                # следующий в очереди может стартовать, если есть свободный слот
+                self._wakeup.notify_all()
+            # слот занят: всё дальше, включая правку статуса в Telegram, — под finally
+            try:
+                self._reposition()
+                job.state = LoginState.RUNNING
+                metrics.observe(
+                    "login.queue_wait_ms",
+                    (time.monotonic() - job.enqueued_at) * 1000,
+                )
+                await self._notify(job)
+                ok = await job.run(job.tg_user_id)
+            finally:
+                async with self._wakeup:
+                    self._running -= 1
+                    self._wakeup.notify_all()
+            job.state = LoginState.SUCCEEDED if ok else LoginState.FAILED
+        except asyncio.CancelledError:
+            job.state = LoginState.CANCELLED
+            if job in self._queue:
+                self._queue.remove(job)
+                async with self._wakeup:
+                    self._wakeup.notify_all()
+                self._reposition()
+            logger.info("Login of user {} cancelled", job.tg_user_id)
+        except Exception:  # noqa: BLE001
+            job.state = LoginState.FAILED
+            logger.opt(exception=True).error("Login job of user {} failed", job.tg_user_id)
+        finally:
+            self._jobs.pop(job.tg_user_id, None)
+        metrics.inc(f"login.{job.state.value}")
+        await self._notify(job)
+
+    def _reposition(self) -> None:
+        """Пересчитывает позиции очереди; уведомления уходят в фоновой задаче."""
+
+        for position, queued in enumerate(self._queue, start=1):
+            if queued.position != position:
+                queued.position = position
+                self._moved[queued] = None
+        if self._moved and (self._notifier is None or self._notifier.done()):
+            self._notifier = asyncio.create_task(
+                self._notify_moved(),
+                name="login-reposition",
+                context=detached_context(),
+            )
+
+    async def _notify_moved(self) -> None:
+        while self._moved:
+            job = next(iter(self._moved))
+            async with job.notify_lock:
+                # позиция могла смениться ещё раз, пока ждали: уйдёт одна правка с последней
+                self._moved.pop(job, None)
+                # стартовавший или снятый вход сообщает о себе сам
+                if job.state is LoginState.QUEUED:
+                    await self._send(job)
+
+    async def _notify(self, job: LoginJob) -> None:
+        async with job.notify_lock:
+            await self._send(job)
+
+    async def _send(self, job: LoginJob) -> None:
+        try:
+            await job.notify(job)
+        except Exception:  # noqa: BLE001
+            logger.opt(exception=True).warning("Login status update for {} failed", job.tg_user_id)
+
+    async def stop(self) -> None:
+        for tg_user_id in list(self._jobs):
+            await self.cancel(tg_user_id)
+        notifier, self._notifier = self._notifier, None
+        self._moved.clear()
+        if notifier is not None:
+            notifier.cancel()
+            with suppress(asyncio.CancelledError):
+                await notifier
+
+
+def login_concurrency() -> int:
+    """``LOGIN_CONCURRENCY`` или, если не задан, ёмкость пула браузеров."""
+
+    return settings.login_concurrency if settings.login_concurrency > 0 else browser_pool.capacity
+
+
+login_jobs = LoginJobManager(
+    concurrency=login_concurrency(),
+    queue_limit=settings.login_queue_limit,
+)
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import suppress
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+from bot_wb import metrics
+from bot_wb.settings import settings
+
+# сколько per-account корзин держим, прежде чем выбрасывать полностью восстановленные
+MAX_IDLE_BUCKETS = 10_000
+
+
+class RateLimitedError(httpx.TransportError):
+    """Лимитер на паузе дольше, чем готов ждать вызывающий; запрос не отправлялся."""
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Сколько ждать до появления токена (0 — можно брать сейчас)."""
+
+        self._refill(now)
+        pause = self.paused_until - now
+        lack = (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0
+        return max(pause, lack, 0.0)
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def pause(self, now: float, delay: float) -> None:
+        self.paused_until = max(self.paused_until, now + delay)
+
+    def is_idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.burst and self.paused_until <= now
+
+
+class RateLimiter:
+    """Общий на процесс лимитер запросов к WB: глобальная и per-account корзины.
+
+    Ожидающие запросы стоят в очередях по аккаунтам, диспетчер обходит аккаунты
+    по кругу, поэтому один продавец с сотней запросов не задерживает остальных.
+    """
+
+    def __init__(
+        self,
+        *,
+        global_rate: float,
+        global_burst: float,
+        account_rate: float,
+        account_burst: float,
+        max_pause: float = 300.0,
+    ) -> None:
+        self._global = TokenBucket(global_rate, global_burst)
+        # Retry-After длиннее этого не выдерживаем: один ответ не должен встать на сутки
+        self._max_pause = max_pause
+        self._account_rate = account_rate
+        self._account_burst = account_burst
+        self._buckets: dict[int, TokenBucket] = {}
+        self._queues: OrderedDict[int, deque[asyncio.Future[None]]] = OrderedDict()
+        self._dispatcher: asyncio.Task[None] | None = None
+        self._wakeup: asyncio.Event | None = None
+        self.max_wait = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "queue_depth": self.queue_depth,
+            "accounts_waiting": len(self._queues),
+            "acquired": metrics.get("wb_rate.acquired"),
+            "waited_ms": metrics.get("wb_rate.wait_ms"),
+            "max_wait_ms": round(self.max_wait * 1000),
+        }
+
+    def _bucket(self, account: int) -> TokenBucket:
+        bucket = self._buckets.get(account)
+        if bucket is None:
+            if len(self._buckets) >= MAX_IDLE_BUCKETS:
+                self._prune(time.monotonic())
+            bucket = TokenBucket(self._account_rate, self._account_burst)
+            self._buckets[account] = bucket
+        return bucket
+
+    def _prune(self, now: float) -> None:
+        for account in [a for a, b in self._buckets.items() if b.is_idle(now)]:
+            if account not in self._queues:
+                del self._buckets[account]
+
+    async def acquire(self, account: int, *, max_wait: float | None = None) -> float:
+        """Ждёт разрешения на запрос от имени ``account``, возвращает время ожидания.
+
+        Если пауза по Retry-After длиннее ``max_wait``, сразу бросает
+        ``RateLimitedError``: вызывающий всё равно не дождётся.
+        """
+
+        started = time.monotonic()
+        bucket = self._bucket(account)
+        pause = max(self._global.paused_until, bucket.paused_until) - started
+        if max_wait is not None and pause > max_wait:
+            metrics.inc("wb_rate.rejected")
+            raise RateLimitedError(f"WB requests paused for {pause:.0f}s by Retry-After")
+        if (
+            not self._queues
+            and self._global.wait_time(started) == 0
+            and bucket.wait_time(started) == 0
+        ):
+            self._global.take()
+            bucket.take()
+            metrics.inc("wb_rate.acquired")
+            return 0.0
+
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(account, deque()).append(future)
+        self._ensure_dispatcher()
+        try:
+            await future
+        finally:
+            if not future.done():
+                future.cancel()
+        waited = time.monotonic() - started
+        self.max_wait = max(self.max_wait, waited)
+        metrics.inc("wb_rate.acquired")
+        metrics.inc("wb_rate.wait_ms", round(waited * 1000))
+        return waited
+
+    def penalize(self, account: int | None, delay: float) -> None:
+        """Учитывает Retry-After: ``account=None`` приостанавливает все запросы."""
+
+        now = time.monotonic()
+        target = self._global if account is None else self._bucket(account)
+        target.pause(now, min(delay, self._max_pause))
+        metrics.inc("wb_rate.penalties")
+
+    def _ensure_dispatcher(self) -> None:
+        loop = asyncio.get_running_loop()
+        task = self._dispatcher
+        if task is None or task.done() or task.get_loop() is not loop:
+            self._wakeup = asyncio.Event()
+            self._dispatcher = loop.create_task(self._dispatch(), name="wb-rate-limiter")
+        elif self._wakeup is not None:
+            self._wakeup.set()
+
+    def _next_ready(self, now: float) -> tuple[int | None, float]:
+        """Первый по кругу аккаунт, которому можно отдать токен, либо минимальное ожидание."""
+
+        min_wait = float("inf")
+        for account in list(self._queues):
+            queue = self._queues[account]
+            while queue and queue[0].done():
+                queue.popleft()
+            if not queue:
+                del self._queues[account]
+                continue
+            wait = self._bucket(account).wait_time(now)
+            if wait == 0:
+                return account, 0.0
+            min_wait = min(min_wait, wait)
+        return None, min_wait
+
+    async def _dispatch(self) -> None:
+        while self._queues:
+            now = time.monotonic()
+            wait = self._global.wait_time(now)
+            account = None
+            if wait == 0:
+                account, wait = self._next_ready(now)
+            if account is None:
+                if not self._queues:
+                    break
+                await self._sleep(wait)
+                continue
+            queue = self._queues.pop(account)
+            self._global.take()
+            self._bucket(account).take()
+            queue.popleft().set_result(None)
+            if queue:
+                # в конец круга: следующим обслуживается другой аккаунт
+                self._queues[account] = queue
+
+    async def _sleep(self, delay: float) -> None:
+        wakeup = self._wakeup
+        if wakeup is None:
+            await asyncio.sleep(delay)
+            return
+        wakeup.clear()
+        with suppress(TimeoutError):
+            await asyncio.wait_for(wakeup.wait(), timeout=delay)
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """``Retry-After`` в секундах: число либо HTTP-дата."""
+
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        pass
+    else:
+        # float() принимает и "inf"/"nan" — такой паузы не бывает
+        return max(seconds, 0.0) if math.isfinite(seconds) else None
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=UTC)
+    return max((when - datetime.now(UTC)).total_seconds(), 0.0)
+
+
+rate_limiter = RateLimiter(
+    global_rate=settings.wb_rate_global,
+    global_burst=settings.wb_rate_global_burst,
+    account_rate=settings.wb_rate_account,
+    account_burst=settings.wb_rate_account_burst,
+    max_pause=settings.wb_max_retry_after,
+)
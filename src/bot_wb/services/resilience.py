@@ -0,0 +1,162 @@
+"""Политика ретраев и circuit breaker для запросов к WB."""
+
+from __future__ import annotations
+
+import random
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+
+import httpx
+
+from bot_wb import metrics
+from bot_wb.logging import logger
+from bot_wb.settings import settings
+
+# ошибки, при которых запрос гарантированно не дошёл до WB
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Сколько и когда повторять запрос.
+
+    Паузы — «full jitter»: случайное значение от 0 до ``base_delay * 2**n``
+    (не больше ``max_delay``), чтобы параллельные обработчики не повторяли
+    запросы синхронно. ``endpoint_rules`` переопределяют идемпотентность для
+    конкретных ``(METHOD, path-prefix)``.
+    """
+
+    attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 5.0
+    retry_statuses: frozenset[int] = frozenset({429, 502, 503, 504})
+    idempotent_methods: frozenset[str] = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+    endpoint_rules: dict[tuple[str, str], bool] = field(default_factory=dict)
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def is_idempotent(self, method: str, path: str) -> bool:
+        method = method.upper()
+        best: tuple[int, bool] | None = None
+        for (rule_method, prefix), allowed in self.endpoint_rules.items():
+            matches = rule_method.upper() == method and path.startswith(prefix)
+            if matches and (best is None or len(prefix) > best[0]):
+                best = (len(prefix), allowed)
+        if best is not None:
+            return best[1]
+        return method in self.idempotent_methods
+
+    def can_retry_error(self, method: str, path: str, exc: httpx.RequestError) -> bool:
+        return isinstance(exc, NOT_SENT_ERRORS) or self.is_idempotent(method, path)
+
+
+class CircuitOpenError(httpx.TransportError):
+    """WB недоступен: breaker открыт, запрос не отправлялся."""
+
+
+class BreakerState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Breaker одного хоста: после ``failure_threshold`` подряд ошибок открывается.
+
+    В открытом состоянии запросы сразу падают с ``CircuitOpenError``. Через
+    ``reset_timeout`` пропускаются до ``half_open_max`` пробных запросов: успех
+    закрывает breaker, ошибка снова открывает.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        *,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        half_open_max: int = 1,
+    ) -> None:
+        self.host = host
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._half_open_max = half_open_max
+        self.state = BreakerState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+
+    def before_request(self) -> None:
+        if self.state is BreakerState.CLOSED:
+            return
+        if self.state is BreakerState.OPEN:
+            if time.monotonic() - self._opened_at < self._reset_timeout:
+                metrics.inc("wb_breaker.rejected")
+                raise CircuitOpenError(f"Circuit for {self.host} is open")
+            self.state = BreakerState.HALF_OPEN
+            self._probes = 0
+            logger.info("Circuit for {} is half-open, probing", self.host)
+        if self._probes >= self._half_open_max:
+            metrics.inc("wb_breaker.rejected")
+            raise CircuitOpenError(f"Circuit for {self.host} is half-open")
+        self._probes += 1
+
+    def release(self) -> None:
+        """Запрос прерван без результата (отмена): освобождает пробный слот."""
+
+        if self.state is BreakerState.HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def record_success(self) -> None:
+        if self.state is not BreakerState.CLOSED:
+            logger.info("Circuit for {} closed", self.host)
+        self.state = BreakerState.CLOSED
+        self._failures = 0
+        self._probes = 0
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self.state is BreakerState.HALF_OPEN or self._failures >= self._failure_threshold:
+            if self.state is not BreakerState.OPEN:
+                logger.warning(
+                    "Circuit for {} opened after {} failures",
+                    self.host,
+                    self._failures,
+                )
+                metrics.inc("wb_breaker.opened")
+            self.state = BreakerState.OPEN
+            self._opened_at = time.monotonic()
+            self._probes = 0
+
+
+class CircuitBreakers:
+    """Общие на процесс breaker-ы по хостам."""
+
+    def __init__(self, *, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def for_host(self, host: str) -> CircuitBreaker:
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                host,
+                failure_threshold=self._failure_threshold,
+                reset_timeout=self._reset_timeout,
+            )
+            self._breakers[host] = breaker
+        return breaker
+
+
+default_retry_policy = RetryPolicy(
+    attempts=settings.wb_retry_attempts,
+    base_delay=settings.wb_retry_base_delay,
+    max_delay=settings.wb_retry_max_delay,
+)
+
+circuit_breakers = CircuitBreakers(
+    failure_threshold=settings.wb_breaker_failures,
+    reset_timeout=settings.wb_breaker_reset,
+)
@@ -0,0 +1,166 @@
+"""Стратегии проверки живости сессии WB Seller.
+
+* ``full`` — прежняя проверка: скачать страницу целиком и искать маркеры в тексте;
+* ``stream`` — потоковое чтение, остановка на первом маркере или после ``max_bytes``;
+* ``redirect`` — без тела: статус, отсутствие редиректа на seller-auth и наличие
+  сессионных cookie; редиректы внутри кабинета (слеш, локаль) проходятся.
+
+Недочитанный ответ по HTTP/1.1 закрывает соединение (keep-alive теряется), по
+HTTP/2 сбрасывается только поток. Поэтому ``stream`` и ``redirect`` по HTTP/1.1
+дочитывают короткий остаток тела (до ``WB_PROBE_DRAIN_BYTES``) и возвращают
+соединение в пул; длинный остаток дешевле бросить вместе с соединением.
+Замеры: ``benchmarks/bench_session_probe.py``.
+"""
+
+from __future__ import annotations
+
+from collections.abc import AsyncIterator, Callable
+from typing import TYPE_CHECKING, Protocol
+from urllib.parse import urlparse
+
+import httpx
+
+from bot_wb import metrics
+from bot_wb.logging import logger
+from bot_wb.settings import settings
+
+if TYPE_CHECKING:
+    from .wb_http_client import WBHttpClient
+
+BODY_MARKERS = (b"seller", b"wildberries", b"<!doctype html")
+SESSION_COOKIES = ("wbx-validation-key", "wbx-refresh")
+# сколько редиректов внутри кабинета пройти, прежде чем сдаться
+MAX_REDIRECTS = 3
+
+
+class SessionProbe(Protocol):
+    name: str
+
+    async def __call__(self, client: WBHttpClient) -> bool: ...
+
+
+def _status_ok(response: httpx.Response) -> bool:
+    if response.status_code != httpx.codes.OK:
+        logger.info("WB auth health-check returned unexpected status {}", response.status_code)
+        return False
+    return True
+
+
+async def _release(
+    response: httpx.Response,
+    chunks: AsyncIterator[bytes],
+    drain_bytes: int,
+) -> None:
+    """Закрывает ответ, по HTTP/1.1 сначала дочитав короткий остаток тела."""
+
+    try:
+        if response.http_version != "HTTP/1.1" or response.is_closed:
+            return
+        length = response.headers.get("content-length")
+        if length is not None and length.isdigit() and int(length) > drain_bytes:
+            metrics.inc("wb_probe.connection_dropped")
+            return
+        drained = 0
+        async for chunk in chunks:
+            drained += len(chunk)
+            if drained > drain_bytes:
+                metrics.inc("wb_probe.connection_dropped")
+                return
+        metrics.inc("wb_probe.drained")
+    finally:
+        await response.aclose()
+
+
+class FullBodyProbe:
+    name = "full"
+
+    async def __call__(self, client: WBHttpClient) -> bool:
+        response = await client._request("GET", "", call_type="probe")
+        if not _status_ok(response):
+            return False
+        body = response.text.lower()
+        ok = any(marker.decode() in body for marker in BODY_MARKERS)
+        if not ok:
+            logger.info("WB auth health-check body did not look valid")
+        return ok
+
+
+class StreamingProbe:
+    name = "stream"
+
+    def __init__(self, max_bytes: int = 8192, drain_bytes: int | None = None) -> None:
+        self.max_bytes = max_bytes
+        self.drain_bytes = drain_bytes if drain_bytes is not None else settings.wb_probe_drain_bytes
+
+    async def __call__(self, client: WBHttpClient) -> bool:
+        response = await client._request("GET", "", call_type="probe", stream=True)
+        chunks = response.aiter_bytes()
+        try:
+            if not _status_ok(response):
+                return False
+            keep = max(len(m) for m in BODY_MARKERS) - 1
+            tail = b""
+            read = 0
+            async for chunk in chunks:
+                window = tail + chunk.lower()
+                if any(marker in window for marker in BODY_MARKERS):
+                    return True
+                read += len(chunk)
+                if read >= self.max_bytes:
+                    break
+                tail = window[-keep:]
+        finally:
+            await _release(response, chunks, self.drain_bytes)
+        logger.info("WB auth health-check body did not look valid")
+        return False
+
+
+class RedirectProbe:
+    name = "redirect"
+
+    def __init__(self, drain_bytes: int | None = None) -> None:
+        self.drain_bytes = drain_bytes if drain_bytes is not None else settings.wb_probe_drain_bytes
+
+    async def __call__(self, client: WBHttpClient) -> bool:
+        auth_host = urlparse(settings.wb_seller_auth_url).hostname
+        url = ""
+        for _ in range(MAX_REDIRECTS + 1):
+            response = await client._request(
+                "GET",
+                url,
+                call_type="probe",
+                stream=True,
+                follow_redirects=False,
+            )
+            await _release(response, response.aiter_bytes(), self.drain_bytes)
+            if not response.is_redirect:
+                break
+            target = response.url.join(response.headers.get("location", ""))
+            if target.host != response.url.host:
+                # из кабинета уводят на seller-auth (или неизвестно куда) — сессии нет
+                logger.info(
+                    "WB auth health-check redirected to {}{}",
+                    target.host or "?",
+                    "" if target.host == auth_host else " (not the auth host)",
+                )
+                return False
+            url = str(target)
+        else:
+            logger.info("WB auth health-check is stuck in redirects")
+            return False
+        if not _status_ok(response):
+            return False
+        jar = {cookie.name for cookie in client.client.cookies.jar}
+        return any(name in jar for name in SESSION_COOKIES)
+
+
+PROBES: dict[str, Callable[[], SessionProbe]] = {
+    probe.name: probe for probe in (FullBodyProbe, StreamingProbe, RedirectProbe)
+}
+
+
+def make_probe(name: str) -> SessionProbe:
+    try:
+        return PROBES[name]()
+    except KeyError:
+        raise ValueError(f"Unknown session probe: {name}") from None
@@ -0,0 +1,214 @@
+"""Тихое обновление сессий WB по сохранённому ``storage_state`` без окна входа.
+
+После входа рядом с jar хранится полный ``storage_state`` Playwright (cookie
+с доменом, путём и сроком). Обновление поднимает его в headless-контексте и
+открывает кабинет: скрипты WB сами обменивают ``wbx-refresh`` на свежий
+``wbx-validation-key``, после чего новые cookie проверяются по HTTP и
+сохраняются вместе с новым состоянием. Планировщик раз в
+``SESSION_REFRESH_INTERVAL`` обновляет сессии, которым до истечения осталось
+меньше ``SESSION_REFRESH_LEAD`` секунд; неудавшееся обновление не повторяется,
+пока состояние не изменится (до нового входа). Перед окном входа обновление
+пробуется с коротким таймаутом ``SESSION_REFRESH_INTERACTIVE_TIMEOUT``, а заведомо
+неудачное состояние пропускается сразу, как и занятый пул обновления: окно
+входа не ждёт чужих обновлений. Выход из аккаунта берёт ту же блокировку, что и
+обновление, поэтому обновление не может вернуть только что удалённую сессию.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import defaultdict
+from contextlib import suppress
+from typing import Any
+
+import httpx
+from playwright.async_api import Error
+
+from bot_wb import metrics
+from bot_wb.logging import logger
+from bot_wb.settings import settings
+from bot_wb.storage.session import BrowserStateStorage, browser_state_users, open_cookie_storage
+
+from .auth_cache import AuthStatusCache, auth_status_cache
+from .browser_login import IMPORTANT_COOKIES, pick_cookies, save_browser_state, validate_session
+from .browser_pool import BrowserPool, refresh_pool
+from .client_registry import WBClientRegistry, client_registry
+
+
+def session_expiry(state: dict[str, Any]) -> float | None:
+    """Ближайший срок (epoch) сессионных cookie WB; ``None`` — сроков нет."""
+
+    expires = []
+    for cookie in state.get("cookies") or ():
+        with suppress(TypeError, ValueError):
+            moment = float(cookie.get("expires", -1))
+            if cookie.get("name") in IMPORTANT_COOKIES and moment > 0:
+                expires.append(moment)
+    return min(expires) if expires else None
+
+
+def with_jar(state: dict[str, Any], jar: dict[str, str]) -> dict[str, Any]:
+    """Состояние со значениями cookie из jar: HTTP-клиент мог получить их позже."""
+
+    cookies = [
+        {**cookie, "value": jar[cookie["name"]]} if cookie.get("name") in jar else cookie
+        for cookie in state.get("cookies") or ()
+    ]
+    return {**state, "cookies": cookies}
+
+
+class SessionRefresher:
+    def __init__(  # noqa: PLR0913
+        self,
+        *,
+        pool: BrowserPool | None = None,
+        clients: WBClientRegistry | None = None,
+        status_cache: AuthStatusCache | None = None,
+        lead: float = 3600.0,
+        interval: float = 300.0,
+        timeout: float = 30.0,
+    ) -> None:
+        self._pool = pool if pool is not None else refresh_pool
+        self._clients = clients if clients is not None else client_registry
+        self._status_cache = status_cache if status_cache is not None else auth_status_cache
+        self._lead = lead
+        self._interval = interval
+        self._timeout = timeout
+        self._locks: defaultdict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+        # пользователь -> срок состояния, обновить которое не удалось
+        self._failed: dict[int, float | None] = {}
+        self._task: asyncio.Task[None] | None = None
+
+    def lock(self, tg_user_id: int) -> asyncio.Lock:
+        """Блокировка сессии пользователя: пока она взята, обновление не идёт."""
+
+        return self._locks[tg_user_id]
+
+    async def refresh(
+        self,
+        tg_user_id: int,
+        *,
+        page_timeout: float | None = None,
+        wait: bool = True,
+    ) -> bool:
+        """Обновляет сессию по сохранённому состоянию; ``False`` — нужен ручной вход.
+
+        ``page_timeout`` сокращает ожидание кабинета (путь перед окном входа); неудача
+        с сокращённым таймаутом не помечает состояние неудачным для планировщика.
+        ``wait=False`` — не вставать в очередь: если пул обновления или сессия
+        пользователя заняты, сразу ``False``.
+        """
+
+        if not wait and (self._locks[tg_user_id].locked() or self._pool.full):
+            metrics.inc("session_refresh.busy")
+            return False
+        async with self._locks[tg_user_id]:
+            state = await asyncio.to_thread(BrowserStateStorage(tg_user_id).load)
+            if not state:
+                return False
+            expires = session_expiry(state)
+            if self._known_failed(tg_user_id, expires):
+                metrics.inc("session_refresh.skipped")
+                return False
+            jar = await asyncio.to_thread(open_cookie_storage(tg_user_id).load)
+            started = time.monotonic()
+            try:
+                ok = await self._refresh(
+                    tg_user_id,
+                    with_jar(state, jar),
+                    page_timeout if page_timeout is not None else self._timeout,
+                )
+            except Error as exc:
+                logger.warning("Silent session refresh for user {} failed: {}", tg_user_id, exc)
+                ok = False
+            except httpx.HTTPError as exc:
+                # WB не ответил — это не отказ, состояние попробуем снова
+                logger.warning("Session check for user {} failed: {}", tg_user_id, exc)
+                metrics.inc("session_refresh.failed")
+                return False
+            metrics.observe("session_refresh.ms", (time.monotonic() - started) * 1000)
+            if not ok:
+                metrics.inc("session_refresh.failed")
+                if page_timeout is None:
+                    self._failed[tg_user_id] = expires
+                return False
+            self._failed.pop(tg_user_id, None)
+        metrics.inc("session_refresh.succeeded")
+        # клиент с прежними cookie больше не актуален
+        await self._clients.invalidate(tg_user_id)
+        self._status_cache.set(tg_user_id, True)
+        logger.info("WB session of user {} refreshed without login window", tg_user_id)
+        return True
+
+    def _known_failed(self, tg_user_id: int, expires: float | None) -> bool:
+        return tg_user_id in self._failed and self._failed[tg_user_id] == expires
+
+    async def _refresh(self, tg_user_id: int, state: dict[str, Any], page_timeout: float) -> bool:
+        async with self._pool.context(tg_user_id, storage_state=state) as ctx:
+            page = await ctx.new_page()
+            # кабинет может так и не затихнуть — тогда проверяем то, что успело прийти
+            with suppress(Error):
+                await page.goto(
+                    settings.wb_seller_base,
+                    wait_until="networkidle",
+                    timeout=page_timeout * 1000,
+                )
+            jar = pick_cookies(await ctx.cookies())
+            if not any(name in jar for name in IMPORTANT_COOKIES):
+                return False
+            if not await validate_session(tg_user_id, jar):
+                return False
+            await save_browser_state(tg_user_id, ctx)
+            return True
+
+    def due(self, now: float | None = None) -> list[int]:
+        """Пользователи, чьи сессии истекают в ближайшие ``lead`` секунд, — раньше всех."""
+
+        deadline = (now if now is not None else time.time()) + self._lead
+        expiring: list[tuple[float, int]] = []
+        for tg_user_id in browser_state_users():
+            state = BrowserStateStorage(tg_user_id).load()
+            expires = session_expiry(state) if state else None
+            if expires is None or expires > deadline:
+                continue
+            if self._known_failed(tg_user_id, expires):
+                continue
+            if not open_cookie_storage(tg_user_id).exists():
+                # пользователь вышел — состояние больше не нужно
+                continue
+            expiring.append((expires, tg_user_id))
+        return [tg_user_id for _, tg_user_id in sorted(expiring)]
+
+    async def refresh_due(self, now: float | None = None) -> int:
+        refreshed = 0
+        for tg_user_id in await asyncio.to_thread(self.due, now):
+            if await self.refresh(tg_user_id):
+                refreshed += 1
+        return refreshed
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="session-refresh")
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh_due()
+            except Exception:  # noqa: BLE001
+                logger.opt(exception=True).error("Session refresh round failed")
+            await asyncio.sleep(self._interval)
+
+
+session_refresher = SessionRefresher(
+    lead=settings.session_refresh_lead,
+    interval=settings.session_refresh_interval,
+    timeout=settings.session_refresh_timeout,
+)
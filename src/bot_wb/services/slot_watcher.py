@@ -0,0 +1,306 @@
+"""Фоновый поиск слотов приёмки на складах WB.
+
+Подписки разных продавцов на один склад обслуживаются одним опросом: склады
+обходятся по кругу пачками (``warehouseIDs`` в одном запросе), частота
+запросов ограничена бюджетом ``SLOT_POLL_BUDGET`` в минуту. Найденные слоты
+раздаются всем подходящим подпискам, уже отправленные повторно не шлются.
+
+Пока это только движок: хендлеров, создающих подписки (``subscribe``), в боте
+нет — подписки заводятся из кода или напрямую в таблице ``slot_subscriptions``
+и подхватываются ``load`` при старте.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import Counter, defaultdict, deque
+from collections.abc import Awaitable, Callable, Iterable
+from contextlib import suppress
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any
+
+import httpx
+
+from bot_wb import metrics
+from bot_wb.logging import logger
+from bot_wb.settings import settings
+from bot_wb.storage.session import open_cookie_storage
+from bot_wb.storage.slots import SlotSubscription, SlotSubscriptionRepo
+
+from .client_registry import WBClientRegistry, client_registry
+
+# склад, день, тип упаковки
+SlotKey = tuple[int, date, int | None]
+
+
+@dataclass(frozen=True)
+class Slot:
+    warehouse_id: int
+    warehouse_name: str
+    date: date
+    box_type_id: int | None
+    box_type: str
+    coefficient: int
+
+    @property
+    def key(self) -> SlotKey:
+        return (self.warehouse_id, self.date, self.box_type_id)
+
+
+def parse_slots(payload: Iterable[dict[str, Any]]) -> list[Slot]:
+    """Открытые слоты из ответа WB: ``coefficient=-1`` и ``allowUnload=false`` — закрыто."""
+
+    slots = []
+    for item in payload:
+        try:
+            coefficient = int(item["coefficient"])
+            day = datetime.fromisoformat(str(item["date"]).replace("Z", "+00:00")).date()
+            warehouse_id = int(item["warehouseID"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if coefficient < 0 or item.get("allowUnload") is False:
+            continue
+        box_type_id = item.get("boxTypeID")
+        slots.append(
+            Slot(
+                warehouse_id=warehouse_id,
+                warehouse_name=item.get("warehouseName") or str(warehouse_id),
+                date=day,
+                box_type_id=int(box_type_id) if box_type_id is not None else None,
+                box_type=item.get("boxTypeName") or "",
+                coefficient=coefficient,
+            ),
+        )
+    return slots
+
+
+def matches(sub: SlotSubscription, slot: Slot) -> bool:
+    return (
+        slot.warehouse_id == sub.warehouse_id
+        and sub.date_from <= slot.date <= sub.date_to
+        and slot.coefficient <= sub.max_coefficient
+        and (sub.box_type_id is None or slot.box_type_id == sub.box_type_id)
+    )
+
+
+Notify = Callable[[SlotSubscription, list[Slot]], Awaitable[None]]
+# получает все открытые слоты опроса и момент их обнаружения (time.monotonic)
+SlotListener = Callable[[list[Slot], float], Awaitable[None]]
+
+
+class SlotWatcher:
+    """Опрашивает склады из подписок и уведомляет подписчиков о новых слотах."""
+
+    def __init__(
+        self,
+        notify: Notify,
+        *,
+        repo: SlotSubscriptionRepo | None = None,
+        clients: WBClientRegistry | None = None,
+        budget_per_minute: float = 30.0,
+        batch_size: int = 10,
+    ) -> None:
+        self._notify = notify
+        self._repo = repo if repo is not None else SlotSubscriptionRepo()
+        self._clients = clients if clients is not None else client_registry
+        self._interval = 60.0 / budget_per_minute
+        self._batch_size = batch_size
+        self._subs: dict[int, SlotSubscription] = {}
+        self._by_warehouse: defaultdict[int, set[int]] = defaultdict(set)
+        self._rotation: deque[int] = deque()
+        # склады, которые опрашиваются без подписки (например, для автобронирования)
+        self._watched: Counter[int] = Counter()
+        # подписка -> ключи слотов, о которых уже сообщили
+        self._notified: dict[int, set[SlotKey]] = {}
+        # по чьей сессии опрашивать: ротация среди подписчиков
+        self._pollers: deque[int] = deque()
+        self._poller_refs: Counter[int] = Counter()
+        self._listeners: list[SlotListener] = []
+        self._task: asyncio.Task[None] | None = None
+
+    @property
+    def warehouses(self) -> int:
+        return len(self._rotation)
+
+    def __len__(self) -> int:
+        return len(self._subs)
+
+    async def load(self) -> int:
+        for sub in await self._repo.list_all():
+            self._index(sub)
+        return len(self._subs)
+
+    async def subscribe(self, sub: SlotSubscription) -> SlotSubscription:
+        if sub.date_from > sub.date_to:
+            raise ValueError("date_from must not be after date_to")
+        stored = await self._repo.add(sub)
+        self._index(stored)
+        return stored
+
+    async def unsubscribe(self, tg_user_id: int, sub_id: int) -> bool:
+        removed = await self._repo.remove(tg_user_id, sub_id)
+        sub = self._subs.get(sub_id)
+        if removed and sub is not None:
+            self._unindex(sub)
+        return removed
+
+    def subscriptions(self, tg_user_id: int) -> list[SlotSubscription]:
+        return [s for s in self._subs.values() if s.tg_user_id == tg_user_id]
+
+    def add_listener(self, listener: SlotListener) -> None:
+        """Слушатель вызывается сразу после опроса, до уведомлений в Telegram."""
+
+        self._listeners.append(listener)
+
+    def watch(self, warehouse_id: int, tg_user_id: int) -> None:
+        """Опрашивать склад без подписки, в том числе по сессии ``tg_user_id``."""
+
+        self._track(warehouse_id, tg_user_id)
+        self._watched[warehouse_id] += 1
+
+    def unwatch(self, warehouse_id: int, tg_user_id: int) -> None:
+        if self._watched[warehouse_id] <= 0:
+            return
+        self._watched[warehouse_id] -= 1
+        self._untrack(warehouse_id, tg_user_id)
+
+    def _index(self, sub: SlotSubscription) -> None:
+        assert sub.id is not None
+        self._track(sub.warehouse_id, sub.tg_user_id)
+        self._subs[sub.id] = sub
+        self._by_warehouse[sub.warehouse_id].add(sub.id)
+
+    def _unindex(self, sub: SlotSubscription) -> None:
+        assert sub.id is not None
+        self._subs.pop(sub.id, None)
+        self._notified.pop(sub.id, None)
+        ids = self._by_warehouse.get(sub.warehouse_id)
+        if ids is not None:
+            ids.discard(sub.id)
+            if not ids:
+                del self._by_warehouse[sub.warehouse_id]
+        self._untrack(sub.warehouse_id, sub.tg_user_id)
+
+    def _track(self, warehouse_id: int, tg_user_id: int) -> None:
+        if not self._by_warehouse.get(warehouse_id) and not self._watched[warehouse_id]:
+            self._rotation.append(warehouse_id)
+        if not self._poller_refs[tg_user_id]:
+            self._pollers.append(tg_user_id)
+        self._poller_refs[tg_user_id] += 1
+
+    def _untrack(self, warehouse_id: int, tg_user_id: int) -> None:
+        if not self._by_warehouse.get(warehouse_id) and not self._watched[warehouse_id]:
+            self._watched.pop(warehouse_id, None)
+            with suppress(ValueError):
+                self._rotation.remove(warehouse_id)
+        self._poller_refs[tg_user_id] -= 1
+        if self._poller_refs[tg_user_id] <= 0:
+            del self._poller_refs[tg_user_id]
+            with suppress(ValueError):
+                self._pollers.remove(tg_user_id)
+
+    def _next_batch(self) -> list[int]:
+        batch = []
+        for _ in range(min(self._batch_size, len(self._rotation))):
+            warehouse_id = self._rotation.popleft()
+            self._rotation.append(warehouse_id)
+            batch.append(warehouse_id)
+        return batch
+
+    async def poll_once(self) -> int:
+        """Один запрос к WB по очередной пачке складов; возвращает число уведомлений."""
+
+        batch = self._next_batch()
+        if not batch:
+            return 0
+        payload = await self._fetch(batch)
+        if payload is None:
+            return 0
+        detected_at = time.monotonic()
+        slots = parse_slots(payload)
+        if slots:
+            for listener in self._listeners:
+                try:
+                    await listener(slots, detected_at)
+                except Exception:  # noqa: BLE001
+                    logger.opt(exception=True).error("Slot listener failed")
+        metrics.inc("slots.polls")
+        served = sum(len(self._by_warehouse.get(w, ())) for w in batch)
+        metrics.inc("slots.subscriptions_served", served)
+        return await self._fan_out(batch, slots)
+
+    async def _fetch(self, batch: list[int]) -> list[dict[str, Any]] | None:
+        for _ in range(len(self._pollers)):
+            tg_user_id = self._pollers[0]
+            self._pollers.rotate(-1)
+            if not await asyncio.to_thread(open_cookie_storage(tg_user_id).exists):
+                continue
+            try:
+                async with self._clients.client(tg_user_id) as client:
+                    return await client.get_acceptance_coefficients(batch)
+            except (httpx.HTTPError, ValueError) as exc:
+                logger.warning(
+                    "Slot poll for warehouses {} via user {} failed: {}",
+                    batch,
+                    tg_user_id,
+                    exc,
+                )
+                if isinstance(exc, httpx.TransportError):
+                    # WB недоступен — другие сессии не помогут
+                    return None
+        logger.debug("No authorized subscriber to poll warehouses {}", batch)
+        return None
+
+    async def _fan_out(self, batch: list[int], slots: list[Slot]) -> int:
+        sent = 0
+        for warehouse_id in batch:
+            for sub_id in list(self._by_warehouse.get(warehouse_id, ())):
+                sub = self._subs.get(sub_id)
+                if sub is None:
+                    # отписался, пока отправлялись предыдущие уведомления
+                    continue
+                found = [s for s in slots if matches(sub, s)]
+                seen = self._notified.get(sub_id, set())
+                fresh = [s for s in found if s.key not in seen]
+                # слот, пропавший и появившийся снова, — повод написать ещё раз
+                self._notified[sub_id] = {s.key for s in found}
+                if not fresh:
+                    continue
+                try:
+                    await self._notify(sub, fresh)
+                except Exception as exc:  # noqa: BLE001
+                    logger.warning("Slot notification for {} failed: {}", sub.tg_user_id, exc)
+                    self._notified[sub_id] = seen
+                    continue
+                sent += 1
+        metrics.inc("slots.notified", sent)
+        return sent
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="slot-watcher")
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.poll_once()
+            except Exception:  # noqa: BLE001
+                logger.opt(exception=True).error("Slot watcher poll failed")
+            await asyncio.sleep(self._interval)
+
+
+def make_slot_watcher(notify: Notify) -> SlotWatcher:
+    return SlotWatcher(
+        notify,
+        budget_per_minute=settings.slot_poll_budget,
+        batch_size=settings.slot_poll_batch,
+    )
@@ -0,0 +1,203 @@
+"""Инкрементальная синхронизация остатков и продаж аккаунта в локальный кэш.
+
+Для каждого потока (остатки, продажи) хранится курсор — наибольший
+``lastChangeDate`` из сохранённых записей. Очередная синхронизация просит у
+WB только изменения начиная с курсора, поэтому её стоимость пропорциональна
+числу изменений, а не размеру истории; лишь первая синхронизация тянет
+``STATS_INITIAL_DAYS`` дней. Полная страница (``STATS_PAGE_LIMIT`` строк)
+значит, что изменений больше, — тогда запрос повторяется с новым курсором.
+Записи на границе страницы приходят повторно и просто перезаписываются.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import defaultdict
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, TypeVar
+
+from bot_wb import metrics
+from bot_wb.logging import logger
+from bot_wb.settings import settings
+from bot_wb.storage.stats import SALES, STOCKS, Sale, StatsRepo, StockLevel, to_epoch
+
+from .client_registry import WBClientRegistry, client_registry
+from .redistribution import StockMatrix
+
+Row = TypeVar("Row")
+
+
+def parse_time(value: Any) -> datetime | None:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def _int_or_none(value: Any) -> int | None:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_stock(item: dict[str, Any]) -> StockLevel | None:
+    changed = parse_time(item.get("lastChangeDate"))
+    barcode = item.get("barcode")
+    quantity = _int_or_none(item.get("quantity"))
+    if changed is None or not barcode or quantity is None:
+        return None
+    return StockLevel(
+        barcode=str(barcode),
+        warehouse=str(item.get("warehouseName") or ""),
+        nm_id=_int_or_none(item.get("nmId")),
+        quantity=quantity,
+        updated_at=to_epoch(changed),
+    )
+
+
+def parse_sale(item: dict[str, Any]) -> Sale | None:
+    sold_at = parse_time(item.get("date"))
+    # возврат приходит с тем же srid, что и продажа, но своим saleID
+    sale_id = item.get("saleID") or item.get("srid")
+    barcode = item.get("barcode")
+    if sold_at is None or not sale_id or not barcode:
+        return None
+    # saleID возвратов начинается с «R»
+    is_return = str(item.get("saleID") or "").startswith("R")
+    return Sale(
+        sale_id=str(sale_id),
+        sold_at=to_epoch(sold_at),
+        barcode=str(barcode),
+        warehouse=str(item.get("warehouseName") or ""),
+        nm_id=_int_or_none(item.get("nmId")),
+        quantity=-1 if is_return else 1,
+        price=float(item.get("priceWithDisc") or item.get("forPay") or 0),
+    )
+
+
+@dataclass(frozen=True)
+class SyncResult:
+    stocks: int
+    sales: int
+    seconds: float
+
+
+class StatsSync:
+    """Синхронизирует статистику аккаунтов; одновременно — не больше одной на аккаунт."""
+
+    def __init__(
+        self,
+        repo: StatsRepo | None = None,
+        *,
+        clients: WBClientRegistry | None = None,
+        page_limit: int = 80000,
+        initial_days: int = 90,
+    ) -> None:
+        self._repo = repo if repo is not None else StatsRepo()
+        self._clients = clients if clients is not None else client_registry
+        self._page_limit = page_limit
+        self._initial_days = initial_days
+        self._locks: defaultdict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    @property
+    def repo(self) -> StatsRepo:
+        return self._repo
+
+    async def sync(self, tg_user_id: int) -> SyncResult:
+        started = time.monotonic()
+        async with self._locks[tg_user_id], self._clients.client(tg_user_id) as client:
+            stocks = await self._sync_stream(
+                tg_user_id,
+                STOCKS,
+                client.get_stocks,
+                parse_stock,
+                self._repo.apply_stocks,
+            )
+            sales = await self._sync_stream(
+                tg_user_id,
+                SALES,
+                client.get_sales,
+                parse_sale,
+                self._repo.apply_sales,
+            )
+        result = SyncResult(stocks, sales, time.monotonic() - started)
+        metrics.inc("stats.synced_rows", stocks + sales)
+        logger.info(
+            "Stats sync for user {}: {} stock and {} sales changes in {:.1f}s",
+            tg_user_id,
+            stocks,
+            sales,
+            result.seconds,
+        )
+        return result
+
+    async def _sync_stream(
+        self,
+        tg_user_id: int,
+        stream: str,
+        fetch: Callable[[str], Awaitable[list[dict[str, Any]]]],
+        parse: Callable[[dict[str, Any]], Row | None],
+        apply: Callable[[int, Iterable[Row], str], Awaitable[None]],
+    ) -> int:
+        cursor = await self._repo.get_cursor(tg_user_id, stream)
+        if cursor is None:
+            cursor = (datetime.now() - timedelta(days=self._initial_days)).strftime(
+                "%Y-%m-%dT%H:%M:%S",
+            )
+        total = 0
+        while True:
+            page = await fetch(cursor)
+            if not page:
+                break
+            rows = []
+            newest, next_cursor = parse_time(cursor), cursor
+            for item in page:
+                row = parse(item)
+                if row is None:
+                    continue
+                rows.append(row)
+                changed = parse_time(item.get("lastChangeDate"))
+                if changed is not None and (newest is None or _later(changed, newest)):
+                    newest, next_cursor = changed, str(item["lastChangeDate"])
+            await apply(tg_user_id, rows, next_cursor)
+            total += len(rows)
+            # неполная страница — дельта выбрана; курсор не сдвинулся — дальше не продвинуться
+            if len(page) < self._page_limit or next_cursor == cursor:
+                break
+            cursor = next_cursor
+        return total
+
+    async def stock_matrix(
+        self,
+        tg_user_id: int,
+        *,
+        days: int = 14,
+        now: datetime | None = None,
+    ) -> StockMatrix:
+        """Остатки и средние продажи в день за ``days`` дней — вход ``plan_transfers``."""
+
+        until = now or datetime.now()
+        levels = await self._repo.stock_levels(tg_user_id)
+        sold = await self._repo.units_sold(tg_user_id, until - timedelta(days=days), until)
+        records = [(s.barcode, s.warehouse, float(s.quantity), 0.0) for s in levels]
+        records += [(b, w, 0.0, max(units, 0) / days) for b, w, units in sold]
+        return StockMatrix.from_records(records)
+
+
+def _later(left: datetime, right: datetime) -> bool:
+    # WB отдаёт время без зоны; сравниваем как есть, если зона есть только у одной стороны
+    if (left.tzinfo is None) != (right.tzinfo is None):
+        left, right = left.replace(tzinfo=None), right.replace(tzinfo=None)
+    return left > right
+
+
+stats_sync = StatsSync(
+    page_limit=settings.stats_page_limit,
+    initial_days=settings.stats_initial_days,
+)
@@ -0,0 +1,338 @@
+"""Массовое создание поставок из загруженного CSV/XLSX.
+
+Файл читается потоково: строки проверяются по одной, хорошие копятся по
+складам и уходят в WB пачками по ``batch_size`` баркодов (повторы баркода
+в пачке суммируются). Следующая пачка читается, только когда освобождается
+место среди ``concurrency`` одновременных запросов, поэтому в памяти живут
+лишь отправляемые пачки и недобранные хвосты по складам — независимо от
+размера файла. Из ошибок хранятся только первые ``max_errors``.
+
+Разбор идёт в рабочем потоке, а отчёт принадлежит event loop: поток лишь
+возвращает счётчики вместе с пачкой, и в ``report`` их сливает цикл.
+
+Пока это только движок: ручка создания поставок (``WB_SUPPLY_CREATE_PATH``) не
+сверена с кабинетом, поэтому загрузка файла в боте включается флагом
+``SUPPLY_UPLOAD_ENABLED`` (по умолчанию выключен).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import csv
+import importlib.util
+import time
+from collections.abc import Awaitable, Callable, Generator, Iterable, Iterator
+from contextlib import suppress
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+from bot_wb.logging import logger
+
+from .wb_http_client import WBHttpClient
+
+SUPPORTED_SUFFIXES = (".csv", ".xlsx")
+# сколько ошибок строк хранится в отчёте
+MAX_ERRORS = 20
+
+# допустимые заголовки колонок (в нижнем регистре)
+COLUMNS: dict[str, frozenset[str]] = {
+    "barcode": frozenset({"barcode", "баркод", "штрихкод", "шк"}),
+    "quantity": frozenset({"quantity", "qty", "количество", "кол-во"}),
+    "warehouse_id": frozenset({"warehouse_id", "warehouse", "склад", "id склада"}),
+}
+
+
+@dataclass(frozen=True)
+class SupplyRow:
+    line: int
+    barcode: str
+    quantity: int
+    warehouse_id: int
+
+
+@dataclass(frozen=True)
+class RowError:
+    line: int
+    message: str
+
+
+@dataclass
+class SupplyBatch:
+    warehouse_id: int
+    goods: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def units(self) -> int:
+        return sum(self.goods.values())
+
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    invalid: int = 0
+    errors: list[RowError] = field(default_factory=list)
+    supplies: list[str] = field(default_factory=list)
+    batches_failed: int = 0
+    units_sent: int = 0
+    units_failed: int = 0
+    finished: bool = False
+
+
+@dataclass
+class BatchChunk:
+    """Пачка (``None`` — файл кончился) и строки, прочитанные после предыдущей."""
+
+    batch: SupplyBatch | None
+    rows: int = 0
+    invalid: int = 0
+    errors: list[RowError] = field(default_factory=list)
+
+    def merge_into(self, report: ImportReport, max_errors: int) -> None:
+        report.rows += self.rows
+        report.invalid += self.invalid
+        report.errors.extend(self.errors[: max(max_errors - len(report.errors), 0)])
+
+
+Progress = Callable[[ImportReport], Awaitable[None]]
+
+
+def xlsx_available() -> bool:
+    """Чтение XLSX требует необязательный пакет ``openpyxl``."""
+
+    return importlib.util.find_spec("openpyxl") is not None
+
+
+def _iter_csv(path: Path) -> Iterator[tuple[Any, ...]]:
+    with path.open(encoding="utf-8-sig", newline="") as fh:
+        sample = fh.read(4096)
+        fh.seek(0)
+        try:
+            dialect: Any = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        for row in csv.reader(fh, dialect):
+            yield tuple(row)
+
+
+def _iter_xlsx(path: Path) -> Iterator[tuple[Any, ...]]:
+    if not xlsx_available():
+        raise ValueError("XLSX не поддерживается: не установлен пакет openpyxl")
+    import openpyxl  # noqa: PLC0415
+
+    # read_only отдаёт строки по мере разбора листа, не загружая книгу целиком
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def iter_table(path: Path) -> Iterator[tuple[Any, ...]]:
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        return _iter_csv(path)
+    if suffix == ".xlsx":
+        return _iter_xlsx(path)
+    raise ValueError(f"Неподдерживаемый формат: {suffix or 'без расширения'}")
+
+
+def _columns(header: tuple[Any, ...]) -> dict[str, int]:
+    names = [str(x).strip().lower() if x is not None else "" for x in header]
+    found = {}
+    for column, aliases in COLUMNS.items():
+        for index, name in enumerate(names):
+            if name in aliases:
+                found[column] = index
+                break
+    missing = [c for c in COLUMNS if c not in found]
+    if missing:
+        raise ValueError(f"В файле нет колонок: {', '.join(missing)}")
+    return found
+
+
+def _as_int(value: Any) -> int | None:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else None
+    try:
+        return int(str(value).strip())
+    except ValueError:
+        return None
+
+
+def _as_barcode(value: Any) -> str:
+    # Excel хранит длинные баркоды числами: 4601234567890.0
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip() if value is not None else ""
+
+
+def parse_row(values: tuple[Any, ...], columns: dict[str, int], line: int) -> SupplyRow | RowError:
+    def cell(column: str) -> Any:
+        index = columns[column]
+        return values[index] if index < len(values) else None
+
+    barcode = _as_barcode(cell("barcode"))
+    if not barcode:
+        return RowError(line, "пустой баркод")
+    quantity = _as_int(cell("quantity"))
+    if quantity is None or quantity <= 0:
+        return RowError(line, f"некорректное количество: {cell('quantity')!r}")
+    warehouse_id = _as_int(cell("warehouse_id"))
+    if warehouse_id is None or warehouse_id <= 0:
+        return RowError(line, f"некорректный склад: {cell('warehouse_id')!r}")
+    return SupplyRow(line, barcode, quantity, warehouse_id)
+
+
+def iter_rows(table: Iterable[tuple[Any, ...]]) -> Iterator[SupplyRow | RowError]:
+    """Проверенные строки таблицы; первая непустая строка — заголовок."""
+
+    columns: dict[str, int] | None = None
+    for line, values in enumerate(table, start=1):
+        if not any(v not in (None, "") for v in values):
+            continue
+        if columns is None:
+            columns = _columns(values)
+            continue
+        yield parse_row(values, columns, line)
+
+
+def iter_batches(
+    rows: Iterable[SupplyRow | RowError],
+    *,
+    batch_size: int,
+    max_errors: int = MAX_ERRORS,
+) -> Generator[BatchChunk, None, None]:
+    """Группирует строки по складам в пачки; каждая несёт счётчики строк до неё."""
+
+    pending: dict[int, SupplyBatch] = {}
+    chunk = BatchChunk(None)
+    kept_errors = 0
+    for row in rows:
+        chunk.rows += 1
+        if isinstance(row, RowError):
+            chunk.invalid += 1
+            if kept_errors < max_errors:
+                kept_errors += 1
+                chunk.errors.append(row)
+            continue
+        batch = pending.setdefault(row.warehouse_id, SupplyBatch(row.warehouse_id))
+        if row.barcode not in batch.goods and len(batch.goods) >= batch_size:
+            # пачка закрывается только новым баркодом, чтобы не делить повторы
+            chunk.batch = batch
+            yield chunk
+            chunk = BatchChunk(None)
+            batch = pending[row.warehouse_id] = SupplyBatch(row.warehouse_id)
+        batch.goods[row.barcode] = batch.goods.get(row.barcode, 0) + row.quantity
+    for batch in pending.values():
+        chunk.batch = batch
+        yield chunk
+        chunk = BatchChunk(None)
+    yield chunk
+
+
+class _ChunkReader:
+    """Читает пачки в рабочем потоке; закрывает генератор только после потока."""
+
+    def __init__(self, chunks: Generator[BatchChunk, None, None]) -> None:
+        self._chunks = chunks
+        self._reading: asyncio.Task[BatchChunk | None] | None = None
+
+    async def read(self) -> BatchChunk:
+        # разбор файла — синхронный, уводим его из event loop; shield: при отмене
+        # поток всё равно доработает, и дожидается его уже aclose
+        self._reading = asyncio.create_task(asyncio.to_thread(next, self._chunks, None))
+        chunk = await asyncio.shield(self._reading)
+        self._reading = None
+        return chunk if chunk is not None else BatchChunk(None)
+
+    async def aclose(self) -> None:
+        reading, self._reading = self._reading, None
+        if reading is not None:
+            await asyncio.wait({reading})
+            with suppress(asyncio.CancelledError, Exception):
+                reading.result()
+        self._chunks.close()
+
+
+async def import_supplies(  # noqa: PLR0913
+    path: Path,
+    client: WBHttpClient,
+    *,
+    batch_size: int = 1000,
+    concurrency: int = 4,
+    on_progress: Progress | None = None,
+    progress_interval: float = 2.0,
+) -> ImportReport:
+    """Создаёт поставки по файлу; ``on_progress`` вызывается не чаще ``progress_interval``."""
+
+    report = ImportReport()
+    reader = _ChunkReader(iter_batches(iter_rows(iter_table(path)), batch_size=batch_size))
+    slots = asyncio.Semaphore(concurrency)
+    inflight: set[asyncio.Task[None]] = set()
+    last_progress = time.monotonic()
+
+    async def progress(*, force: bool = False) -> None:
+        nonlocal last_progress
+        now = time.monotonic()
+        if on_progress is None or (not force and now - last_progress < progress_interval):
+            return
+        last_progress = now
+        try:
+            await on_progress(report)
+        except Exception:  # noqa: BLE001
+            logger.opt(exception=True).warning("Supply import progress callback failed")
+
+    async def submit(batch: SupplyBatch) -> None:
+        try:
+            supply_id = await client.create_supply(batch.warehouse_id, batch.goods)
+        except (httpx.HTTPError, ValueError) as exc:
+            report.batches_failed += 1
+            report.units_failed += batch.units
+            logger.warning(
+                "Supply batch for warehouse {} of user {} failed: {}",
+                batch.warehouse_id,
+                client.tg_user_id,
+                exc,
+            )
+        else:
+            report.supplies.append(supply_id)
+            report.units_sent += batch.units
+        finally:
+            slots.release()
+        await progress()
+
+    try:
+        while True:
+            await slots.acquire()
+            chunk = await reader.read()
+            chunk.merge_into(report, MAX_ERRORS)
+            if chunk.batch is None:
+                slots.release()
+                break
+            task = asyncio.create_task(submit(chunk.batch))
+            inflight.add(task)
+            task.add_done_callback(inflight.discard)
+            await progress()
+        await asyncio.gather(*inflight)
+    finally:
+        for task in inflight:
+            task.cancel()
+        await reader.aclose()
+    report.finished = True
+    await progress(force=True)
+    logger.info(
+        "Supply import for user {}: {} rows, {} invalid, {} supplies, {} batches failed",
+        client.tg_user_id,
+        report.rows,
+        report.invalid,
+        len(report.supplies),
+        report.batches_failed,
+    )
+    return report
@@ -0,0 +1,248 @@
+"""Планировщик исходящих запросов к Telegram с учётом лимитов Bot API.
+
+Telegram допускает около 30 сообщений в секунду на бота, около одного в
+секунду в личный чат и около 20 в минуту в группу; сверх этого приходит 429 с
+``retry_after``. Каждая отправка, правка или удаление сообщения берёт токен из
+глобальной корзины и корзины своего чата. Ждущие запросы стоят в полосах по
+приоритету: ответы на действия пользователя (``Lane.INTERACTIVE``, по
+умолчанию) обслуживаются раньше фоновых уведомлений (``Lane.ALERT``), внутри
+полосы чаты обходятся по кругу. Полоса задаётся контекстом вызова —
+``with send_lane(Lane.ALERT): await bot.send_message(...)``. На 429 чат
+приостанавливается на ``retry_after`` (а на 429 запроса вне чата — все
+отправки), и запрос повторяется.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from collections.abc import Awaitable, Callable, Hashable, Iterator
+from contextlib import contextmanager, suppress
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import TypeVar
+
+from aiogram.exceptions import TelegramRetryAfter
+
+from bot_wb import metrics
+from bot_wb.logging import logger
+from bot_wb.settings import settings
+
+from .rate_limiter import MAX_IDLE_BUCKETS, TokenBucket
+
+T = TypeVar("T")
+
+
+class Lane(IntEnum):
+    INTERACTIVE = 0
+    ALERT = 1
+
+
+_LANE: ContextVar[Lane] = ContextVar("telegram_send_lane", default=Lane.INTERACTIVE)
+
+
+@contextmanager
+def send_lane(lane: Lane) -> Iterator[None]:
+    """Запросы к Telegram внутри блока идут в полосе ``lane``."""
+
+    token = _LANE.set(lane)
+    try:
+        yield
+    finally:
+        _LANE.reset(token)
+
+
+def current_lane() -> Lane:
+    return _LANE.get()
+
+
+class SendScheduler:
+    def __init__(  # noqa: PLR0913
+        self,
+        *,
+        global_rate: float = 30.0,
+        global_burst: float = 30.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 3.0,
+        group_rate: float = 20 / 60,
+        max_retries: int = 3,
+        max_retry_after: float = 60.0,
+    ) -> None:
+        self._global = TokenBucket(global_rate, global_burst)
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._group_rate = group_rate
+        self._max_retries = max_retries
+        self._max_retry_after = max_retry_after
+        self._buckets: dict[Hashable, TokenBucket] = {}
+        self._lanes: dict[Lane, OrderedDict[Hashable, deque[asyncio.Future[None]]]] = {
+            lane: OrderedDict() for lane in Lane
+        }
+        self._dispatcher: asyncio.Task[None] | None = None
+        self._wakeup: asyncio.Event | None = None
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(q) for chats in self._lanes.values() for q in chats.values())
+
+    def stats(self) -> dict[str, int]:
+        depth = {
+            f"queued_{lane.name.lower()}": sum(len(q) for q in self._lanes[lane].values())
+            for lane in Lane
+        }
+        return {
+            **depth,
+            "sent": metrics.get("tg_send.sent"),
+            "retry_after": metrics.get("tg_send.retry_after"),
+        }
+
+    def _bucket(self, chat_id: Hashable) -> TokenBucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            if len(self._buckets) >= MAX_IDLE_BUCKETS:
+                self._prune(time.monotonic())
+            # отрицательные id — группы и каналы, у них лимит строже
+            group = isinstance(chat_id, int) and chat_id < 0
+            bucket = TokenBucket(self._group_rate if group else self._chat_rate, self._chat_burst)
+            self._buckets[chat_id] = bucket
+        return bucket
+
+    def _prune(self, now: float) -> None:
+        waiting = {chat for chats in self._lanes.values() for chat in chats}
+        for chat_id in [c for c, b in self._buckets.items() if b.is_idle(now)]:
+            if chat_id not in waiting:
+                del self._buckets[chat_id]
+
+    async def send(self, chat_id: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        """Выполняет ``call`` в пределах лимитов чата; на 429 ждёт и повторяет."""
+
+        attempt = 0
+        while True:
+            await self.acquire(chat_id)
+            try:
+                result = await call()
+            except TelegramRetryAfter as exc:
+                # паузу соблюдают и следующие отправки в чат, даже если эту не повторяем
+                self.penalize(chat_id, exc.retry_after)
+                attempt += 1
+                # долгую паузу не ждём: обработчик не должен висеть минутами
+                if attempt > self._max_retries or exc.retry_after > self._max_retry_after:
+                    raise
+                logger.warning(
+                    "Telegram flood control in chat {}: retry in {}s",
+                    chat_id,
+                    exc.retry_after,
+                )
+                continue
+            metrics.inc("tg_send.sent")
+            return result
+
+    def penalize(self, chat_id: Hashable | None, delay: float) -> None:
+        """Учитывает ``retry_after``: ``chat_id=None`` приостанавливает все отправки."""
+
+        target = self._global if chat_id is None else self._bucket(chat_id)
+        target.pause(time.monotonic(), delay)
+        metrics.inc("tg_send.retry_after")
+
+    def paused_for(self, chat_id: Hashable) -> float:
+        """Сколько ещё ждать отправке в чат из-за пауз ``retry_after``."""
+
+        now = time.monotonic()
+        return max(self._global.paused_until, self._bucket(chat_id).paused_until, now) - now
+
+    async def acquire(self, chat_id: Hashable) -> float:
+        """Ждёт токен для чата в полосе текущего контекста, возвращает время ожидания."""
+
+        lane = current_lane()
+        started = time.monotonic()
+        bucket = self._bucket(chat_id)
+        if (
+            not any(self._lanes.values())
+            and self._global.wait_time(started) == 0
+            and bucket.wait_time(started) == 0
+        ):
+            self._global.take()
+            bucket.take()
+            return 0.0
+
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._lanes[lane].setdefault(chat_id, deque()).append(future)
+        self._ensure_dispatcher()
+        try:
+            await future
+        finally:
+            if not future.done():
+                future.cancel()
+        waited = time.monotonic() - started
+        metrics.observe(f"tg_send.wait_ms.{lane.name.lower()}", waited * 1000)
+        return waited
+
+    def _ensure_dispatcher(self) -> None:
+        loop = asyncio.get_running_loop()
+        task = self._dispatcher
+        if task is None or task.done() or task.get_loop() is not loop:
+            self._wakeup = asyncio.Event()
+            self._dispatcher = loop.create_task(self._dispatch(), name="tg-send-scheduler")
+        elif self._wakeup is not None:
+            self._wakeup.set()
+
+    def _next_ready(self, now: float) -> tuple[Lane | None, Hashable, float]:
+        """Первый готовый чат старшей полосы, либо минимальное ожидание."""
+
+        min_wait = float("inf")
+        for lane, chats in self._lanes.items():
+            for chat_id in list(chats):
+                queue = chats[chat_id]
+                while queue and queue[0].done():
+                    queue.popleft()
+                if not queue:
+                    del chats[chat_id]
+                    continue
+                wait = self._bucket(chat_id).wait_time(now)
+                if wait == 0:
+                    return lane, chat_id, 0.0
+                min_wait = min(min_wait, wait)
+        return None, None, min_wait
+
+    async def _dispatch(self) -> None:
+        while any(self._lanes.values()):
+            now = time.monotonic()
+            wait = self._global.wait_time(now)
+            lane = None
+            chat_id: Hashable = None
+            if wait == 0:
+                lane, chat_id, wait = self._next_ready(now)
+            if lane is None:
+                if not any(self._lanes.values()):
+                    break
+                await self._sleep(wait)
+                continue
+            chats = self._lanes[lane]
+            queue = chats.pop(chat_id)
+            self._global.take()
+            self._bucket(chat_id).take()
+            queue.popleft().set_result(None)
+            if queue:
+                # в конец круга: следующим обслуживается другой чат
+                chats[chat_id] = queue
+
+    async def _sleep(self, delay: float) -> None:
+        wakeup = self._wakeup
+        if wakeup is None:
+            await asyncio.sleep(delay)
+            return
+        wakeup.clear()
+        with suppress(TimeoutError):
+            await asyncio.wait_for(wakeup.wait(), timeout=delay)
+
+
+send_scheduler = SendScheduler(
+    global_rate=settings.tg_rate_global,
+    global_burst=settings.tg_rate_global_burst,
+    chat_rate=settings.tg_rate_chat,
+    chat_burst=settings.tg_rate_chat_burst,
+    group_rate=settings.tg_rate_group,
+    max_retries=settings.tg_retry_attempts,
+    max_retry_after=settings.tg_max_retry_after,
+)
@@ -0,0 +1,59 @@
+"""Настройки HTTP-транспорта к WB: HTTP/2, пул соединений и таймауты по типам вызовов."""
+
+from __future__ import annotations
+
+import importlib.util
+from typing import Literal
+
+import httpx
+
+from bot_wb.logging import logger
+from bot_wb.settings import settings
+
+CallType = Literal["api", "probe", "bulk"]
+
+
+def http2_available() -> bool:
+    """HTTP/2 в httpx требует необязательный пакет ``h2`` (``httpx[http2]``)."""
+
+    return importlib.util.find_spec("h2") is not None
+
+
+def wb_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.wb_max_connections,
+        max_keepalive_connections=settings.wb_max_keepalive,
+        keepalive_expiry=settings.wb_keepalive_expiry,
+    )
+
+
+def wb_timeout(call_type: CallType = "api") -> httpx.Timeout:
+    """Таймауты запроса: connect общий, read/write/pool зависят от типа вызова.
+
+    Ожидание свободного соединения в пуле ограничено тем же сроком, что и
+    чтение: при пике опросов очередь к пулу — норма, а не отказ WB.
+
+    * ``api`` — обычные JSON-ручки кабинета;
+    * ``probe`` — проверка сессии, её лучше быстро признать неудачной;
+    * ``bulk`` — выгрузки и загрузки файлов.
+    """
+
+    read = {
+        "api": settings.wb_read_timeout,
+        "probe": settings.wb_probe_read_timeout,
+        "bulk": settings.wb_bulk_read_timeout,
+    }[call_type]
+    return httpx.Timeout(
+        connect=settings.wb_connect_timeout,
+        read=read,
+        write=read,
+        pool=read,
+    )
+
+
+def make_transport() -> httpx.AsyncHTTPTransport:
+    http2 = settings.wb_http2
+    if http2 and not http2_available():
+        logger.warning("WB_HTTP2 is enabled but the h2 package is missing, using HTTP/1.1")
+        http2 = False
+    return httpx.AsyncHTTPTransport(http2=http2, limits=wb_limits())
@@ -1,14 +1,22 @@
 from __future__ import annotations
 
 import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from contextlib import suppress
 from typing import Any
 
 import httpx
 from httpx import AsyncBaseTransport, Cookies
 
+from bot_wb import metrics
 from bot_wb.logging import logger
 from bot_wb.settings import settings
-from bot_wb.storage.session import CookieStorage
+from bot_wb.storage.session import SessionStorage, open_cookie_storage
+
+from .rate_limiter import RateLimitedError, RateLimiter, parse_retry_after, rate_limiter
+from .resilience import CircuitBreakers, RetryPolicy, circuit_breakers, default_retry_policy
+from .session_probe import SessionProbe, make_probe
+from .transport import CallType, make_transport, wb_timeout
 
 DEFAULT_HEADERS = {
     "Accept": "application/json, text/plain, */*",
@@ -17,50 +25,205 @@ DEFAULT_HEADERS = {
     "Referer": settings.wb_seller_base.rstrip("/") + "/",
 }
 
+# чтения, которые можно склеивать: тело запроса у них пустое
+COALESCED_METHODS = frozenset({"GET", "HEAD"})
+# статусы, чей Retry-After ставит на паузу лимитер
+RETRY_AFTER_STATUSES = frozenset({httpx.codes.TOO_MANY_REQUESTS, httpx.codes.SERVICE_UNAVAILABLE})
+
+
+class SingleFlight:
+    """Склеивает одновременные одинаковые чтения в один запрос к WB.
+
+    Первый вызов запускает запрос отдельной задачей, остальные ждут её результат.
+    Отмена одного из ожидающих не прерывает запрос для остальных.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[Hashable, asyncio.Task[Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        metrics.inc("wb_singleflight.calls")
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            metrics.inc("wb_singleflight.coalesced")
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task[Any]) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # все ожидающие могли уйти — не оставляем «never retrieved»
+            task.exception()
+
+
+def coalescing_ratio() -> float:
+    """Доля чтений, обслуженных чужим запросом."""
+
+    calls = metrics.get("wb_singleflight.calls")
+    return metrics.get("wb_singleflight.coalesced") / calls if calls else 0.0
+
+
+single_flight = SingleFlight()
+
 
 class WBHttpClient:
     """HTTP client for the WB Seller cabinet with retry/backoff logic."""
 
-    RETRY_ATTEMPTS = 3
-    RETRY_BASE_DELAY = 1.0
+    # дольше этого не ждём Retry-After внутри обработчика — отдаём ответ как есть
+    MAX_RETRY_AFTER = 30.0
 
-    def __init__(
+    def __init__(  # noqa: PLR0913
         self,
         tg_user_id: int,
         *,
-        storage: CookieStorage | None = None,
+        storage: SessionStorage | None = None,
         transport: AsyncBaseTransport | None = None,
+        probe: SessionProbe | None = None,
+        limiter: RateLimiter | None = None,
+        retry: RetryPolicy | None = None,
+        breakers: CircuitBreakers | None = None,
     ) -> None:
         self.tg_user_id = tg_user_id
-        self._store = storage or CookieStorage(tg_user_id)
+        self._limiter = limiter if limiter is not None else rate_limiter
+        self._retry = retry or default_retry_policy
+        self._breakers = breakers if breakers is not None else circuit_breakers
+        self._probe = probe or make_probe(settings.wb_session_probe)
+        self._store = storage or open_cookie_storage(tg_user_id)
+        self._saved_jar: dict[str, str] = dict(self._store.load() or {})
+        self._flush_task: asyncio.Task[None] | None = None
+        # записи cookies идут по одной; после discard_cookies клиент больше не пишет
+        self._write_lock = asyncio.Lock()
+        self._discarded = False
         jar = Cookies()
-        for key, value in (self._store.load() or {}).items():
+        for key, value in self._saved_jar.items():
             jar.set(key, value)
         self.client = httpx.AsyncClient(
             base_url=settings.wb_seller_base.rstrip("/") + "/",
             headers=DEFAULT_HEADERS.copy(),
             cookies=jar,
             follow_redirects=True,
-            timeout=25,
-            transport=transport,
+            timeout=wb_timeout("api"),
+            transport=transport if transport is not None else make_transport(),
         )
 
-    async def aclose(self) -> None:
-        await self.client.aclose()
+    async def aclose(self, *, persist: bool = True) -> None:
+        """Закрывает клиента; ``persist=False`` отбрасывает несохранённые cookies."""
+
+        try:
+            if persist:
+                await self.flush_cookies()
+            else:
+                await self.discard_cookies()
+        finally:
+            await self.client.aclose()
+
+    async def discard_cookies(self) -> None:
+        """Отменяет отложенную запись cookies, дожидается начатой; дальше не пишет.
+
+        Нужна, когда сессию сменили (перелогин, выход): иначе запись из потока,
+        начатая раньше, могла бы лечь поверх новой сессии.
+        """
+
+        self._discarded = True
+        task, self._flush_task = self._flush_task, None
+        if task is not None and not task.done():
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+        async with self._write_lock:
+            pass
 
     def update_cookies(self, jar: dict[str, str]) -> None:
         for key, value in jar.items():
             self.client.cookies.set(key, value)
         self._persist()
 
-    async def _request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
-        delay = self.RETRY_BASE_DELAY
-        for attempt in range(1, self.RETRY_ATTEMPTS + 1):
+    async def _request(  # noqa: PLR0913
+        self,
+        method: str,
+        url: str,
+        *,
+        stream: bool = False,
+        follow_redirects: bool | None = None,
+        call_type: CallType = "api",
+        on_send: Callable[[], None] | None = None,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """Запрос с ретраями; при ``stream=True`` тело не читается, закрывает вызывающий.
+
+        ``call_type`` выбирает таймауты (см. ``transport.wb_timeout``), ``on_send``
+        вызывается перед каждой отправкой, уже после ожидания в лимитере.
+
+        Одновременные одинаковые GET/HEAD одного httpx-клиента делят один запрос
+        и один (уже прочитанный) ответ: у двух клиентов одного аккаунта cookies
+        могут различаться, поэтому их запросы не склеиваются. Пока breaker хоста
+        открыт, сразу бросает ``CircuitOpenError``; если лимитер на паузе по
+        Retry-After дольше таймаута пула — ``RateLimitedError``.
+        """
+
+        if (
+            stream
+            or on_send is not None
+            or method.upper() not in COALESCED_METHODS
+            or set(kwargs) - {"params", "headers"}
+        ):
+            kwargs.setdefault("timeout", wb_timeout(call_type))
+            return await self._send(method, url, stream, follow_redirects, on_send, **kwargs)
+        kwargs["timeout"] = wb_timeout(call_type)
+        params = httpx.QueryParams(kwargs.get("params"))
+        key = (
+            id(self.client),
+            method.upper(),
+            url,
+            tuple(sorted(params.multi_items())),
+            tuple(sorted(httpx.Headers(kwargs.get("headers")).multi_items())),
+            follow_redirects,
+        )
+        return await single_flight.do(
+            key,
+            lambda: self._send(method, url, stream, follow_redirects, None, **kwargs),
+        )
+
+    async def _send(
+        self,
+        method: str,
+        url: str,
+        stream: bool,
+        follow_redirects: bool | None,
+        on_send: Callable[[], None] | None,
+        **kwargs: Any,
+    ) -> httpx.Response:
+
+        send_kwargs: dict[str, Any] = {"stream": stream}
+        if follow_redirects is not None:
+            send_kwargs["follow_redirects"] = follow_redirects
+        policy = self._retry
+        request = self.client.build_request(method, url, **kwargs)
+        breaker = self._breakers.for_host(request.url.host)
+        # дольше таймаута пула в лимитере не ждём: паузу WB лучше сразу отдать ошибкой
+        max_wait = httpx.Timeout(kwargs.get("timeout")).pool
+        for attempt in range(1, policy.attempts + 1):
+            breaker.before_request()
             try:
-                response = await self.client.request(method, url, **kwargs)
-                self._persist()
-                return response
+                await self._limiter.acquire(self.tg_user_id, max_wait=max_wait)
+                if attempt > 1:
+                    request = self.client.build_request(method, url, **kwargs)
+                if on_send is not None:
+                    on_send()
+                response = await self.client.send(request, **send_kwargs)
+            except RateLimitedError:
+                # запрос не отправлялся, хост тут ни при чём
+                breaker.release()
+                raise
             except httpx.RequestError as exc:
+                breaker.record_failure()
                 logger.warning(
                     "WB request {} {} failed on attempt {}: {}",
                     method,
@@ -68,36 +231,131 @@ class WBHttpClient:
                     attempt,
                     exc,
                 )
-                if attempt == self.RETRY_ATTEMPTS:
+                if attempt == policy.attempts or not policy.can_retry_error(
+                    method,
+                    request.url.path,
+                    exc,
+                ):
                     raise
-                await asyncio.sleep(delay)
-                delay *= 2
+                await asyncio.sleep(policy.backoff(attempt))
+                continue
+            except BaseException:
+                breaker.release()
+                raise
+            if response.status_code >= httpx.codes.INTERNAL_SERVER_ERROR:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            self._persist()
+            # паузу по Retry-After соблюдаем, даже если сам запрос больше не повторяем
+            paused = self._honor_retry_after(response)
+            if attempt < policy.attempts and self._should_retry(method, response):
+                await response.aclose()
+                await self._backoff(response, policy.backoff(attempt), paused=paused)
+                continue
+            return response
         raise RuntimeError("unreachable")
 
-    def _persist(self) -> None:
-        self._store.save(
-            {cookie.name: cookie.value for cookie in self.client.cookies.jar},
+    def _should_retry(self, method: str, response: httpx.Response) -> bool:
+        if response.status_code not in self._retry.retry_statuses:
+            return False
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        if retry_after is not None and retry_after > self.MAX_RETRY_AFTER:
+            return False
+        # 429 означает, что запрос не обработан, его безопасно повторить всегда
+        return response.status_code == httpx.codes.TOO_MANY_REQUESTS or self._retry.is_idempotent(
+            method,
+            response.request.url.path,
         )
 
-    async def is_logged_in(self) -> bool:
+    def _honor_retry_after(self, response: httpx.Response) -> bool:
+        """Ставит лимитер на паузу по ``Retry-After`` ответа 429/503."""
+
+        if response.status_code not in RETRY_AFTER_STATUSES:
+            return False
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        if retry_after is None:
+            return False
+        if response.status_code == httpx.codes.TOO_MANY_REQUESTS:
+            # лимит аккаунта: паузу увидят все запросы этого продавца через лимитер
+            self._limiter.penalize(self.tg_user_id, retry_after)
+        else:
+            # перегружен сам WB: притормаживаем всех
+            self._limiter.penalize(None, retry_after)
+        return True
+
+    async def _backoff(self, response: httpx.Response, delay: float, *, paused: bool) -> None:
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        logger.warning(
+            "WB responded {} to {} {}, retrying in {:.1f}s",
+            response.status_code,
+            response.request.method,
+            response.request.url.path,
+            retry_after if retry_after is not None else delay,
+        )
+        if paused:
+            # паузу выдержит лимитер при следующем acquire
+            return
+        if response.status_code == httpx.codes.TOO_MANY_REQUESTS:
+            self._limiter.penalize(self.tg_user_id, delay)
+        else:
+            await asyncio.sleep(delay)
+
+    def _persist(self) -> None:
+        """Планирует отложенную запись cookies, только если jar действительно изменился."""
+
+        if self._discarded or self._snapshot() == self._saved_jar:
+            return
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    def _snapshot(self) -> dict[str, str]:
+        return {cookie.name: cookie.value or "" for cookie in self.client.cookies.jar}
+
+    async def _delayed_flush(self) -> None:
+        await asyncio.sleep(settings.cookie_flush_delay)
+        await self._write_cookies()
+
+    async def _write_cookies(self) -> None:
+        async with self._write_lock:
+            snapshot = self._snapshot()
+            if self._discarded or snapshot == self._saved_jar:
+                return
+            # запись на диск — в отдельном потоке, чтобы не блокировать event loop
+            write = asyncio.ensure_future(asyncio.to_thread(self._store.save, snapshot))
+            try:
+                await asyncio.shield(write)
+            except asyncio.CancelledError:
+                # поток не отменить: следующая запись начнётся только после этой
+                await asyncio.wait([write])
+                raise
+            self._saved_jar = snapshot
+
+    async def flush_cookies(self) -> None:
+        """Немедленно сохраняет отложенные изменения cookies."""
+
+        task, self._flush_task = self._flush_task, None
+        if task is not None and not task.done():
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+        await self._write_cookies()
+
+    async def check_session(self, probe: SessionProbe | None = None) -> bool:
+        """Как ``is_logged_in``, но сетевая ошибка — не ответ: ``httpx.HTTPError`` летит дальше."""
+
+        return await (probe or self._probe)(self)
+
+    async def is_logged_in(self, probe: SessionProbe | None = None) -> bool:
         try:
-            response = await self._request("GET", "", timeout=15)
+            return await self.check_session(probe)
         except httpx.HTTPError as exc:
             logger.info("WB auth health-check failed: {}", exc)
             return False
-        if response.status_code != httpx.codes.OK:
-            logger.info(
-                "WB auth health-check returned unexpected status {}",
-                response.status_code,
-            )
-            return False
-        body = response.text.lower()
-        ok = "seller" in body or "wildberries" in body or "<!doctype html" in body
-        if not ok:
-            logger.info("WB auth health-check body did not look valid")
-        return ok
 
     async def get_organization_name(self) -> str | None:
+        # без кэша ответов: это HTML кабинета под сессией, и после смены профиля
+        # или повторного входа имя должно быть актуальным
         try:
             response = await self._request("GET", "")
         except httpx.HTTPError as exc:
@@ -107,6 +365,98 @@ class WBHttpClient:
             return "Аккаунт WB Seller"
         return None
 
+    async def get_acceptance_coefficients(self, warehouse_ids: list[int]) -> list[dict[str, Any]]:
+        """Коэффициенты приёмки по складам на ближайшие дни (один запрос на все склады).
+
+        TODO: путь и формат — заглушка по образцу публичного API WB (ручка
+        ``/api/v1/acceptance/coefficients``), с ручкой кабинета не сверены; путь
+        задаётся ``WB_SLOTS_PATH``.
+        """
+
+        response = await self._request(
+            "GET",
+            settings.wb_slots_path,
+            params={"warehouseIDs": ",".join(str(w) for w in warehouse_ids)},
+        )
+        response.raise_for_status()
+        payload = response.json()
+        return payload if isinstance(payload, list) else []
+
+    async def create_supply(self, warehouse_id: int, goods: dict[str, int]) -> str:
+        """Создаёт поставку на склад с товарами ``баркод -> количество``; возвращает её id.
+
+        TODO: путь и тело запроса — заглушка, с ручкой кабинета не сверены; путь
+        задаётся ``WB_SUPPLY_CREATE_PATH``.
+        """
+
+        response = await self._request(
+            "POST",
+            settings.wb_supply_create_path,
+            json={
+                "warehouseId": warehouse_id,
+                "goods": [{"barcode": b, "quantity": q} for b, q in goods.items()],
+            },
+            call_type="bulk",
+        )
+        response.raise_for_status()
+        payload = response.json()
+        supply_id = (
+            payload.get("supplyId") or payload.get("id") if isinstance(payload, dict) else None
+        )
+        if not supply_id:
+            raise ValueError("WB did not return supply id")
+        return str(supply_id)
+
+    async def book_supply(
+        self,
+        supply_id: str,
+        body: bytes,
+        *,
+        on_send: Callable[[], None] | None = None,
+    ) -> httpx.Response:
+        """Бронирует поставку на дату: ``body`` — готовое JSON-тело запроса.
+
+        Ответ возвращается как есть: отказ WB (4xx) и неизвестный исход (5xx)
+        вызывающий различает сам. ``on_send`` — момент отправки после лимитера.
+
+        TODO: путь и тело запроса — заглушка, с ручкой кабинета не сверены; путь
+        задаётся ``WB_BOOKING_PATH``.
+        """
+
+        return await self._request(
+            "POST",
+            settings.wb_booking_path.format(supply_id=supply_id),
+            content=body,
+            headers={"Content-Type": "application/json"},
+            on_send=on_send,
+        )
+
+    async def get_stocks(self, date_from: str) -> list[dict[str, Any]]:
+        """Остатки, изменившиеся с ``date_from`` (``lastChangeDate``).
+
+        TODO: путь и формат — заглушка по образцу API статистики WB
+        (``/api/v1/supplier/stocks``), с ручкой кабинета не сверены; путь задаётся
+        ``WB_STOCKS_PATH``, для продаж — ``WB_SALES_PATH``.
+        """
+
+        return await self._get_changes(settings.wb_stocks_path, date_from)
+
+    async def get_sales(self, date_from: str) -> list[dict[str, Any]]:
+        """Продажи и возвраты, изменившиеся с ``date_from``, по возрастанию ``lastChangeDate``."""
+
+        return await self._get_changes(settings.wb_sales_path, date_from)
+
+    async def _get_changes(self, path: str, date_from: str) -> list[dict[str, Any]]:
+        response = await self._request(
+            "GET",
+            path,
+            params={"dateFrom": date_from},
+            call_type="bulk",
+        )
+        response.raise_for_status()
+        payload = response.json()
+        return payload if isinstance(payload, list) else []
+
     async def list_organizations(self) -> list[dict[str, str]]:
         """Placeholder that returns a single pseudo profile.
 
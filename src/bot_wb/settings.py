@@ -15,6 +15,23 @@ def _resolve_bot_token() -> str:
     return fallback or ""
 
 
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name)
+    return int(raw) if raw else default
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = os.getenv(name)
+    return float(raw) if raw else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    raw = os.getenv(name)
+    if not raw:
+        return default
+    return raw.strip().lower() in {"1", "true", "yes", "on"}
+
+
 @dataclass
 class Settings:
     bot_token: str = field(default_factory=_resolve_bot_token)
@@ -34,12 +51,167 @@ class Settings:
         ),
     )
     data_dir: Path = field(default_factory=lambda: Path(os.getenv("DATA_DIR", "data")))
+    db_readers: int = field(default_factory=lambda: _env_int("DB_READERS", 4))
+    db_wal: bool = field(default_factory=lambda: _env_bool("DB_WAL", True))
+    db_synchronous: str = field(
+        default_factory=lambda: os.getenv("DB_SYNCHRONOUS", "NORMAL").upper(),
+    )
+    db_cache_size: int = field(default_factory=lambda: _env_int("DB_CACHE_SIZE", -8000))
+    user_cache_size: int = field(default_factory=lambda: _env_int("USER_CACHE_SIZE", 10_000))
+    user_cache_ttl: float = field(default_factory=lambda: _env_float("USER_CACHE_TTL", 300.0))
+    user_cache_flush_interval: float = field(
+        default_factory=lambda: _env_float("USER_CACHE_FLUSH_INTERVAL", 1.0),
+    )
+    cookie_flush_delay: float = field(
+        default_factory=lambda: _env_float("COOKIE_FLUSH_DELAY", 0.5),
+    )
+    session_backend: str = field(
+        default_factory=lambda: os.getenv("SESSION_BACKEND", "files").lower(),
+    )
+    session_cache_size: int = field(
+        default_factory=lambda: _env_int("SESSION_CACHE_SIZE", 10_000),
+    )
+    wb_max_clients: int = field(default_factory=lambda: _env_int("WB_MAX_CLIENTS", 1000))
+    wb_client_idle_ttl: float = field(
+        default_factory=lambda: _env_float("WB_CLIENT_IDLE_TTL", 300.0),
+    )
+    auth_cache_ttl: float = field(default_factory=lambda: _env_float("AUTH_CACHE_TTL", 60.0))
+    auth_cache_stale_ttl: float = field(
+        default_factory=lambda: _env_float("AUTH_CACHE_STALE_TTL", 600.0),
+    )
+    auth_cache_size: int = field(default_factory=lambda: _env_int("AUTH_CACHE_SIZE", 10_000))
+    wb_session_probe: str = field(
+        default_factory=lambda: os.getenv("WB_SESSION_PROBE", "stream").lower(),
+    )
+    wb_probe_drain_bytes: int = field(
+        default_factory=lambda: _env_int("WB_PROBE_DRAIN_BYTES", 32768),
+    )
+    wb_rate_global: float = field(default_factory=lambda: _env_float("WB_RATE_GLOBAL", 10.0))
+    wb_rate_global_burst: float = field(
+        default_factory=lambda: _env_float("WB_RATE_GLOBAL_BURST", 20.0),
+    )
+    wb_rate_account: float = field(default_factory=lambda: _env_float("WB_RATE_ACCOUNT", 2.0))
+    wb_rate_account_burst: float = field(
+        default_factory=lambda: _env_float("WB_RATE_ACCOUNT_BURST", 5.0),
+    )
+    wb_max_retry_after: float = field(
+        default_factory=lambda: _env_float("WB_MAX_RETRY_AFTER", 300.0),
+    )
+    wb_retry_attempts: int = field(default_factory=lambda: _env_int("WB_RETRY_ATTEMPTS", 3))
+    wb_retry_base_delay: float = field(
+        default_factory=lambda: _env_float("WB_RETRY_BASE_DELAY", 0.5),
+    )
+    wb_retry_max_delay: float = field(
+        default_factory=lambda: _env_float("WB_RETRY_MAX_DELAY", 5.0),
+    )
+    wb_breaker_failures: int = field(default_factory=lambda: _env_int("WB_BREAKER_FAILURES", 5))
+    wb_breaker_reset: float = field(default_factory=lambda: _env_float("WB_BREAKER_RESET", 30.0))
+    wb_http2: bool = field(default_factory=lambda: _env_bool("WB_HTTP2", True))
+    wb_max_connections: int = field(
+        default_factory=lambda: _env_int("WB_MAX_CONNECTIONS", 100),
+    )
+    wb_max_keepalive: int = field(default_factory=lambda: _env_int("WB_MAX_KEEPALIVE", 20))
+    wb_keepalive_expiry: float = field(
+        default_factory=lambda: _env_float("WB_KEEPALIVE_EXPIRY", 30.0),
+    )
+    wb_connect_timeout: float = field(
+        default_factory=lambda: _env_float("WB_CONNECT_TIMEOUT", 5.0),
+    )
+    wb_read_timeout: float = field(default_factory=lambda: _env_float("WB_READ_TIMEOUT", 25.0))
+    wb_probe_read_timeout: float = field(
+        default_factory=lambda: _env_float("WB_PROBE_READ_TIMEOUT", 10.0),
+    )
+    wb_bulk_read_timeout: float = field(
+        default_factory=lambda: _env_float("WB_BULK_READ_TIMEOUT", 120.0),
+    )
+    wb_slots_path: str = field(
+        default_factory=lambda: os.getenv("WB_SLOTS_PATH", "api/v1/acceptance/coefficients"),
+    )
+    slot_poll_budget: float = field(default_factory=lambda: _env_float("SLOT_POLL_BUDGET", 30.0))
+    slot_poll_batch: int = field(default_factory=lambda: _env_int("SLOT_POLL_BATCH", 10))
+    wb_booking_path: str = field(
+        default_factory=lambda: os.getenv("WB_BOOKING_PATH", "api/v1/supplies/{supply_id}/plan"),
+    )
+    booking_max_slots: int = field(default_factory=lambda: _env_int("BOOKING_MAX_SLOTS", 3))
+    booking_warm_interval: float = field(
+        default_factory=lambda: _env_float("BOOKING_WARM_INTERVAL", 20.0),
+    )
+    wb_supply_create_path: str = field(
+        default_factory=lambda: os.getenv("WB_SUPPLY_CREATE_PATH", "api/v1/supplies"),
+    )
+    # ручка создания поставок не сверена с кабинетом — загрузка файлов скрыта
+    supply_upload_enabled: bool = field(
+        default_factory=lambda: _env_bool("SUPPLY_UPLOAD_ENABLED", False),
+    )
+    supply_batch_size: int = field(default_factory=lambda: _env_int("SUPPLY_BATCH_SIZE", 1000))
+    supply_concurrency: int = field(default_factory=lambda: _env_int("SUPPLY_CONCURRENCY", 4))
+    supply_upload_max_mb: int = field(
+        default_factory=lambda: _env_int("SUPPLY_UPLOAD_MAX_MB", 20),
+    )
+    supply_progress_interval: float = field(
+        default_factory=lambda: _env_float("SUPPLY_PROGRESS_INTERVAL", 2.0),
+    )
+    wb_stocks_path: str = field(
+        default_factory=lambda: os.getenv("WB_STOCKS_PATH", "api/v1/supplier/stocks"),
+    )
+    wb_sales_path: str = field(
+        default_factory=lambda: os.getenv("WB_SALES_PATH", "api/v1/supplier/sales"),
+    )
+    stats_initial_days: int = field(default_factory=lambda: _env_int("STATS_INITIAL_DAYS", 90))
+    stats_page_limit: int = field(
+        default_factory=lambda: _env_int("STATS_PAGE_LIMIT", 80000),
+    )
+    browser_memory_budget_mb: int = field(
+        default_factory=lambda: _env_int("BROWSER_MEMORY_BUDGET_MB", 1024),
+    )
+    browser_base_mb: int = field(default_factory=lambda: _env_int("BROWSER_BASE_MB", 250))
+    browser_context_mb: int = field(default_factory=lambda: _env_int("BROWSER_CONTEXT_MB", 150))
+    browser_recycle_after: int = field(
+        default_factory=lambda: _env_int("BROWSER_RECYCLE_AFTER", 50),
+    )
+    browser_headless: bool = field(default_factory=lambda: _env_bool("BROWSER_HEADLESS", False))
+    browser_prewarm: bool = field(default_factory=lambda: _env_bool("BROWSER_PREWARM", False))
+    login_concurrency: int = field(default_factory=lambda: _env_int("LOGIN_CONCURRENCY", 0))
+    login_queue_limit: int = field(default_factory=lambda: _env_int("LOGIN_QUEUE_LIMIT", 50))
+    session_refresh_enabled: bool = field(
+        default_factory=lambda: _env_bool("SESSION_REFRESH_ENABLED", True),
+    )
+    session_refresh_lead: float = field(
+        default_factory=lambda: _env_float("SESSION_REFRESH_LEAD", 3600.0),
+    )
+    session_refresh_interval: float = field(
+        default_factory=lambda: _env_float("SESSION_REFRESH_INTERVAL", 300.0),
+    )
+    session_refresh_timeout: float = field(
+        default_factory=lambda: _env_float("SESSION_REFRESH_TIMEOUT", 30.0),
+    )
+    session_refresh_interactive_timeout: float = field(
+        default_factory=lambda: _env_float("SESSION_REFRESH_INTERACTIVE_TIMEOUT", 8.0),
+    )
+    session_refresh_concurrency: int = field(
+        default_factory=lambda: _env_int("SESSION_REFRESH_CONCURRENCY", 1),
+    )
+    tg_rate_global: float = field(default_factory=lambda: _env_float("TG_RATE_GLOBAL", 30.0))
+    tg_rate_global_burst: float = field(
+        default_factory=lambda: _env_float("TG_RATE_GLOBAL_BURST", 30.0),
+    )
+    tg_rate_chat: float = field(default_factory=lambda: _env_float("TG_RATE_CHAT", 1.0))
+    tg_rate_chat_burst: float = field(
+        default_factory=lambda: _env_float("TG_RATE_CHAT_BURST", 3.0),
+    )
+    tg_rate_group: float = field(default_factory=lambda: _env_float("TG_RATE_GROUP", 20 / 60))
+    tg_retry_attempts: int = field(default_factory=lambda: _env_int("TG_RETRY_ATTEMPTS", 3))
+    tg_max_retry_after: float = field(
+        default_factory=lambda: _env_float("TG_MAX_RETRY_AFTER", 60.0),
+    )
     sessions_dir: Path = field(init=False)
 
     def __post_init__(self) -> None:
         if not self.bot_token:
             raise RuntimeError("BOT_TOKEN is empty. Put it into .env")
         self.log_level = self.log_level.upper()
+        if self.session_backend not in {"files", "sqlite"}:
+            raise RuntimeError("SESSION_BACKEND must be 'files' or 'sqlite'")
         self.sessions_dir = self.data_dir / "sessions"
         self.data_dir.mkdir(parents=True, exist_ok=True)
         self.sessions_dir.mkdir(parents=True, exist_ok=True)
@@ -1 +1 @@
-__all__ = ["db", "repo"]
+__all__ = ["cache", "db", "migrations", "pool", "repo", "uow"]
@@ -0,0 +1,307 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import suppress
+from dataclasses import dataclass, field
+from typing import Any
+
+from bot_wb.logging import logger
+from bot_wb.settings import settings
+
+from .repo import CLEARED_AUTH_FIELDS, UserRepo
+
+
+@dataclass
+class _Entry:
+    row: dict[str, Any] | None = None
+    loaded: bool = False
+    loaded_at: float = 0.0
+    dirty: dict[str, Any] = field(default_factory=dict)
+    profiles: list[dict[str, Any]] | None = None
+    profiles_at: float = 0.0
+
+
+@dataclass
+class _Read:
+    """Идущие чтения строки из БД и счётчик изменений пользователя за это время."""
+
+    readers: int = 0
+    version: int = 0
+
+
+class UserStateCache:
+    """Кэш состояния пользователей перед ``UserRepo``.
+
+    Чтения обслуживаются из памяти (LRU + TTL), записи копятся как «грязные» поля
+    и сбрасываются в БД одной транзакцией раз в ``flush_interval`` секунд.
+    """
+
+    # сколько раз перечитывать строку, если пользователя меняли во время чтения
+    MAX_READ_ATTEMPTS = 3
+
+    def __init__(
+        self,
+        backend: UserRepo,
+        *,
+        max_entries: int = 10_000,
+        ttl: float = 300.0,
+        flush_interval: float = 1.0,
+    ) -> None:
+        self._backend = backend
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._flush_interval = flush_interval
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        # грязные поля вытесненных записей, ждущие следующего сброса
+        self._evicted_dirty: dict[int, dict[str, Any]] = {}
+        # есть только пока идёт чтение из БД: по версии видно, что строка устарела
+        self._reads: dict[int, _Read] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flusher: asyncio.Task[None] | None = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def dirty_count(self) -> int:
+        return sum(1 for e in self._entries.values() if e.dirty) + len(self._evicted_dirty)
+
+    async def get(self, tg_user_id: int) -> dict[str, Any] | None:
+        entry = self._entries.get(tg_user_id)
+        now = time.monotonic()
+        if entry and entry.loaded and (entry.dirty or now - entry.loaded_at < self._ttl):
+            self.hits += 1
+            self._entries.move_to_end(tg_user_id)
+            return dict(entry.row) if entry.row is not None else None
+
+        self.misses += 1
+        for _ in range(self.MAX_READ_ATTEMPTS - 1):
+            stale, row = await self._read(tg_user_id)
+            if not stale:
+                break
+        else:
+            # пользователя меняют без перерыва: последнюю попытку принимаем как есть
+            _, row = await self._read(tg_user_id)
+        # поля, записанные во время чтения и ещё не сброшенные, накладываются сверху
+        entry = self._entries.get(tg_user_id) or _Entry()
+        pending = self._evicted_dirty.pop(tg_user_id, {})
+        pending.update(entry.dirty)
+        if pending:
+            row = {**(row or {"tg_user_id": tg_user_id}), **pending}
+        entry.row, entry.loaded, entry.loaded_at, entry.dirty = row, True, now, pending
+        self._store(tg_user_id, entry)
+        return dict(row) if row is not None else None
+
+    async def _read(self, tg_user_id: int) -> tuple[bool, dict[str, Any] | None]:
+        """Строка из БД и признак, что пользователя меняли, пока шёл запрос.
+
+        Изменение, закончившееся во время чтения (сброс в БД, ``clear_auth``,
+        ``invalidate``), могло не попасть в прочитанную строку и уже уйти из
+        грязных полей — такую строку кэшировать нельзя, её нужно перечитать.
+        """
+
+        read = self._reads.setdefault(tg_user_id, _Read())
+        read.readers += 1
+        version = read.version
+        try:
+            row = await self._backend.get(tg_user_id)
+        finally:
+            read.readers -= 1
+            if not read.readers:
+                del self._reads[tg_user_id]
+        return read.version != version, row
+
+    def _touch(self, tg_user_id: int) -> None:
+        read = self._reads.get(tg_user_id)
+        if read is not None:
+            read.version += 1
+
+    def update(self, tg_user_id: int, **fields: Any) -> None:
+        if not fields:
+            return
+        entry = self._entries.get(tg_user_id) or _Entry()
+        entry.dirty.update(fields)
+        if entry.loaded:
+            entry.row = {**(entry.row or {"tg_user_id": tg_user_id}), **fields}
+        self._store(tg_user_id, entry)
+
+    async def clear_auth(self, tg_user_id: int) -> None:
+        """Сквозная запись: сброс авторизации не должен отложиться или потеряться."""
+
+        entry = self._entries.get(tg_user_id)
+        pending = self._evicted_dirty.get(tg_user_id, {})
+        for dirty in (entry.dirty if entry else {}, pending):
+            for key in (*CLEARED_AUTH_FIELDS, "is_authorized"):
+                dirty.pop(key, None)
+        try:
+            await self._backend.clear_auth(tg_user_id)
+        finally:
+            self._touch(tg_user_id)
+        entry = self._entries.get(tg_user_id)
+        if entry and entry.loaded and entry.row is not None:
+            entry.row.update(dict.fromkeys(CLEARED_AUTH_FIELDS))
+            entry.row["is_authorized"] = 0
+        if entry:
+            entry.profiles = None
+
+    def cached_profiles(self, tg_user_id: int) -> list[dict[str, Any]] | None:
+        entry = self._entries.get(tg_user_id)
+        if entry is None or entry.profiles is None:
+            return None
+        if time.monotonic() - entry.profiles_at >= self._ttl:
+            entry.profiles = None
+            return None
+        self.hits += 1
+        self._entries.move_to_end(tg_user_id)
+        return [dict(p) for p in entry.profiles]
+
+    def store_profiles(self, tg_user_id: int, profiles: list[dict[str, Any]] | None) -> None:
+        entry = self._entries.get(tg_user_id) or _Entry()
+        entry.profiles = [dict(p) for p in profiles] if profiles is not None else None
+        entry.profiles_at = time.monotonic()
+        self._store(tg_user_id, entry)
+
+    def invalidate(self, tg_user_id: int) -> None:
+        self._touch(tg_user_id)
+        entry = self._entries.get(tg_user_id)
+        if entry is None:
+            return
+        if entry.dirty:
+            entry.loaded = False
+            entry.profiles = None
+        else:
+            del self._entries[tg_user_id]
+
+    def _store(self, tg_user_id: int, entry: _Entry) -> None:
+        self._entries[tg_user_id] = entry
+        self._entries.move_to_end(tg_user_id)
+        while len(self._entries) > self._max_entries:
+            old_id, old = self._entries.popitem(last=False)
+            if old.dirty:
+                self._evicted_dirty.setdefault(old_id, {}).update(old.dirty)
+
+    async def flush(self) -> int:
+        """Сбрасывает все грязные поля одной транзакцией, возвращает число пользователей."""
+
+        async with self._flush_lock:
+            batch = self._evicted_dirty
+            self._evicted_dirty = {}
+            for tg_user_id, entry in self._entries.items():
+                if entry.dirty:
+                    batch.setdefault(tg_user_id, {}).update(entry.dirty)
+                    entry.dirty = {}
+            if not batch:
+                return 0
+            try:
+                await self._backend.upsert_many(batch)
+            except BaseException:
+                # возвращаем поля обратно, не затирая более свежие изменения
+                for tg_user_id, fields in batch.items():
+                    target = self._entries.get(tg_user_id)
+                    if target is not None:
+                        dirty = target.dirty
+                    else:
+                        dirty = self._evicted_dirty.setdefault(tg_user_id, {})
+                    for key, value in fields.items():
+                        dirty.setdefault(key, value)
+                raise
+            finally:
+                self._settle(batch)
+            logger.debug("User cache flushed {} dirty users", len(batch))
+            return len(batch)
+
+    def _settle(self, batch: dict[int, dict[str, Any]]) -> None:
+        """После записи в БД: строки, прочитанные во время сброса, без его полей."""
+
+        for tg_user_id, fields in batch.items():
+            self._touch(tg_user_id)
+            entry = self._entries.get(tg_user_id)
+            if entry is not None and entry.loaded:
+                base = entry.row or {"tg_user_id": tg_user_id}
+                entry.row = {**base, **fields, **entry.dirty}
+
+    def start(self) -> None:
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop(), name="user-cache-flush")
+
+    async def stop(self) -> None:
+        flusher, self._flusher = self._flusher, None
+        if flusher is not None:
+            flusher.cancel()
+            with suppress(asyncio.CancelledError):
+                await flusher
+        await self.flush()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            try:
+                await self.flush()
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("User cache flush failed, will retry: {}", exc)
+
+
+class CachedUserRepo(UserRepo):
+    """``UserRepo``, у которого чтения и записи строки ``users`` идут через кэш."""
+
+    def __init__(self, cache: UserStateCache | None = None) -> None:
+        super().__init__()
+        self._cache = cache if cache is not None else user_cache
+
+    async def _read(self, tg_user_id: int):
+        return await self._cache.get(tg_user_id)
+
+    async def _write(self, tg_user_id: int, fields: dict):
+        self._cache.update(tg_user_id, **fields)
+
+    async def upsert_many(self, rows: dict[int, dict]):
+        for tg_user_id, fields in rows.items():
+            self._cache.update(tg_user_id, **fields)
+
+    async def _clear(self, tg_user_id: int):
+        await self._cache.clear_auth(tg_user_id)
+
+    async def get_profiles(self, tg_user_id: int) -> list[dict]:
+        profiles = self._cache.cached_profiles(tg_user_id)
+        if profiles is None:
+            self._cache.misses += 1
+            profiles = await super().get_profiles(tg_user_id)
+            self._cache.store_profiles(tg_user_id, profiles)
+        return profiles
+
+    async def get_profile(self, tg_user_id: int, profile_id: str) -> dict | None:
+        profiles = self._cache.cached_profiles(tg_user_id)
+        if profiles is None:
+            return await super().get_profile(tg_user_id, profile_id)
+        return next((p for p in profiles if p["id"] == profile_id), None)
+
+    async def set_profiles(self, tg_user_id: int, profiles: list[dict]):
+        await super().set_profiles(tg_user_id, profiles)
+        self._cache.store_profiles(
+            tg_user_id,
+            [
+                {"id": str(p.get("id")), "name": p.get("name"), "inn": p.get("inn") or ""}
+                for p in profiles
+                if p.get("id") is not None
+            ],
+        )
+
+    async def update_profile(self, tg_user_id: int, profile_id: str, **fields):
+        await super().update_profile(tg_user_id, profile_id, **fields)
+        self._cache.store_profiles(tg_user_id, None)
+
+    async def remove_profile(self, tg_user_id: int, profile_id: str):
+        await super().remove_profile(tg_user_id, profile_id)
+        self._cache.store_profiles(tg_user_id, None)
+
+
+user_cache = UserStateCache(
+    UserRepo(),
+    max_entries=settings.user_cache_size,
+    ttl=settings.user_cache_ttl,
+    flush_interval=settings.user_cache_flush_interval,
+)
@@ -0,0 +1,229 @@
+"""Версионированные миграции схемы SQLite.
+
+Текущая версия схемы хранится в ``PRAGMA user_version``. Если база уже на
+последней версии, ``migrate`` ограничивается одним чтением прагмы; иначе все
+недостающие шаги применяются в одной транзакции.
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Awaitable, Callable
+
+import aiosqlite
+
+from bot_wb.logging import logger
+
+Migration = Callable[[aiosqlite.Connection], Awaitable[None]]
+
+USERS_SQL = """
+CREATE TABLE IF NOT EXISTS users (
+    tg_user_id INTEGER PRIMARY KEY,
+    phone TEXT,
+    email TEXT,
+    cookies TEXT,
+    api_token TEXT,
+    is_authorized INTEGER DEFAULT 0,
+    profile_org TEXT,
+    anchor_msg_id INTEGER,
+    current_view TEXT,
+    profiles_json TEXT,
+    active_profile_id TEXT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+# колонки, добавленные в users до появления версий схемы
+LEGACY_USER_COLUMNS = [
+    ("profile_org", "ALTER TABLE users ADD COLUMN profile_org TEXT"),
+    ("anchor_msg_id", "ALTER TABLE users ADD COLUMN anchor_msg_id INTEGER"),
+    ("current_view", "ALTER TABLE users ADD COLUMN current_view TEXT"),
+    ("api_token", "ALTER TABLE users ADD COLUMN api_token TEXT"),
+    ("profiles_json", "ALTER TABLE users ADD COLUMN profiles_json TEXT"),
+    ("active_profile_id", "ALTER TABLE users ADD COLUMN active_profile_id TEXT"),
+]
+
+PROFILES_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS profiles (
+        tg_user_id INTEGER NOT NULL,
+        profile_id TEXT NOT NULL,
+        name TEXT,
+        inn TEXT,
+        position INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (tg_user_id, profile_id)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_profiles_user_position ON profiles (tg_user_id, position)",
+]
+
+SLOT_SUBSCRIPTIONS_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS slot_subscriptions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tg_user_id INTEGER NOT NULL,
+        warehouse_id INTEGER NOT NULL,
+        box_type_id INTEGER,
+        date_from TEXT NOT NULL,
+        date_to TEXT NOT NULL,
+        max_coefficient INTEGER NOT NULL DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_slot_subscriptions_user ON slot_subscriptions (tg_user_id)",
+]
+
+# компактный локальный кэш статистики: даты — секунды epoch, ключи без rowid
+STATS_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS stock_levels (
+        tg_user_id INTEGER NOT NULL,
+        barcode TEXT NOT NULL,
+        warehouse TEXT NOT NULL,
+        nm_id INTEGER,
+        quantity INTEGER NOT NULL,
+        updated_at INTEGER NOT NULL,
+        PRIMARY KEY (tg_user_id, barcode, warehouse)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS sales (
+        tg_user_id INTEGER NOT NULL,
+        srid TEXT NOT NULL,
+        sold_at INTEGER NOT NULL,
+        barcode TEXT NOT NULL,
+        warehouse TEXT NOT NULL,
+        nm_id INTEGER,
+        quantity INTEGER NOT NULL,
+        price REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (tg_user_id, srid)
+    ) WITHOUT ROWID
+    """,
+    # покрывающие индексы: выборки по периоду и по товару не читают саму таблицу
+    "CREATE INDEX IF NOT EXISTS idx_sales_user_time ON sales "
+    "(tg_user_id, sold_at, barcode, warehouse, quantity, price)",
+    "CREATE INDEX IF NOT EXISTS idx_sales_user_barcode ON sales "
+    "(tg_user_id, barcode, sold_at, warehouse, quantity)",
+    """
+    CREATE TABLE IF NOT EXISTS sync_cursors (
+        tg_user_id INTEGER NOT NULL,
+        stream TEXT NOT NULL,
+        cursor TEXT NOT NULL,
+        synced_at INTEGER NOT NULL,
+        PRIMARY KEY (tg_user_id, stream)
+    ) WITHOUT ROWID
+    """,
+]
+
+
+# продажа и её возврат приходят с одним srid, но разными saleID («S…»/«R…»):
+# ключ по srid давал возврату затереть продажу
+SALES_BY_SALE_ID_SQL = [
+    "DROP TABLE IF EXISTS sales",
+    """
+    CREATE TABLE sales (
+        tg_user_id INTEGER NOT NULL,
+        sale_id TEXT NOT NULL,
+        sold_at INTEGER NOT NULL,
+        barcode TEXT NOT NULL,
+        warehouse TEXT NOT NULL,
+        nm_id INTEGER,
+        quantity INTEGER NOT NULL,
+        price REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (tg_user_id, sale_id)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_sales_user_time ON sales "
+    "(tg_user_id, sold_at, barcode, warehouse, quantity, price)",
+    "CREATE INDEX IF NOT EXISTS idx_sales_user_barcode ON sales "
+    "(tg_user_id, barcode, sold_at, warehouse, quantity)",
+    # старые строки неполны: продажи перечитываются с нуля
+    "DELETE FROM sync_cursors WHERE stream='sales'",
+]
+
+
+async def _v1_users(db: aiosqlite.Connection) -> None:
+    await db.execute(USERS_SQL)
+    # базы, созданные до user_version, могут не иметь части колонок
+    async with db.execute("PRAGMA table_info(users)") as cur:
+        cols = {r[1] for r in await cur.fetchall()}
+    for col, ddl in LEGACY_USER_COLUMNS:
+        if col not in cols:
+            await db.execute(ddl)
+
+
+async def _v2_profiles(db: aiosqlite.Connection) -> None:
+    for sql in PROFILES_SQL:
+        await db.execute(sql)
+    # переносим устаревший users.profiles_json в таблицу profiles
+    async with db.execute(
+        "SELECT tg_user_id, profiles_json FROM users WHERE profiles_json IS NOT NULL",
+    ) as cur:
+        rows = await cur.fetchall()
+    for tg_user_id, raw in rows:
+        try:
+            profiles = json.loads(raw)
+        except json.JSONDecodeError:
+            profiles = []
+        await db.executemany(
+            "INSERT OR IGNORE INTO profiles (tg_user_id, profile_id, name, inn, position) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [
+                (tg_user_id, str(p.get("id")), p.get("name"), p.get("inn"), position)
+                for position, p in enumerate(profiles)
+                if isinstance(p, dict) and p.get("id") is not None
+            ],
+        )
+    if rows:
+        await db.execute("UPDATE users SET profiles_json=NULL WHERE profiles_json IS NOT NULL")
+
+
+async def _v3_slot_subscriptions(db: aiosqlite.Connection) -> None:
+    for sql in SLOT_SUBSCRIPTIONS_SQL:
+        await db.execute(sql)
+
+
+async def _v4_stats(db: aiosqlite.Connection) -> None:
+    for sql in STATS_SQL:
+        await db.execute(sql)
+
+
+async def _v5_sales_by_sale_id(db: aiosqlite.Connection) -> None:
+    for sql in SALES_BY_SALE_ID_SQL:
+        await db.execute(sql)
+
+
+MIGRATIONS: list[tuple[int, Migration]] = [
+    (1, _v1_users),
+    (2, _v2_profiles),
+    (3, _v3_slot_subscriptions),
+    (4, _v4_stats),
+    (5, _v5_sales_by_sale_id),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+async def get_version(db: aiosqlite.Connection) -> int:
+    async with db.execute("PRAGMA user_version") as cur:
+        row = await cur.fetchone()
+    return int(row[0]) if row else 0
+
+
+async def migrate(db: aiosqlite.Connection) -> int:
+    """Применяет недостающие миграции и возвращает итоговую версию схемы.
+
+    Коммит/откат выполняет вызывающая сторона (``ConnectionPool.writer``).
+    """
+
+    version = await get_version(db)
+    if version >= LATEST_VERSION:
+        return version
+    pending = [(v, step) for v, step in MIGRATIONS if v > version]
+    await db.execute("BEGIN IMMEDIATE")
+    for target, step in pending:
+        await step(db)
+        logger.info("Applied schema migration v{}", target)
+    # PRAGMA не поддерживает параметры, версия — целое из MIGRATIONS
+    await db.execute(f"PRAGMA user_version={int(LATEST_VERSION)}")
+    return LATEST_VERSION
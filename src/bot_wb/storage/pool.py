@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager, suppress
+from pathlib import Path
+
+import aiosqlite
+
+from bot_wb.logging import logger
+from bot_wb.settings import settings
+
+_SYNCHRONOUS_MODES = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+
+class ConnectionPool:
+    """Долгоживущие соединения aiosqlite: один писатель и ограниченный набор читателей.
+
+    Соединения открываются один раз при старте бота и переиспользуются всеми
+    репозиториями, вместо ``aiosqlite.connect`` на каждый запрос.
+    """
+
+    BUSY_TIMEOUT_MS = 5000
+
+    def __init__(
+        self,
+        db_path: Path,
+        *,
+        readers: int = 4,
+        wal: bool = True,
+        synchronous: str = "NORMAL",
+        cache_size: int = -8000,
+    ) -> None:
+        if readers < 1:
+            raise ValueError("ConnectionPool needs at least one reader connection")
+        synchronous = synchronous.upper()
+        if synchronous not in _SYNCHRONOUS_MODES:
+            raise ValueError(f"Unsupported synchronous mode: {synchronous}")
+        self.db_path = Path(db_path)
+        self._readers_count = readers
+        self._wal = wal
+        self._synchronous = synchronous
+        self._cache_size = cache_size
+        self._writer: aiosqlite.Connection | None = None
+        self._write_lock = asyncio.Lock()
+        self._readers: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+        self._all_readers: list[aiosqlite.Connection] = []
+
+    @property
+    def is_open(self) -> bool:
+        return self._writer is not None
+
+    async def open(self) -> None:
+        if self.is_open:
+            return
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # без WAL читатели блокируются писателем, поэтому держим одно соединение
+        readers = self._readers_count if self._wal else 1
+        try:
+            self._writer = await self._connect()
+            # WAL-режим нужен до открытия читателей, иначе они не увидят его сразу
+            if self._wal:
+                async with self._writer.execute("PRAGMA journal_mode=WAL") as cur:
+                    await cur.fetchone()
+            for _ in range(readers):
+                conn = await self._connect()
+                self._all_readers.append(conn)
+                self._readers.put_nowait(conn)
+        except BaseException:
+            await self.close()
+            raise
+        logger.info(
+            "SQLite pool opened: {} (readers={}, wal={}, synchronous={})",
+            self.db_path,
+            readers,
+            self._wal,
+            self._synchronous,
+        )
+
+    async def close(self) -> None:
+        writer, self._writer = self._writer, None
+        readers, self._all_readers = self._all_readers, []
+        self._readers = asyncio.Queue()
+        for conn in readers:
+            with suppress(Exception):
+                await conn.close()
+        if writer is not None:
+            with suppress(Exception):
+                await writer.close()
+            logger.info("SQLite pool closed: {}", self.db_path)
+
+    async def _connect(self) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(self.db_path)
+        conn.row_factory = aiosqlite.Row
+        try:
+            for pragma in (
+                f"PRAGMA busy_timeout={self.BUSY_TIMEOUT_MS}",
+                f"PRAGMA synchronous={self._synchronous}",
+                f"PRAGMA cache_size={int(self._cache_size)}",
+            ):
+                async with conn.execute(pragma) as cur:
+                    await cur.fetchall()
+        except BaseException:
+            await conn.close()
+            raise
+        return conn
+
+    @asynccontextmanager
+    async def reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        if not self.is_open:
+            raise RuntimeError("ConnectionPool is not open")
+        conn = await self._readers.get()
+        try:
+            yield conn
+        finally:
+            if conn in self._all_readers:
+                self._readers.put_nowait(conn)
+
+    @asynccontextmanager
+    async def writer(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Единственное пишущее соединение: коммит при успехе, откат при ошибке."""
+
+        async with self._write_lock:
+            conn = self._writer
+            if conn is None:
+                raise RuntimeError("ConnectionPool is not open")
+            try:
+                yield conn
+            except BaseException:
+                await conn.rollback()
+                raise
+            else:
+                await conn.commit()
+
+
+_pool: ConnectionPool | None = None
+
+
+async def open_pool(db_path: Path) -> ConnectionPool:
+    """Открывает общий пул с параметрами из настроек (вызывается из ``main.main``)."""
+
+    global _pool  # noqa: PLW0603
+    if _pool is not None and _pool.is_open:
+        return _pool
+    pool = ConnectionPool(
+        db_path,
+        readers=settings.db_readers,
+        wal=settings.db_wal,
+        synchronous=settings.db_synchronous,
+        cache_size=settings.db_cache_size,
+    )
+    await pool.open()
+    _pool = pool
+    return pool
+
+
+def get_pool() -> ConnectionPool:
+    if _pool is None or not _pool.is_open:
+        raise RuntimeError("SQLite pool is not initialized; call open_pool() first")
+    return _pool
+
+
+async def close_pool() -> None:
+    global _pool  # noqa: PLW0603
+    pool, _pool = _pool, None
+    if pool is not None:
+        await pool.close()
@@ -1,39 +1,81 @@
-import json
+from .pool import ConnectionPool, get_pool
+from .uow import current_unit_of_work
 
-import aiosqlite
+# поля, которые обнуляются при выходе из аккаунта (is_authorized сбрасывается в 0)
+CLEARED_AUTH_FIELDS = (
+    "phone",
+    "email",
+    "cookies",
+    "api_token",
+    "profile_org",
+    "current_view",
+    "profiles_json",
+    "active_profile_id",
+)
 
-from .db import DB_PATH
+
+_PROFILE_COLUMNS = ("name", "inn", "position")
+
+
+def _profile_from_row(row) -> dict:
+    return {"id": row["profile_id"], "name": row["name"], "inn": row["inn"] or ""}
+
+
+def _upsert_sql(fields) -> str:
+    keys = ", ".join(fields)
+    placeholders = ", ".join(["?"] * len(fields))
+    updates = ", ".join([f"{k}=excluded.{k}" for k in fields])
+    return (
+        f"INSERT INTO users (tg_user_id,{keys}) VALUES (?,{placeholders}) "
+        "ON CONFLICT(tg_user_id) DO UPDATE "
+        f"SET {updates}, updated_at=CURRENT_TIMESTAMP"
+    )
 
 
 class UserRepo:
-    def __init__(self, db_path=DB_PATH):
-        self._db_path = db_path
+    def __init__(self, pool: ConnectionPool | None = None):
+        self._explicit_pool = pool
+
+    @property
+    def _pool(self) -> ConnectionPool:
+        # пул открывается в main.main(), а репозитории создаются при импорте хендлеров
+        return self._explicit_pool or get_pool()
 
     async def get(self, tg_user_id: int):
-        async with aiosqlite.connect(self._db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cur = await db.execute(
-                "SELECT * FROM users WHERE tg_user_id=?",
-                (tg_user_id,),
-            )
-            row = await cur.fetchone()
-            return dict(row) if row else None
+        row = await self._read(tg_user_id)
+        uow = current_unit_of_work()
+        return uow.overlay(tg_user_id, row) if uow is not None else row
 
     async def upsert(self, tg_user_id: int, **fields):
         if not fields:
             return
-        keys = ", ".join(fields.keys())
-        placeholders = ", ".join(["?"] * len(fields))
-        updates = ", ".join([f"{k}=excluded.{k}" for k in fields])
-        values = list(fields.values())
-        q = (
-            f"INSERT INTO users (tg_user_id,{keys}) VALUES (?,{placeholders}) "
-            "ON CONFLICT(tg_user_id) DO UPDATE "
-            f"SET {updates}, updated_at=CURRENT_TIMESTAMP"
-        )
-        async with aiosqlite.connect(self._db_path) as db:
-            await db.execute(q, (tg_user_id, *values))
-            await db.commit()
+        uow = current_unit_of_work()
+        if uow is not None:
+            uow.record(self, tg_user_id, fields)
+            return
+        await self._write(tg_user_id, fields)
+
+    async def _read(self, tg_user_id: int):
+        async with (
+            self._pool.reader() as db,
+            db.execute("SELECT * FROM users WHERE tg_user_id=?", (tg_user_id,)) as cur,
+        ):
+            row = await cur.fetchone()
+        return dict(row) if row else None
+
+    async def _write(self, tg_user_id: int, fields: dict):
+        async with self._pool.writer() as db:
+            await db.execute(_upsert_sql(fields), (tg_user_id, *fields.values()))
+
+    async def upsert_many(self, rows: dict[int, dict]):
+        """Несколько upsert-ов (по одному на пользователя) в одной транзакции."""
+
+        rows = {tg_id: fields for tg_id, fields in rows.items() if fields}
+        if not rows:
+            return
+        async with self._pool.writer() as db:
+            for tg_user_id, fields in rows.items():
+                await db.execute(_upsert_sql(fields), (tg_user_id, *fields.values()))
 
     async def set_anchor(self, tg_user_id: int, msg_id: int):
         await self.upsert(tg_user_id, anchor_msg_id=msg_id)
@@ -60,30 +102,89 @@ class UserRepo:
         await self.upsert(tg_user_id, profile_org=org)
 
     async def clear_auth(self, tg_user_id: int):
-        async with aiosqlite.connect(self._db_path) as db:
+        uow = current_unit_of_work()
+        if uow is not None:
+            uow.discard(tg_user_id, (*CLEARED_AUTH_FIELDS, "is_authorized"))
+        await self._clear(tg_user_id)
+
+    async def _clear(self, tg_user_id: int):
+        async with self._pool.writer() as db:
             await db.execute(
-                "UPDATE users SET phone=NULL,email=NULL,cookies=NULL,api_token=NULL,"
-                "is_authorized=0,profile_org=NULL,current_view=NULL,profiles_json=NULL,"
-                "active_profile_id=NULL,updated_at=CURRENT_TIMESTAMP "
+                f"UPDATE users SET {', '.join(f'{k}=NULL' for k in CLEARED_AUTH_FIELDS)},"
+                "is_authorized=0,updated_at=CURRENT_TIMESTAMP "
                 "WHERE tg_user_id=?",
                 (tg_user_id,),
             )
-            await db.commit()
+            await db.execute("DELETE FROM profiles WHERE tg_user_id=?", (tg_user_id,))
 
     async def set_profiles(self, tg_user_id: int, profiles: list[dict]):
-        await self.upsert(
-            tg_user_id,
-            profiles_json=json.dumps(profiles, ensure_ascii=False),
-        )
+        """Полностью заменяет список профилей пользователя."""
+
+        async with self._pool.writer() as db:
+            await db.execute("DELETE FROM profiles WHERE tg_user_id=?", (tg_user_id,))
+            await db.executemany(
+                "INSERT OR REPLACE INTO profiles (tg_user_id, profile_id, name, inn, position) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (tg_user_id, str(p.get("id")), p.get("name"), p.get("inn"), position)
+                    for position, p in enumerate(profiles)
+                    if p.get("id") is not None
+                ],
+            )
 
     async def get_profiles(self, tg_user_id: int) -> list[dict]:
-        u = await self.get(tg_user_id)
-        if not u or not u.get("profiles_json"):
-            return []
-        try:
-            return json.loads(u["profiles_json"])
-        except json.JSONDecodeError:
-            return []
+        async with (
+            self._pool.reader() as db,
+            db.execute(
+                "SELECT profile_id, name, inn FROM profiles WHERE tg_user_id=? "
+                "ORDER BY position, profile_id",
+                (tg_user_id,),
+            ) as cur,
+        ):
+            return [_profile_from_row(row) for row in await cur.fetchall()]
+
+    async def get_profile(self, tg_user_id: int, profile_id: str) -> dict | None:
+        async with (
+            self._pool.reader() as db,
+            db.execute(
+                "SELECT profile_id, name, inn FROM profiles WHERE tg_user_id=? AND profile_id=?",
+                (tg_user_id, profile_id),
+            ) as cur,
+        ):
+            row = await cur.fetchone()
+        return _profile_from_row(row) if row else None
+
+    async def update_profile(self, tg_user_id: int, profile_id: str, **fields):
+        """Частичное обновление одного профиля (``name``/``inn``/``position``).
+
+        Если профиля ещё нет, он добавляется в конец списка.
+        """
+
+        unknown = set(fields) - set(_PROFILE_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown profile fields: {', '.join(sorted(unknown))}")
+        columns = ["tg_user_id", "profile_id", *fields]
+        exprs = ["?"] * len(columns)
+        values = [tg_user_id, profile_id, *fields.values()]
+        if "position" not in fields:
+            columns.append("position")
+            exprs.append("(SELECT COALESCE(MAX(position) + 1, 0) FROM profiles WHERE tg_user_id=?)")
+            values.append(tg_user_id)
+        updates = ", ".join(f"{c}=excluded.{c}" for c in fields)
+        conflict = f"DO UPDATE SET {updates}" if fields else "DO NOTHING"
+        async with self._pool.writer() as db:
+            await db.execute(
+                f"INSERT INTO profiles ({', '.join(columns)}) VALUES ({', '.join(exprs)}) "
+                f"ON CONFLICT(tg_user_id, profile_id) {conflict}",
+                values,
+            )
+
+    async def remove_profile(self, tg_user_id: int, profile_id: str):
+        async with self._pool.writer() as db:
+            await db.execute(
+                "DELETE FROM profiles WHERE tg_user_id=? AND profile_id=?",
+                (tg_user_id, profile_id),
+            )
 
     async def set_active_profile(self, tg_user_id: int, profile_id: str):
         await self.upsert(tg_user_id, active_profile_id=profile_id)
@@ -91,3 +192,11 @@ class UserRepo:
     async def get_active_profile(self, tg_user_id: int) -> str | None:
         u = await self.get(tg_user_id)
         return u.get("active_profile_id") if u else None
+
+    async def get_active_profile_info(self, tg_user_id: int) -> dict | None:
+        """Только активный профиль, без чтения всего списка."""
+
+        active_id = await self.get_active_profile(tg_user_id)
+        if active_id is None:
+            return None
+        return await self.get_profile(tg_user_id, active_id)
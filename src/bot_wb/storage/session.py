@@ -1,39 +1,158 @@
 from __future__ import annotations
 
 import json
+import os
+import tempfile
+import threading
 from contextlib import suppress
 from pathlib import Path
-from typing import Any
+from typing import Any, Protocol
 
 from bot_wb.settings import settings
 
+from .session_db import SqliteCookieStorage, get_session_store
+
+
+class SessionStorage(Protocol):
+    """Общий интерфейс хранилищ cookie-сессий WB одного пользователя."""
+
+    def load(self) -> dict[str, Any]: ...
+
+    def save(self, jar: dict[str, Any]) -> None: ...
+
+    def clear(self) -> None: ...
+
+    def exists(self) -> bool: ...
+
+
+# поколение последней начатой записи или очистки файла; запись есть, пока запись идёт
+_generations: dict[Path, object] = {}
+_generations_lock = threading.Lock()
+
+
+def _write_atomic(path: Path, payload: str) -> None:
+    """Пишет во временный файл и переименовывает, если запись не устарела.
+
+    Записи идут в потоках и могут закончиться не в том порядке, в каком начались.
+    Перед ``os.replace`` сверяется поколение: если после начала этой записи
+    началась другая или файл очистили, временный файл просто удаляется.
+    """
+
+    generation = object()
+    with _generations_lock:
+        _generations[path] = generation
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.stem}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as tmp:
+            tmp.write(payload)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        with _generations_lock:
+            if _generations.get(path) is not generation:
+                # временный файл мог удалить уже clear()
+                with suppress(OSError):
+                    os.unlink(tmp_name)
+                return
+            os.replace(tmp_name, path)
+            del _generations[path]
+    except BaseException:
+        with suppress(OSError):
+            os.unlink(tmp_name)
+        raise
+
+
+def _supersede(path: Path) -> None:
+    """Делает устаревшими идущие записи ``path`` (перед его удалением)."""
+
+    with _generations_lock:
+        if path in _generations:
+            _generations[path] = object()
+
 
 class CookieStorage:
+    """Файловый бэкенд: ``<sessions_dir>/<tg_id>/cookies.json``."""
+
     def __init__(self, tg_user_id: int, root: Path | None = None):
         base_dir = root or settings.sessions_dir
-        base_dir.mkdir(parents=True, exist_ok=True)
+        # каталог создаётся лениво при первой записи, а не на каждое чтение
         self.dir = base_dir / str(tg_user_id)
-        self.dir.mkdir(parents=True, exist_ok=True)
         self.cookies_path = self.dir / "cookies.json"
 
+    def exists(self) -> bool:
+        return self.cookies_path.exists()
+
     def load(self) -> dict[str, Any]:
-        if self.cookies_path.exists():
-            try:
-                return json.loads(self.cookies_path.read_text(encoding="utf-8"))
-            except json.JSONDecodeError:
-                return {}
-        return {}
+        try:
+            return json.loads(self.cookies_path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
 
     def save(self, jar: dict[str, Any]) -> None:
+        """Атомарная запись: временный файл рядом с целевым и ``os.replace``."""
+
         safe_jar = {str(k): v for k, v in jar.items()}
-        self.cookies_path.write_text(
-            json.dumps(safe_jar, ensure_ascii=False, indent=2),
-            encoding="utf-8",
+        _write_atomic(
+            self.cookies_path,
+            json.dumps(safe_jar, ensure_ascii=False, separators=(",", ":")),
         )
 
     def clear(self) -> None:
+        _supersede(self.cookies_path)
         if self.dir.exists():
             for path in self.dir.glob("*"):
                 path.unlink(missing_ok=True)
             with suppress(OSError):
                 self.dir.rmdir()
+
+
+class BrowserStateStorage:
+    """``storage_state`` Playwright: ``<sessions_dir>/<tg_id>/state.json``.
+
+    В отличие от плоского jar хранит домен, путь и срок каждой cookie и
+    localStorage кабинета — этого хватает, чтобы поднять сессию в браузере без
+    ручного входа. Файл один при любом ``SESSION_BACKEND``: он нужен только
+    браузеру.
+    """
+
+    def __init__(self, tg_user_id: int, root: Path | None = None):
+        base_dir = root or settings.sessions_dir
+        self.dir = base_dir / str(tg_user_id)
+        self.path = self.dir / "state.json"
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def load(self) -> dict[str, Any] | None:
+        try:
+            state = json.loads(self.path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return state if isinstance(state, dict) else None
+
+    def save(self, state: dict[str, Any]) -> None:
+        _write_atomic(self.path, json.dumps(state, ensure_ascii=False, separators=(",", ":")))
+
+    def clear(self) -> None:
+        _supersede(self.path)
+        self.path.unlink(missing_ok=True)
+        with suppress(OSError):
+            self.dir.rmdir()
+
+
+def browser_state_users(root: Path | None = None) -> list[int]:
+    """Пользователи, для которых сохранён ``storage_state``."""
+
+    users = []
+    for path in (root or settings.sessions_dir).glob("*/state.json"):
+        with suppress(ValueError):
+            users.append(int(path.parent.name))
+    return users
+
+
+def open_cookie_storage(tg_user_id: int) -> SessionStorage:
+    """Хранилище сессии пользователя согласно ``SESSION_BACKEND`` (files|sqlite)."""
+
+    if settings.session_backend == "sqlite":
+        return SqliteCookieStorage(tg_user_id, get_session_store())
+    return CookieStorage(tg_user_id)
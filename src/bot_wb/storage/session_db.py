@@ -0,0 +1,150 @@
+"""SQLite-бэкенд cookie-сессий: все пользователи в одной индексированной таблице."""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+from bot_wb.settings import settings
+
+SESSIONS_SQL = """
+CREATE TABLE IF NOT EXISTS sessions (
+    tg_user_id INTEGER PRIMARY KEY,
+    cookies TEXT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+class SqliteSessionStore:
+    """Cookie-jar-ы всех пользователей в ``sessions.db`` с LRU-кэшем в памяти.
+
+    Интерфейс синхронный, как у ``CookieStorage``; промах кэша и запись идут в
+    SQLite, поэтому из асинхронного кода методы вызываются через
+    ``asyncio.to_thread`` (реестр клиентов строит ``WBHttpClient`` там же).
+    """
+
+    def __init__(self, db_path: Path, *, cache_size: int = 10_000) -> None:
+        self.db_path = Path(db_path)
+        self._cache_size = cache_size
+        # None в кэше означает «сессии нет» — это тоже ответ, который стоит помнить
+        self._cache: OrderedDict[int, dict[str, Any] | None] = OrderedDict()
+        self._lock = threading.Lock()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(SESSIONS_SQL)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+            self._cache.clear()
+
+    def _remember(self, tg_user_id: int, jar: dict[str, Any] | None) -> None:
+        self._cache[tg_user_id] = jar
+        self._cache.move_to_end(tg_user_id)
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    def load(self, tg_user_id: int) -> dict[str, Any] | None:
+        with self._lock:
+            if tg_user_id in self._cache:
+                self._cache.move_to_end(tg_user_id)
+                jar = self._cache[tg_user_id]
+                return dict(jar) if jar is not None else None
+            row = self._conn.execute(
+                "SELECT cookies FROM sessions WHERE tg_user_id=?",
+                (tg_user_id,),
+            ).fetchone()
+            jar = None
+            if row is not None:
+                try:
+                    jar = json.loads(row[0])
+                except json.JSONDecodeError:
+                    jar = {}
+            self._remember(tg_user_id, jar)
+            return dict(jar) if jar is not None else None
+
+    def save(self, tg_user_id: int, jar: dict[str, Any]) -> None:
+        self.save_many({tg_user_id: jar})
+
+    def save_many(self, jars: dict[int, dict[str, Any]]) -> None:
+        rows = [
+            (
+                tg_user_id,
+                json.dumps({str(k): v for k, v in jar.items()}, separators=(",", ":")),
+            )
+            for tg_user_id, jar in jars.items()
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO sessions (tg_user_id, cookies) VALUES (?, ?) "
+                    "ON CONFLICT(tg_user_id) DO UPDATE "
+                    "SET cookies=excluded.cookies, updated_at=CURRENT_TIMESTAMP",
+                    rows,
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            for tg_user_id, jar in jars.items():
+                self._remember(tg_user_id, dict(jar))
+
+    def delete(self, tg_user_id: int) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE tg_user_id=?", (tg_user_id,))
+            self._remember(tg_user_id, None)
+
+    def user_ids(self) -> list[int]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT tg_user_id FROM sessions")]
+
+
+class SqliteCookieStorage:
+    """Адаптер ``SqliteSessionStore`` к интерфейсу ``CookieStorage`` одного пользователя."""
+
+    def __init__(self, tg_user_id: int, store: SqliteSessionStore) -> None:
+        self.tg_user_id = tg_user_id
+        self._store = store
+
+    def exists(self) -> bool:
+        return self._store.load(self.tg_user_id) is not None
+
+    def load(self) -> dict[str, Any]:
+        return self._store.load(self.tg_user_id) or {}
+
+    def save(self, jar: dict[str, Any]) -> None:
+        self._store.save(self.tg_user_id, jar)
+
+    def clear(self) -> None:
+        self._store.delete(self.tg_user_id)
+
+
+_store: SqliteSessionStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SqliteSessionStore:
+    global _store  # noqa: PLW0603
+    with _store_lock:
+        if _store is None:
+            _store = SqliteSessionStore(
+                settings.data_dir / "sessions.db",
+                cache_size=settings.session_cache_size,
+            )
+        return _store
+
+
+def close_session_store() -> None:
+    global _store  # noqa: PLW0603
+    with _store_lock:
+        store, _store = _store, None
+    if store is not None:
+        store.close()
@@ -0,0 +1,79 @@
+"""Импорт файловых сессий ``<sessions_dir>/<tg_id>/cookies.json`` в ``sessions.db``.
+
+Запуск: ``python -m bot_wb.storage.session_migrate [--sessions-dir DIR] [--db FILE]``.
+Повторный запуск безопасен: существующие записи перезаписываются данными из файлов.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+
+from bot_wb.logging import logger, setup_logging
+from bot_wb.settings import settings
+
+from .session_db import SqliteSessionStore
+
+BATCH_SIZE = 500
+
+
+def import_directory_tree(
+    sessions_dir: Path,
+    store: SqliteSessionStore,
+    *,
+    remove_files: bool = False,
+) -> int:
+    """Переносит все ``cookies.json`` в store пачками, возвращает число пользователей."""
+
+    imported = 0
+    batch: dict[int, dict] = {}
+    migrated_paths: list[Path] = []
+    for path in sorted(sessions_dir.glob("*/cookies.json")):
+        try:
+            tg_user_id = int(path.parent.name)
+            jar = json.loads(path.read_text(encoding="utf-8"))
+        except (ValueError, json.JSONDecodeError) as exc:
+            logger.warning("Skipping session {}: {}", path, exc)
+            continue
+        if not isinstance(jar, dict):
+            continue
+        batch[tg_user_id] = jar
+        migrated_paths.append(path)
+        if len(batch) >= BATCH_SIZE:
+            store.save_many(batch)
+            imported += len(batch)
+            batch = {}
+    if batch:
+        store.save_many(batch)
+        imported += len(batch)
+    if remove_files:
+        for path in migrated_paths:
+            path.unlink(missing_ok=True)
+            if not any(path.parent.iterdir()):
+                path.parent.rmdir()
+    return imported
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0] if __doc__ else None)
+    parser.add_argument("--sessions-dir", type=Path, default=settings.sessions_dir)
+    parser.add_argument("--db", type=Path, default=settings.data_dir / "sessions.db")
+    parser.add_argument(
+        "--remove-files",
+        action="store_true",
+        help="удалить перенесённые cookies.json и пустые каталоги",
+    )
+    args = parser.parse_args(argv)
+
+    setup_logging(settings.log_level)
+    store = SqliteSessionStore(args.db)
+    try:
+        count = import_directory_tree(args.sessions_dir, store, remove_files=args.remove_files)
+    finally:
+        store.close()
+    logger.info("Imported {} sessions from {} into {}", count, args.sessions_dir, args.db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+from datetime import date
+
+from .pool import ConnectionPool, get_pool
+
+
+@dataclass(frozen=True)
+class SlotSubscription:
+    """Подписка на слоты приёмки: склад, тип упаковки, даты и предельный коэффициент.
+
+    ``box_type_id=None`` — подходит любой тип упаковки.
+    """
+
+    tg_user_id: int
+    warehouse_id: int
+    date_from: date
+    date_to: date
+    max_coefficient: int = 0
+    box_type_id: int | None = None
+    id: int | None = None
+
+
+def _from_row(row) -> SlotSubscription:
+    return SlotSubscription(
+        id=row["id"],
+        tg_user_id=row["tg_user_id"],
+        warehouse_id=row["warehouse_id"],
+        box_type_id=row["box_type_id"],
+        date_from=date.fromisoformat(row["date_from"]),
+        date_to=date.fromisoformat(row["date_to"]),
+        max_coefficient=row["max_coefficient"],
+    )
+
+
+_SELECT = (
+    "SELECT id, tg_user_id, warehouse_id, box_type_id, date_from, date_to, max_coefficient "
+    "FROM slot_subscriptions"
+)
+
+
+class SlotSubscriptionRepo:
+    def __init__(self, pool: ConnectionPool | None = None):
+        self._explicit_pool = pool
+
+    @property
+    def _pool(self) -> ConnectionPool:
+        return self._explicit_pool or get_pool()
+
+    async def add(self, sub: SlotSubscription) -> SlotSubscription:
+        async with (
+            self._pool.writer() as db,
+            db.execute(
+                "INSERT INTO slot_subscriptions "
+                "(tg_user_id, warehouse_id, box_type_id, date_from, date_to, max_coefficient) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    sub.tg_user_id,
+                    sub.warehouse_id,
+                    sub.box_type_id,
+                    sub.date_from.isoformat(),
+                    sub.date_to.isoformat(),
+                    sub.max_coefficient,
+                ),
+            ) as cur,
+        ):
+            sub_id = cur.lastrowid
+        return replace(sub, id=sub_id)
+
+    async def remove(self, tg_user_id: int, sub_id: int) -> bool:
+        async with (
+            self._pool.writer() as db,
+            db.execute(
+                "DELETE FROM slot_subscriptions WHERE id=? AND tg_user_id=?",
+                (sub_id, tg_user_id),
+            ) as cur,
+        ):
+            return cur.rowcount > 0
+
+    async def list_all(self) -> list[SlotSubscription]:
+        async with self._pool.reader() as db, db.execute(f"{_SELECT} ORDER BY id") as cur:
+            return [_from_row(row) for row in await cur.fetchall()]
+
+    async def list_for_user(self, tg_user_id: int) -> list[SlotSubscription]:
+        async with (
+            self._pool.reader() as db,
+            db.execute(f"{_SELECT} WHERE tg_user_id=? ORDER BY id", (tg_user_id,)) as cur,
+        ):
+            return [_from_row(row) for row in await cur.fetchall()]
@@ -0,0 +1,168 @@
+"""Локальный кэш остатков и продаж аккаунта (таблицы миграции v4).
+
+Страница дельты и курсор синхронизации пишутся одной транзакцией: курсор
+никогда не обгоняет сохранённые данные, а повтор страницы после сбоя
+безопасен — строки вставляются по первичному ключу с заменой.
+"""
+
+from __future__ import annotations
+
+import calendar
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import datetime
+
+from .pool import ConnectionPool, get_pool
+
+STOCKS = "stocks"
+SALES = "sales"
+
+
+def to_epoch(moment: datetime) -> int:
+    """Секунды epoch; время без зоны (как в статистике WB) берётся как есть."""
+
+    if moment.tzinfo is not None:
+        return int(moment.timestamp())
+    return calendar.timegm(moment.timetuple())
+
+
+@dataclass(frozen=True)
+class StockLevel:
+    barcode: str
+    warehouse: str
+    nm_id: int | None
+    quantity: int
+    updated_at: int
+
+
+@dataclass(frozen=True)
+class Sale:
+    # saleID; srid — только если saleID нет
+    sale_id: str
+    sold_at: int
+    barcode: str
+    warehouse: str
+    nm_id: int | None
+    # продажа — 1, возврат — -1
+    quantity: int
+    price: float
+
+
+class StatsRepo:
+    def __init__(self, pool: ConnectionPool | None = None):
+        self._explicit_pool = pool
+
+    @property
+    def _pool(self) -> ConnectionPool:
+        return self._explicit_pool or get_pool()
+
+    async def get_cursor(self, tg_user_id: int, stream: str) -> str | None:
+        async with (
+            self._pool.reader() as db,
+            db.execute(
+                "SELECT cursor FROM sync_cursors WHERE tg_user_id=? AND stream=?",
+                (tg_user_id, stream),
+            ) as cur,
+        ):
+            row = await cur.fetchone()
+        return row[0] if row else None
+
+    async def apply_stocks(
+        self,
+        tg_user_id: int,
+        levels: Iterable[StockLevel],
+        cursor: str,
+    ) -> None:
+        async with self._pool.writer() as db:
+            await db.executemany(
+                "INSERT OR REPLACE INTO stock_levels "
+                "(tg_user_id, barcode, warehouse, nm_id, quantity, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (tg_user_id, s.barcode, s.warehouse, s.nm_id, s.quantity, s.updated_at)
+                    for s in levels
+                ],
+            )
+            await self._set_cursor(db, tg_user_id, STOCKS, cursor)
+
+    async def apply_sales(self, tg_user_id: int, sales: Iterable[Sale], cursor: str) -> None:
+        async with self._pool.writer() as db:
+            await db.executemany(
+                "INSERT OR REPLACE INTO sales "
+                "(tg_user_id, sale_id, sold_at, barcode, warehouse, nm_id, quantity, price) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        tg_user_id,
+                        s.sale_id,
+                        s.sold_at,
+                        s.barcode,
+                        s.warehouse,
+                        s.nm_id,
+                        s.quantity,
+                        s.price,
+                    )
+                    for s in sales
+                ],
+            )
+            await self._set_cursor(db, tg_user_id, SALES, cursor)
+
+    @staticmethod
+    async def _set_cursor(db, tg_user_id: int, stream: str, cursor: str) -> None:
+        await db.execute(
+            "INSERT OR REPLACE INTO sync_cursors (tg_user_id, stream, cursor, synced_at) "
+            "VALUES (?, ?, ?, ?)",
+            (tg_user_id, stream, cursor, int(time.time())),
+        )
+
+    async def stock_levels(self, tg_user_id: int) -> list[StockLevel]:
+        async with (
+            self._pool.reader() as db,
+            db.execute(
+                "SELECT barcode, warehouse, nm_id, quantity, updated_at FROM stock_levels "
+                "WHERE tg_user_id=?",
+                (tg_user_id,),
+            ) as cur,
+        ):
+            return [StockLevel(*row) for row in await cur.fetchall()]
+
+    async def sales_between(
+        self,
+        tg_user_id: int,
+        since: datetime,
+        until: datetime,
+        *,
+        barcode: str | None = None,
+    ) -> list[Sale]:
+        """Продажи за ``[since, until)``, по одному баркоду или все."""
+
+        sql = (
+            "SELECT sale_id, sold_at, barcode, warehouse, nm_id, quantity, price FROM sales "
+            "WHERE tg_user_id=? AND sold_at>=? AND sold_at<?"
+        )
+        params: tuple = (tg_user_id, to_epoch(since), to_epoch(until))
+        if barcode is not None:
+            sql += " AND barcode=?"
+            params += (barcode,)
+        async with self._pool.reader() as db, db.execute(sql + " ORDER BY sold_at", params) as cur:
+            return [Sale(*row) for row in await cur.fetchall()]
+
+    async def units_sold(
+        self,
+        tg_user_id: int,
+        since: datetime,
+        until: datetime,
+    ) -> list[tuple[str, str, int]]:
+        """``(баркод, склад, штук)`` за период; читается только индекс ``idx_sales_user_time``."""
+
+        async with (
+            self._pool.reader() as db,
+            db.execute(
+                "SELECT barcode, warehouse, SUM(quantity) FROM sales "
+                "WHERE tg_user_id=? AND sold_at>=? AND sold_at<? "
+                "GROUP BY barcode, warehouse",
+                (tg_user_id, to_epoch(since), to_epoch(until)),
+            ) as cur,
+        ):
+            return [(row[0], row[1], int(row[2])) for row in await cur.fetchall()]
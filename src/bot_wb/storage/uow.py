@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from contextvars import Context, ContextVar, copy_context
+from typing import TYPE_CHECKING, Any
+
+from bot_wb import metrics
+
+if TYPE_CHECKING:
+    from .repo import UserRepo
+
+_CURRENT: ContextVar[UnitOfWork | None] = ContextVar("unit_of_work", default=None)
+
+
+class UnitOfWork:
+    """Буфер записей строки ``users`` в рамках одного апдейта.
+
+    Все ``upsert`` одного пользователя склеиваются в один набор полей, чтения
+    видят ещё не записанные изменения. Буфер общий для всех экземпляров
+    ``UserRepo``: у каждого модуля хендлеров свой репозиторий, но пишут они одну
+    и ту же строку, поэтому в конце апдейта уходит один upsert на пользователя
+    через репозиторий, записавший первым.
+
+    ``writes`` — вызовы ``upsert``, ``rows`` — строки, переданные репозиторию,
+    ``merged`` — сколько записей склеилось. Это не число SQL-запросов: у
+    ``CachedUserRepo`` строка лишь обновляет кэш, а в БД её сбросит ``UserStateCache``.
+    """
+
+    def __init__(self) -> None:
+        self._pending: dict[int, dict[str, Any]] = {}
+        self._backend: UserRepo | None = None
+        self.writes = 0
+        self.rows = 0
+
+    @property
+    def merged(self) -> int:
+        return max(self.writes - self.rows, 0)
+
+    def record(self, repo: UserRepo, tg_user_id: int, fields: dict[str, Any]) -> None:
+        self.writes += 1
+        if self._backend is None:
+            self._backend = repo
+        self._pending.setdefault(tg_user_id, {}).update(fields)
+
+    def overlay(self, tg_user_id: int, row: dict[str, Any] | None) -> dict[str, Any] | None:
+        pending = self._pending.get(tg_user_id)
+        if not pending:
+            return row
+        return {**(row or {"tg_user_id": tg_user_id}), **pending}
+
+    def discard(self, tg_user_id: int, keys: tuple[str, ...]) -> None:
+        pending = self._pending.get(tg_user_id)
+        if pending is None:
+            return
+        for key in keys:
+            pending.pop(key, None)
+
+    async def commit(self) -> None:
+        pending, self._pending = self._pending, {}
+        rows = {tg_id: fields for tg_id, fields in pending.items() if fields}
+        if rows and self._backend is not None:
+            await self._backend.upsert_many(rows)
+            self.rows += len(rows)
+        metrics.inc("uow.writes", self.writes)
+        metrics.inc("uow.rows", self.rows)
+        metrics.inc("uow.writes_merged", self.merged)
+
+
+def current_unit_of_work() -> UnitOfWork | None:
+    return _CURRENT.get()
+
+
+def detached_context() -> Context:
+    """Копия текущего контекста без UoW — для задач, переживающих апдейт.
+
+    Буфер апдейта коммитится при выходе из обработчика; фоновая задача,
+    унаследовавшая его, писала бы в уже закрытый UoW.
+    """
+
+    ctx = copy_context()
+    ctx.run(_CURRENT.set, None)
+    return ctx
+
+
+@asynccontextmanager
+async def unit_of_work() -> AsyncIterator[UnitOfWork]:
+    """Открывает UoW; буфер коммитится при выходе, даже если обработчик упал.
+
+    Сообщения в Telegram к этому моменту уже отправлены, поэтому откатывать
+    связанные с ними записи (например, id якоря) нельзя.
+    """
+
+    uow = UnitOfWork()
+    token = _CURRENT.set(uow)
+    try:
+        yield uow
+    finally:
+        _CURRENT.reset(token)
+        await uow.commit()
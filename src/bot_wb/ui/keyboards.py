@@ -15,6 +15,14 @@ def kb_home(authorized: bool) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
+def kb_login_cancel() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text="✖️ Отменить вход", callback_data="auth_cancel")],
+        ],
+    )
+
+
 def kb_auth_stub() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(
         inline_keyboard=[
@@ -26,7 +34,7 @@ def kb_auth_stub() -> InlineKeyboardMarkup:
     )
 
 
-def kb_profile_view(has_multiple: bool) -> InlineKeyboardMarkup:
+def kb_profile_view(has_multiple: bool, *, supply_upload: bool = False) -> InlineKeyboardMarkup:
     rows: list[list[InlineKeyboardButton]] = []
     if has_multiple:
         rows.append(
@@ -37,6 +45,10 @@ def kb_profile_view(has_multiple: bool) -> InlineKeyboardMarkup:
                 ),
             ],
         )
+    if supply_upload:
+        rows.append(
+            [InlineKeyboardButton(text="📦 Поставки из файла", callback_data="supply_upload")],
+        )
     rows.append(
         [
             InlineKeyboardButton(text="🚪 Выйти с аккаунта", callback_data="logout"),
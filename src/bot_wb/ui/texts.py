@@ -26,6 +26,28 @@ def auth_success_text() -> str:
     return "✅ Авторизация выполнена. Аккаунт привязан к вашему Telegram."
 
 
+def login_status_text(job) -> str:
+    state = job.state.value
+    if state == "queued":
+        return (
+            "⏳ Вы в очереди на вход в WB Seller.\n"
+            f"Позиция в очереди: {job.position}. Окно входа откроется автоматически."
+        )
+    if state == "running":
+        return (
+            "Открыл окно входа WB Seller.\n"
+            "Пожалуйста, авторизуйтесь в появившемся окне "
+            "(телефон → SMS → код с e-mail).\n\n"
+            "Окно останется открытым до успешного входа или таймаута, "
+            "не закрывайте его вручную."
+        )
+    if state == "cancelled":
+        return "Вход отменён."
+    if state == "rejected":
+        return "Сейчас слишком много входов. Попробуйте ещё раз через пару минут."
+    return "Не удалось завершить авторизацию. Попробуйте ещё раз: нажмите «Авторизация»."
+
+
 def profile_text_single(org_name: str | None) -> str:
     org_line = f"Организация: {org_name}" if org_name else "Организация: —"
     return f"👤 Профиль WB Seller\n{org_line}"
@@ -43,3 +65,60 @@ def profile_text_multi(orgs: list[dict], active_id: str | None) -> str:
 
 def logout_done_text() -> str:
     return "Вы вышли из аккаунта. Нажмите /start для новой сессии."
+
+
+def slots_found_text(slots: list) -> str:
+    lines = ["🔔 Найдены слоты приёмки:"]
+    for slot in slots:
+        box = f", {slot.box_type}" if slot.box_type else ""
+        lines.append(
+            f"• {slot.warehouse_name} — {slot.date:%d.%m.%Y}{box}, коэффициент {slot.coefficient}",
+        )
+    return "\n".join(lines)
+
+
+def booking_done_text(result) -> str:
+    slot = result.slot
+    return (
+        f"✅ Поставка {result.draft.supply_id} забронирована: {slot.warehouse_name}, "
+        f"{slot.date:%d.%m.%Y}, коэффициент {slot.coefficient}."
+    )
+
+
+# сколько ошибочных строк показывать в итоговом сообщении
+ERRORS_SHOWN = 5
+
+
+def supply_upload_prompt_text() -> str:
+    return (
+        "📦 Создание поставок из файла.\n"
+        "Пришлите CSV или XLSX с колонками: баркод, количество, склад (ID склада WB).\n"
+        "Строки одного склада объединятся в поставки, ошибки в строках пропущу и покажу."
+    )
+
+
+def supply_import_progress_text(report) -> str:
+    return (
+        "⏳ Обрабатываю файл…\n"
+        f"Строк прочитано: {report.rows}, с ошибками: {report.invalid}\n"
+        f"Поставок создано: {len(report.supplies)}"
+    )
+
+
+def supply_import_done_text(report) -> str:
+    lines = [
+        "✅ Файл обработан." if not report.batches_failed else "⚠️ Файл обработан с ошибками.",
+        f"Строк: {report.rows}, с ошибками: {report.invalid}",
+        f"Поставок создано: {len(report.supplies)} ({report.units_sent} шт.)",
+    ]
+    if report.batches_failed:
+        lines.append(
+            f"Не удалось создать поставок: {report.batches_failed} ({report.units_failed} шт.)",
+        )
+    if report.supplies:
+        lines.append("ID: " + ", ".join(report.supplies[:10]))
+    for error in report.errors[:ERRORS_SHOWN]:
+        lines.append(f"• строка {error.line}: {error.message}")
+    if report.invalid > ERRORS_SHOWN:
+        lines.append(f"… и ещё {report.invalid - ERRORS_SHOWN} строк с ошибками")
+    return "\n".join(lines)
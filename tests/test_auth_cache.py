@@ -0,0 +1,96 @@
+import asyncio
+import contextvars
+
+import pytest
+
+from bot_wb import metrics
+from bot_wb.services.auth_cache import AuthStatusCache
+from bot_wb.storage import uow
+
+
+class Checker:
+    def __init__(self, value: bool) -> None:
+        self.value = value
+        self.calls = 0
+
+    async def __call__(self) -> bool:
+        self.calls += 1
+        await asyncio.sleep(0)
+        return self.value
+
+
+@pytest.mark.asyncio
+async def test_fresh_status_is_served_from_cache():
+    metrics.reset()
+    cache = AuthStatusCache(ttl=60, stale_ttl=60)
+    check = Checker(True)
+
+    assert await cache.get(1, check) is True
+    assert await cache.get(1, check) is True
+
+    assert check.calls == 1
+    assert metrics.get("auth_cache.miss") == 1
+    assert metrics.get("auth_cache.hit") == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_status_is_revalidated_in_background():
+    cache = AuthStatusCache(ttl=0, stale_ttl=60)
+    cache.set(1, True)
+    check = Checker(False)
+
+    assert await cache.get(1, check) is True
+    await asyncio.sleep(0.01)
+    assert check.calls == 1
+    assert await cache.get(1, Checker(True)) is False
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_check():
+    cache = AuthStatusCache(ttl=60, stale_ttl=0)
+    check = Checker(True)
+
+    results = await asyncio.gather(*(cache.get(1, check) for _ in range(5)))
+
+    assert results == [True] * 5
+    assert check.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_invalidate_drops_status_and_inflight_result():
+    cache = AuthStatusCache(ttl=60, stale_ttl=0)
+    cache.set(1, True)
+    cache.invalidate(1)
+    check = Checker(False)
+
+    assert await cache.get(1, check) is False
+    assert check.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_keeps_only_recent_users():
+    cache = AuthStatusCache(ttl=60, stale_ttl=0, max_entries=2)
+    for tg_user_id in (1, 2, 3):
+        assert await cache.get(tg_user_id, Checker(True)) is True
+
+    assert len(cache) == 2  # noqa: PLR2004
+    check = Checker(False)
+    assert await cache.get(1, check) is False
+    assert check.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_background_check_keeps_context_but_not_uow():
+    marker: contextvars.ContextVar[str] = contextvars.ContextVar("marker", default="")
+    marker.set("lane")
+    seen: list[tuple[str, object]] = []
+
+    async def check() -> bool:
+        seen.append((marker.get(), uow.current_unit_of_work()))
+        return True
+
+    cache = AuthStatusCache(ttl=60, stale_ttl=0)
+    async with uow.unit_of_work():
+        assert await cache.get(1, check) is True
+
+    assert seen == [("lane", None)]
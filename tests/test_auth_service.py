@@ -2,6 +2,7 @@ import pytest
 
 from bot_wb.services import auth_service as auth_module
 from bot_wb.services.auth_service import AuthService
+from bot_wb.services.client_registry import WBClientRegistry
 
 
 class FakeRepo:
@@ -53,10 +54,14 @@ class DummyClient:
     async def get_organization_name(self) -> str | None:
         return "WB"
 
-    async def aclose(self) -> None:
+    async def aclose(self, *, persist: bool = True) -> None:
         return None
 
 
+def _registry(profiles: list[dict]) -> WBClientRegistry:
+    return WBClientRegistry(factory=lambda tg_id, **_: DummyClient(tg_id, profiles=profiles))
+
+
 @pytest.mark.asyncio
 async def test_interactive_login_success(monkeypatch):
     repo = FakeRepo()
@@ -65,13 +70,7 @@ async def test_interactive_login_success(monkeypatch):
         "BrowserLogin",
         lambda tg_id: DummyBrowserLogin(tg_id, result=True),
     )
-    monkeypatch.setattr(
-        auth_module,
-        "WBHttpClient",
-        lambda tg_id: DummyClient(tg_id, profiles=[{"id": "1", "name": "Org"}]),
-    )
-
-    service = AuthService(repo)
+    service = AuthService(repo, clients=_registry([{"id": "1", "name": "Org"}]))
     ok = await service.interactive_login(100)
 
     assert ok is True
@@ -88,13 +87,7 @@ async def test_interactive_login_failure(monkeypatch):
         "BrowserLogin",
         lambda tg_id: DummyBrowserLogin(tg_id, result=False),
     )
-    monkeypatch.setattr(
-        auth_module,
-        "WBHttpClient",
-        lambda tg_id: DummyClient(tg_id, profiles=[]),
-    )
-
-    service = AuthService(repo)
+    service = AuthService(repo, clients=_registry([]))
     ok = await service.interactive_login(200)
 
     assert ok is False
@@ -0,0 +1,259 @@
+import asyncio
+import json
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from datetime import date
+
+import httpx
+import pytest
+
+from bot_wb import metrics
+from bot_wb.services import slot_watcher as watcher_module
+from bot_wb.services.booking import BookingDraft, BookingExecutor, BookingResult
+from bot_wb.services.client_registry import WBClientRegistry
+from bot_wb.services.rate_limiter import RateLimiter
+from bot_wb.services.slot_watcher import Slot, SlotWatcher
+from bot_wb.services.wb_http_client import WBHttpClient
+from bot_wb.storage.session import CookieStorage
+
+WAREHOUSE = 117986
+
+
+class FakeWB:
+    def __init__(self, outcomes: dict[str, int]) -> None:
+        # дата слота -> статус ответа на бронирование (по умолчанию 200)
+        self.outcomes = outcomes
+        self.bookings: list[dict] = []
+        self.inflight = 0
+        self.max_inflight = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.method == "GET" and "acceptance" not in request.url.path:
+            return httpx.Response(200)
+        if request.method == "GET":
+            return httpx.Response(
+                200,
+                json=[
+                    {
+                        "date": f"2030-05-0{day}T00:00:00Z",
+                        "coefficient": coefficient,
+                        "warehouseID": WAREHOUSE,
+                        "boxTypeID": 2,
+                    }
+                    for day, coefficient in ((2, 0), (3, 0), (4, 1), (5, 9))
+                ],
+            )
+        body = json.loads(request.content)
+        self.bookings.append(body)
+        self.inflight += 1
+        self.max_inflight = max(self.max_inflight, self.inflight)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            self.inflight -= 1
+        return httpx.Response(self.outcomes.get(body["date"], 200), json={})
+
+
+class SlowLimiter(RateLimiter):
+    async def acquire(self, account: int, *, max_wait: float | None = None) -> float:
+        await asyncio.sleep(0.06)
+        return await super().acquire(account, max_wait=max_wait)
+
+
+async def _book(tmp_path, monkeypatch, fake: FakeWB, limiter: RateLimiter | None = None):
+    metrics.reset()
+    CookieStorage(1, root=tmp_path).save({"wbx-validation-key": "k"})
+    monkeypatch.setattr(
+        watcher_module,
+        "open_cookie_storage",
+        lambda tg_id: CookieStorage(tg_id, root=tmp_path),
+    )
+    limiter = limiter or RateLimiter(
+        global_rate=1000.0,
+        global_burst=100.0,
+        account_rate=1000.0,
+        account_burst=100.0,
+    )
+
+    def factory(tg_id: int, **kwargs) -> WBHttpClient:
+        return WBHttpClient(
+            tg_id,
+            storage=CookieStorage(tg_id, root=tmp_path),
+            limiter=limiter,
+            **kwargs,
+        )
+
+    registry = WBClientRegistry(factory=factory, transport=httpx.MockTransport(fake))
+    booked: list[BookingResult] = []
+
+    async def notify(sub, slots) -> None:
+        return None
+
+    async def on_booked(result: BookingResult) -> None:
+        booked.append(result)
+
+    watcher = SlotWatcher(notify, clients=registry)
+    executor = BookingExecutor(watcher, on_booked=on_booked, clients=registry, max_slots=3)
+    try:
+        await executor.arm(
+            BookingDraft(
+                tg_user_id=1,
+                supply_id="S-1",
+                warehouse_id=WAREHOUSE,
+                date_from=date(2030, 5, 1),
+                date_to=date(2030, 5, 31),
+                max_coefficient=1,
+            ),
+        )
+        assert watcher.warehouses == 1
+        await watcher.poll_once()
+        await asyncio.gather(*executor._inflight)
+        return executor, watcher, booked
+    finally:
+        await executor.stop()
+        await registry.aclose()
+
+
+@pytest.mark.asyncio
+async def test_slots_are_tried_one_by_one_until_booked(tmp_path, monkeypatch):
+    fake = FakeWB({"2030-05-02": 409})
+
+    executor, watcher, booked = await _book(tmp_path, monkeypatch, fake)
+
+    assert [r.slot.date for r in booked] == [date(2030, 5, 3)]
+    # следующий слот — только после отказа по предыдущему, до третьего не дошло
+    assert [b["date"] for b in fake.bookings] == ["2030-05-02", "2030-05-03"]
+    assert fake.max_inflight == 1
+    assert fake.bookings[0] == {
+        "supplyId": "S-1",
+        "warehouseId": WAREHOUSE,
+        "boxTypeId": None,
+        "date": "2030-05-02",
+    }
+    assert len(executor) == 0
+    assert watcher.warehouses == 0
+    assert metrics.get("booking.booked") == 1
+    assert sum(metrics.histogram("booking.detect_to_send_ms").values()) == 2  # noqa: PLR2004
+    assert metrics.percentile("booking.detect_to_booked_ms", 0.5) is not None
+
+
+@pytest.mark.asyncio
+async def test_unknown_outcome_stops_and_disarms(tmp_path, monkeypatch):
+    fake = FakeWB({"2030-05-02": 409, "2030-05-03": 502})
+
+    executor, watcher, booked = await _book(tmp_path, monkeypatch, fake)
+
+    # 502 не значит отказ: бронь могла пройти, третий слот не пробуем
+    assert [b["date"] for b in fake.bookings] == ["2030-05-02", "2030-05-03"]
+    assert booked == []
+    assert len(executor) == 0
+    assert metrics.get("booking.unknown") == 1
+    assert metrics.get("booking.booked") == 0
+
+
+@pytest.mark.asyncio
+async def test_detect_to_send_includes_limiter_wait(tmp_path, monkeypatch):
+    limiter = SlowLimiter(
+        global_rate=1000.0,
+        global_burst=100.0,
+        account_rate=1000.0,
+        account_burst=100.0,
+    )
+
+    await _book(tmp_path, monkeypatch, FakeWB({}), limiter)
+
+    histogram = metrics.histogram("booking.detect_to_send_ms")
+    assert sum(histogram.values()) == 1
+    assert sum(histogram[f"<={bound}"] for bound in (5, 10, 25, 50)) == 0
+
+
+class BrokenRegistry(WBClientRegistry):
+    def __init__(self) -> None:
+        super().__init__(transport=httpx.MockTransport(FakeWB({})))
+        self.broken = True
+
+    @asynccontextmanager
+    async def client(self, tg_user_id: int) -> AsyncIterator[WBHttpClient]:
+        if self.broken:
+            raise RuntimeError("registry is closing")
+        async with super().client(tg_user_id) as client:
+            yield client
+
+
+def _draft() -> BookingDraft:
+    return BookingDraft(
+        tg_user_id=1,
+        supply_id="S-1",
+        warehouse_id=WAREHOUSE,
+        date_from=date(2030, 5, 1),
+        date_to=date(2030, 5, 31),
+    )
+
+
+@pytest.mark.asyncio
+async def test_arm_without_client_leaves_nothing_armed():
+    registry = BrokenRegistry()
+    watcher = SlotWatcher(lambda sub, slots: asyncio.sleep(0), clients=registry)
+    executor = BookingExecutor(watcher, clients=registry)
+
+    with pytest.raises(RuntimeError):
+        await executor.arm(_draft())
+
+    assert len(executor) == 0
+    assert watcher.warehouses == 0
+    await registry.aclose()
+
+
+@pytest.mark.asyncio
+async def test_booking_without_client_counts_a_miss(tmp_path, monkeypatch):
+    metrics.reset()
+    monkeypatch.setattr(
+        watcher_module,
+        "open_cookie_storage",
+        lambda tg_id: CookieStorage(tg_id, root=tmp_path),
+    )
+    registry = BrokenRegistry()
+    registry.broken = False
+    watcher = SlotWatcher(lambda sub, slots: asyncio.sleep(0), clients=registry)
+    executor = BookingExecutor(watcher, clients=registry)
+    try:
+        await executor.arm(_draft())
+        await executor._release(1)
+        registry.broken = True
+        slot = Slot(WAREHOUSE, "Коледино", date(2030, 5, 2), 2, "Короба", 0)
+
+        await executor.on_slots([slot], 0.0)
+        await asyncio.gather(*executor._inflight)
+
+        assert metrics.get("booking.missed") == 1
+        # черновик остаётся взведённым и ждёт следующего слота
+        assert len(executor) == 1
+        assert executor._armed[(1, "S-1")].firing is False
+    finally:
+        await executor.stop()
+        await registry.aclose()
+
+
+@pytest.mark.asyncio
+async def test_armed_account_takes_new_client_after_invalidate(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        watcher_module,
+        "open_cookie_storage",
+        lambda tg_id: CookieStorage(tg_id, root=tmp_path),
+    )
+    registry = BrokenRegistry()
+    registry.broken = False
+    watcher = SlotWatcher(lambda sub, slots: asyncio.sleep(0), clients=registry)
+    executor = BookingExecutor(watcher, clients=registry)
+    try:
+        await executor.arm(_draft())
+        old = await executor._client(1)
+        await registry.invalidate(1)
+
+        fresh = await executor._client(1)
+
+        assert fresh is not old
+        assert old.client.is_closed is True
+    finally:
+        await executor.stop()
+        await registry.aclose()
@@ -0,0 +1,160 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import httpx
+import pytest
+
+from bot_wb.services import browser_login as login_module
+from bot_wb.services.browser_login import BrowserLogin
+from bot_wb.storage.session import BrowserStateStorage
+
+
+class Emitter:
+    def __init__(self) -> None:
+        self.handlers: dict[str, list] = {}
+        self.tasks: set[asyncio.Future] = set()
+
+    def on(self, event: str, handler) -> None:
+        self.handlers.setdefault(event, []).append(handler)
+
+    def remove_listener(self, event: str, handler) -> None:
+        self.handlers[event].remove(handler)
+
+    def emit(self, event: str, arg) -> None:
+        for handler in list(self.handlers.get(event, [])):
+            result = handler(arg)
+            # Playwright запускает async-обработчики событий отдельными задачами
+            if asyncio.iscoroutine(result):
+                self.tasks.add(asyncio.ensure_future(result))
+
+
+class FakePage(Emitter):
+    main_frame = object()
+
+    async def goto(self, url: str, **kwargs) -> None:
+        self.emit("framenavigated", self.main_frame)
+
+
+class FakeResponse:
+    """Как в Playwright: ``headers`` без cookie, ``Set-Cookie`` — только через ``header_value``."""
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.headers: dict[str, str] = {}
+        self._all_headers = {"set-cookie": "wbx-validation-key=..."}
+
+    async def header_value(self, name: str) -> str | None:
+        return self._all_headers.get(name)
+
+
+class FakeContext(Emitter):
+    def __init__(self) -> None:
+        super().__init__()
+        self.page = FakePage()
+        self.jar: list[dict] = []
+        self.cookie_reads = 0
+
+    async def new_page(self) -> FakePage:
+        return self.page
+
+    async def cookies(self) -> list[dict]:
+        self.cookie_reads += 1
+        return list(self.jar)
+
+    async def storage_state(self) -> dict:
+        return {"cookies": list(self.jar), "origins": []}
+
+    def set_cookie(self, name: str, value: str) -> None:
+        self.jar = [c for c in self.jar if c["name"] != name]
+        self.jar.append({"name": name, "value": value, "domain": ".seller.wildberries.ru"})
+        self.emit("response", FakeResponse("https://seller-auth.wildberries.ru/auth/v2/code"))
+
+
+class FakePool:
+    def __init__(self, ctx: FakeContext) -> None:
+        self.ctx = ctx
+
+    @asynccontextmanager
+    async def context(self, tg_user_id: int):
+        yield self.ctx
+
+
+@pytest.mark.asyncio
+async def test_login_is_detected_on_cookie_change_and_validated_once_per_change(
+    monkeypatch,
+    tmp_path,
+):
+    monkeypatch.setattr(login_module, "COOKIE_FALLBACK_INTERVAL", 60.0)
+    monkeypatch.setattr(
+        login_module,
+        "BrowserStateStorage",
+        lambda tg_id: BrowserStateStorage(tg_id, root=tmp_path),
+    )
+    ctx = FakeContext()
+    validated: list[dict] = []
+
+    async def validate(self, jar: dict[str, str]) -> bool:
+        validated.append(dict(jar))
+        return jar.get("wbx-validation-key") == "good"
+
+    monkeypatch.setattr(BrowserLogin, "_validate", validate)
+
+    async def user_logs_in() -> None:
+        await asyncio.sleep(0.01)
+        # посторонние навигации без cookie входа HTTP-проверок не вызывают
+        ctx.page.emit("framenavigated", ctx.page.main_frame)
+        ctx.page.emit("framenavigated", object())
+        await asyncio.sleep(0.01)
+        ctx.set_cookie("wbx-validation-key", "stale")
+        await asyncio.sleep(0.01)
+        ctx.page.emit("framenavigated", ctx.page.main_frame)
+        await asyncio.sleep(0.01)
+        ctx.set_cookie("wbx-validation-key", "good")
+
+    started = asyncio.get_running_loop().time()
+    async with BrowserLogin(7, pool=FakePool(ctx)) as login:
+        helper = asyncio.create_task(user_logs_in())
+        ok = await login.run_flow(timeout_sec=5)
+        await helper
+
+    assert ok is True
+    assert asyncio.get_running_loop().time() - started < 1
+    assert [jar["wbx-validation-key"] for jar in validated] == ["stale", "good"]
+    assert ctx.handlers["response"] == []
+    assert ctx.page.handlers["framenavigated"] == []
+    # для тихого обновления сохраняется полное состояние браузера
+    state = BrowserStateStorage(7, root=tmp_path).load()
+    assert state is not None
+    assert state["cookies"][0]["value"] == "good"
+
+
+@pytest.mark.asyncio
+async def test_network_error_during_validation_is_retried_with_same_cookies(
+    monkeypatch,
+    tmp_path,
+):
+    monkeypatch.setattr(login_module, "COOKIE_FALLBACK_INTERVAL", 0.05)
+    monkeypatch.setattr(
+        login_module,
+        "BrowserStateStorage",
+        lambda tg_id: BrowserStateStorage(tg_id, root=tmp_path),
+    )
+    ctx = FakeContext()
+    attempts = 0
+
+    async def validate(self, jar: dict[str, str]) -> bool:
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise httpx.ConnectError("WB is flaky")
+        return True
+
+    monkeypatch.setattr(BrowserLogin, "_validate", validate)
+
+    async with BrowserLogin(7, pool=FakePool(ctx)) as login:
+        ctx.set_cookie("wbx-validation-key", "good")
+        ok = await login.run_flow(timeout_sec=2)
+
+    # cookie не менялись, но первая проверка не дала ответа — проверяем снова
+    assert ok is True
+    assert attempts == 2  # noqa: PLR2004
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from bot_wb.services.browser_pool import BrowserPool, capacity_for
+
+
+class FakeContext:
+    def __init__(self) -> None:
+        self.closed = False
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self) -> None:
+        self.connected = True
+        self.contexts: list[FakeContext] = []
+        self.handlers: dict[str, list] = {}
+
+    def is_connected(self) -> bool:
+        return self.connected
+
+    def on(self, event: str, handler) -> None:
+        self.handlers.setdefault(event, []).append(handler)
+
+    async def new_context(self, **kwargs) -> FakeContext:
+        ctx = FakeContext()
+        self.contexts.append(ctx)
+        return ctx
+
+    async def close(self) -> None:
+        self.connected = False
+
+    def crash(self) -> None:
+        self.connected = False
+        for handler in self.handlers.get("disconnected", []):
+            handler(self)
+
+
+class Launcher:
+    def __init__(self) -> None:
+        self.browsers: list[FakeBrowser] = []
+
+    async def __call__(self) -> FakeBrowser:
+        await asyncio.sleep(0)
+        browser = FakeBrowser()
+        self.browsers.append(browser)
+        return browser
+
+
+def test_capacity_follows_memory_budget():
+    assert capacity_for(1024, 250, 150) == 5  # noqa: PLR2004
+    assert capacity_for(200, 250, 150) == 1
+    # headless-браузер тихого обновления (250 + 150) — из того же бюджета
+    assert capacity_for(1024, 250, 150, reserved_mb=400) == 2  # noqa: PLR2004
+
+
+@pytest.mark.asyncio
+async def test_contexts_share_one_browser_and_respect_capacity():
+    launcher = Launcher()
+    pool = BrowserPool(capacity=2, launcher=launcher)
+    peak = 0
+
+    async def login(tg_id: int) -> None:
+        nonlocal peak
+        async with pool.context(tg_id) as ctx:
+            peak = max(peak, pool.active)
+            await asyncio.sleep(0.01)
+            assert not ctx.closed
+
+    await asyncio.gather(*(login(tg_id) for tg_id in range(6)))
+
+    assert len(launcher.browsers) == 1
+    assert peak == 2  # noqa: PLR2004
+    assert pool.active == 0
+    browser = launcher.browsers[0]
+    assert len(browser.contexts) == 6  # noqa: PLR2004
+    assert all(ctx.closed for ctx in browser.contexts)
+    assert pool.running
+    await pool.aclose()
+    assert not pool.running
+
+
+@pytest.mark.asyncio
+async def test_crashed_browser_is_relaunched_and_old_one_recycled():
+    launcher = Launcher()
+    pool = BrowserPool(capacity=1, recycle_after=3, launcher=launcher)
+
+    async with pool.context(1):
+        pass
+    launcher.browsers[0].crash()
+    async with pool.context(2):
+        pass
+    assert len(launcher.browsers) == 2  # noqa: PLR2004
+
+    # третий контекст с момента запуска — браузер перезапускается в простое
+    async with pool.context(3):
+        pass
+    async with pool.context(4):
+        pass
+    assert not launcher.browsers[1].connected
+    assert not pool.running
+    async with pool.context(5):
+        pass
+    assert len(launcher.browsers) == 3  # noqa: PLR2004
+    await pool.aclose()
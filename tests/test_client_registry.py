@@ -0,0 +1,112 @@
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+from bot_wb.services.client_registry import WBClientRegistry
+from bot_wb.services.wb_http_client import WBHttpClient
+from bot_wb.storage.session import CookieStorage
+
+
+class CountingTransport(httpx.AsyncBaseTransport):
+    def __init__(self) -> None:
+        self.requests = 0
+        self.closed = False
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        return httpx.Response(200, text="<html>seller</html>", request=request)
+
+    async def aclose(self) -> None:
+        self.closed = True
+
+
+def _registry(tmp_path, transport: httpx.AsyncBaseTransport, **kwargs) -> WBClientRegistry:
+    def factory(tg_id: int, **factory_kwargs) -> WBHttpClient:
+        return WBHttpClient(
+            tg_id,
+            storage=CookieStorage(tg_id, root=tmp_path),
+            **factory_kwargs,
+        )
+
+    return WBClientRegistry(factory=factory, transport=transport, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_clients_are_reused_over_shared_transport(tmp_path):
+    transport = CountingTransport()
+    registry = _registry(tmp_path, transport)
+
+    async with registry.client(1) as first:
+        assert await first.is_logged_in() is True
+    async with registry.client(1) as second:
+        assert await second.is_logged_in() is True
+    async with registry.client(2) as other:
+        assert await other.is_logged_in() is True
+
+    assert first is second
+    assert other is not first
+    assert transport.requests == 3  # noqa: PLR2004
+
+    await registry.aclose()
+    assert transport.closed is True
+    assert len(registry) == 0
+
+
+@pytest.mark.asyncio
+async def test_registry_bounds_and_evicts_idle_clients(tmp_path):
+    registry = _registry(tmp_path, CountingTransport(), max_clients=1, idle_ttl=0.0)
+
+    async with registry.client(1):
+        async with registry.client(2):
+            assert len(registry) == 2  # noqa: PLR2004 - оба клиента заняты
+        assert len(registry) == 2  # noqa: PLR2004
+    async with registry.client(3):
+        assert len(registry) == 1
+
+    assert await registry.evict_idle() == 1
+    assert len(registry) == 0
+    await registry.aclose()
+
+
+@pytest.mark.asyncio
+async def test_invalidate_waits_for_the_last_lease(tmp_path):
+    registry = _registry(tmp_path, CountingTransport())
+
+    async with registry.client(1) as old:
+        await registry.invalidate(1)
+        assert old.client.is_closed is False
+        assert await old.is_logged_in() is True
+        async with registry.client(1) as fresh:
+            assert fresh is not old
+        assert old.client.is_closed is False
+
+    assert old.client.is_closed is True
+    assert len(registry) == 1
+    await registry.aclose()
+
+
+@pytest.mark.asyncio
+async def test_client_is_built_off_the_event_loop(tmp_path):
+    loop_thread = threading.get_ident()
+    built_in: list[int] = []
+
+    def factory(tg_id: int, **kwargs) -> WBHttpClient:
+        built_in.append(threading.get_ident())
+        return WBHttpClient(tg_id, storage=CookieStorage(tg_id, root=tmp_path), **kwargs)
+
+    registry = WBClientRegistry(factory=factory, transport=CountingTransport())
+
+    async def lease() -> WBHttpClient:
+        async with registry.client(1) as client:
+            await asyncio.sleep(0)
+            return client
+
+    first, second = await asyncio.gather(lease(), lease())
+
+    # конструктор читает cookies с диска — это не должно блокировать event loop
+    assert loop_thread not in built_in
+    assert first is second
+    assert len(registry) == 1
+    await registry.aclose()
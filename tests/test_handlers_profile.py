@@ -5,6 +5,7 @@ import pytest
 
 from bot_wb.handlers import _render as render_module
 from bot_wb.handlers import profile as profile_module
+from bot_wb.services.client_registry import WBClientRegistry
 
 CHAT_ID_SINGLE = 500
 CHAT_ID_MULTI = 600
@@ -90,7 +91,7 @@ class StubClient:
     async def list_organizations(self) -> list[dict]:
         return self._profiles
 
-    async def aclose(self) -> None:
+    async def aclose(self, *, persist: bool = True) -> None:
         return None
 
 
@@ -104,7 +105,7 @@ async def test_render_profile_single(monkeypatch):
     def _make_client(tg_id: int, *_: Any, **__: Any) -> StubClient:
         return StubClient(tg_id, profiles=repo._profiles)
 
-    monkeypatch.setattr(profile_module, "WBHttpClient", _make_client)
+    monkeypatch.setattr(profile_module, "_clients", WBClientRegistry(factory=_make_client))
 
     message = SimpleNamespace(chat=SimpleNamespace(id=CHAT_ID_SINGLE))
     cb = SimpleNamespace(
@@ -138,7 +139,11 @@ async def test_render_profile_multi_force_replace(monkeypatch):
     def _make_multi_client(tg_id: int, *_: Any, **__: Any) -> StubClient:
         return StubClient(tg_id, profiles=profiles)
 
-    monkeypatch.setattr(profile_module, "WBHttpClient", _make_multi_client)
+    monkeypatch.setattr(
+        profile_module,
+        "_clients",
+        WBClientRegistry(factory=_make_multi_client),
+    )
 
     message = SimpleNamespace(chat=SimpleNamespace(id=CHAT_ID_MULTI))
     cb = SimpleNamespace(
@@ -1,7 +1,14 @@
+import asyncio
+import threading
+
+import httpx
 import pytest
 import respx
 
-from bot_wb.services.wb_http_client import WBHttpClient
+from bot_wb import metrics
+from bot_wb.services.session_probe import RedirectProbe, StreamingProbe
+from bot_wb.services.wb_http_client import WBHttpClient, coalescing_ratio, single_flight
+from bot_wb.settings import settings
 from bot_wb.storage.session import CookieStorage
 
 
@@ -30,3 +37,259 @@ async def test_is_logged_in_unauthorized(tmp_path):
             assert await client.is_logged_in() is False
     finally:
         await client.aclose()
+
+
+class CountingStorage(CookieStorage):
+    def __init__(self, tg_user_id: int, root):
+        super().__init__(tg_user_id, root=root)
+        self.saves = 0
+
+    def save(self, jar):
+        self.saves += 1
+        super().save(jar)
+
+
+@pytest.mark.asyncio
+async def test_cookies_are_persisted_only_on_change(tmp_path):
+    storage = CountingStorage(3, tmp_path)
+    storage.save({"wbx-validation-key": "old"})
+    storage.saves = 0
+    client = WBHttpClient(3, storage=storage)
+    try:
+        with respx.mock() as mock:
+            route = mock.get("https://seller.wildberries.ru/")
+            route.respond(200, text="<html>Seller</html>")
+            await client.is_logged_in()
+            await client.flush_cookies()
+            assert storage.saves == 0
+
+            route.respond(
+                200,
+                text="<html>Seller</html>",
+                headers={"Set-Cookie": "wbx-validation-key=new; Path=/"},
+            )
+            await client.is_logged_in()
+            await client.is_logged_in()
+    finally:
+        await client.aclose()
+
+    assert storage.saves == 1
+    assert storage.load() == {"wbx-validation-key": "new"}
+
+
+class ChunkedBody(httpx.AsyncByteStream):
+    def __init__(self, chunks: list[bytes]) -> None:
+        self.chunks = chunks
+        self.consumed = 0
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            self.consumed += 1
+            yield chunk
+
+
+@pytest.mark.asyncio
+async def test_streaming_probe_stops_after_marker(tmp_path):
+    body = ChunkedBody([b"<!DOCTYPE html><title>Seller</title>"] + [b"x" * 4096] * 100)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, stream=body)
+
+    client = WBHttpClient(
+        4,
+        storage=CookieStorage(4, root=tmp_path),
+        transport=httpx.MockTransport(handler),
+        probe=StreamingProbe(),
+    )
+    try:
+        assert await client.is_logged_in() is True
+    finally:
+        await client.aclose()
+    # короткий остаток дочитывается ради keep-alive, длинный — нет
+    assert body.consumed < len(body.chunks)
+
+
+@pytest.mark.asyncio
+async def test_streaming_probe_drains_short_body_to_keep_connection(tmp_path):
+    metrics.reset()
+    body = ChunkedBody([b"<!DOCTYPE html><title>Seller</title>", b"x" * 1024, b"</html>"])
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, stream=body)
+
+    client = WBHttpClient(
+        6,
+        storage=CookieStorage(6, root=tmp_path),
+        transport=httpx.MockTransport(handler),
+        probe=StreamingProbe(drain_bytes=4096),
+    )
+    try:
+        assert await client.is_logged_in() is True
+    finally:
+        await client.aclose()
+    assert body.consumed == len(body.chunks)
+    assert metrics.get("wb_probe.drained") == 1
+
+
+@pytest.mark.asyncio
+async def test_redirect_probe_detects_auth_redirect(tmp_path):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(302, headers={"Location": "https://seller-auth.wildberries.ru/"})
+
+    client = WBHttpClient(
+        5,
+        storage=CookieStorage(5, root=tmp_path),
+        transport=httpx.MockTransport(handler),
+        probe=RedirectProbe(),
+    )
+    try:
+        assert await client.is_logged_in() is False
+    finally:
+        await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_redirect_probe_follows_redirects_inside_the_cabinet(tmp_path):
+    paths: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        paths.append(request.url.path)
+        if request.url.path == "/":
+            return httpx.Response(301, headers={"Location": "/ru/"})
+        return httpx.Response(200, text="<!doctype html>")
+
+    storage = CookieStorage(6, root=tmp_path)
+    storage.save({"wbx-validation-key": "k"})
+    client = WBHttpClient(
+        6,
+        storage=storage,
+        transport=httpx.MockTransport(handler),
+        probe=RedirectProbe(),
+    )
+    try:
+        # слеш или локаль внутри seller.wildberries.ru — не признак истёкшей сессии
+        assert await client.is_logged_in() is True
+    finally:
+        await client.aclose()
+    assert paths == ["/", "/ru/"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_reads_share_one_request(tmp_path):
+    metrics.reset()
+    calls = 0
+    release = asyncio.Event()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return httpx.Response(200, text=request.url.params.get("page", ""))
+
+    client = WBHttpClient(
+        7,
+        storage=CookieStorage(7, root=tmp_path),
+        transport=httpx.MockTransport(handler),
+    )
+    try:
+        same = [
+            asyncio.create_task(client._request("GET", "", params={"page": "1"})) for _ in range(3)
+        ]
+        other = asyncio.create_task(client._request("GET", "", params={"page": "2"}))
+        await asyncio.sleep(0.05)
+        release.set()
+        responses = await asyncio.gather(*same, other)
+        assert calls == 2  # noqa: PLR2004
+        assert [r.text for r in responses] == ["1", "1", "1", "2"]
+        assert coalescing_ratio() == 0.5  # noqa: PLR2004
+        assert len(single_flight) == 0
+    finally:
+        await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_reads_of_two_clients_of_one_account_are_not_shared(tmp_path):
+    release = asyncio.Event()
+    seen: list[str | None] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.headers.get("cookie"))
+        await release.wait()
+        return httpx.Response(200, text=request.headers.get("cookie", ""))
+
+    transport = httpx.MockTransport(handler)
+    clients = [
+        WBHttpClient(8, storage=CookieStorage(8, root=tmp_path / name), transport=transport)
+        for name in ("registry", "validate")
+    ]
+    clients[1].client.cookies.set("WBTokenV3", "fresh")
+    try:
+        tasks = [asyncio.create_task(client._request("GET", "")) for client in clients]
+        await asyncio.sleep(0.05)
+        release.set()
+        responses = await asyncio.gather(*tasks)
+        assert len(seen) == 2  # noqa: PLR2004
+        assert [r.text for r in responses] == ["", "WBTokenV3=fresh"]
+    finally:
+        for client in clients:
+            await client.aclose()
+
+
+class StallingStorage(CookieStorage):
+    """Первая запись висит в потоке, пока тест её не отпустит."""
+
+    def __init__(self, tg_user_id: int, root) -> None:
+        super().__init__(tg_user_id, root=root)
+        self.writing = threading.Event()
+        self.release = threading.Event()
+
+    def save(self, jar):
+        if not self.writing.is_set():
+            self.writing.set()
+            self.release.wait(5)
+        super().save(jar)
+
+
+@pytest.mark.asyncio
+async def test_flush_waits_for_a_write_already_in_its_thread(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "cookie_flush_delay", 0.0)
+    storage = StallingStorage(9, tmp_path)
+    client = WBHttpClient(9, storage=storage)
+    try:
+        client.update_cookies({"wbx-validation-key": "old"})
+        await asyncio.to_thread(storage.writing.wait, 5)
+
+        client.update_cookies({"wbx-validation-key": "new"})
+        flushing = asyncio.create_task(client.flush_cookies())
+        await asyncio.sleep(0.05)
+        # старая запись ещё в потоке: новая не начинается раньше неё
+        assert not flushing.done()
+        storage.release.set()
+        await flushing
+    finally:
+        await client.aclose()
+
+    assert storage.load() == {"wbx-validation-key": "new"}
+
+
+@pytest.mark.asyncio
+async def test_discarded_client_does_not_write_after_logout(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "cookie_flush_delay", 0.0)
+    storage = StallingStorage(10, tmp_path)
+    client = WBHttpClient(10, storage=storage)
+    try:
+        client.update_cookies({"wbx-validation-key": "old"})
+        await asyncio.to_thread(storage.writing.wait, 5)
+        discarding = asyncio.create_task(client.discard_cookies())
+        await asyncio.sleep(0.05)
+        assert not discarding.done()
+        storage.release.set()
+        await discarding
+
+        storage.clear()
+        client.update_cookies({"wbx-validation-key": "late"})
+        await client.flush_cookies()
+    finally:
+        await client.aclose()
+
+    assert storage.exists() is False
@@ -28,6 +28,13 @@ def test_profile_keyboard_single():
     labels = _buttons_text(markup)
     assert ["🔀 Сменить профиль"] not in labels
     assert ["🚪 Выйти с аккаунта"] in labels
+    # загрузка поставок скрыта, пока ручка WB не сверена
+    assert ["📦 Поставки из файла"] not in labels
+
+
+def test_profile_keyboard_with_supply_upload():
+    markup = kb_profile_view(has_multiple=False, supply_upload=True)
+    assert ["📦 Поставки из файла"] in _buttons_text(markup)
 
 
 def test_profile_keyboard_multi():
@@ -0,0 +1,156 @@
+import asyncio
+
+import pytest
+
+from bot_wb.services.login_jobs import LoginJob, LoginJobManager, LoginState
+
+
+class Logins:
+    """Входы, которые завершаются по команде теста."""
+
+    def __init__(self) -> None:
+        self.started: list[int] = []
+        self.results: dict[int, asyncio.Future[bool]] = {}
+        self.cancelled: list[int] = []
+
+    async def __call__(self, tg_user_id: int) -> bool:
+        self.started.append(tg_user_id)
+        future = self.results.setdefault(tg_user_id, asyncio.get_running_loop().create_future())
+        try:
+            return await future
+        except asyncio.CancelledError:
+            self.cancelled.append(tg_user_id)
+            raise
+
+    def finish(self, tg_user_id: int, ok: bool = True) -> None:
+        self.results[tg_user_id].set_result(ok)
+
+
+async def _settle() -> None:
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_queue_respects_cap_dedupes_and_reports_positions():
+    manager = LoginJobManager(concurrency=2, queue_limit=2)
+    logins = Logins()
+    seen: list[tuple[int, str, int]] = []
+
+    async def notify(job: LoginJob) -> None:
+        seen.append((job.tg_user_id, job.state.value, job.position))
+
+    for tg_id in (1, 2, 3, 4):
+        await manager.submit(tg_id, logins, notify)
+    await _settle()
+    assert logins.started == [1, 2]
+    assert (manager.running, manager.queued) == (2, 2)
+    assert manager.get(4).position == 2  # noqa: PLR2004
+
+    # повторное нажатие не создаёт второй вход, а переполнение очереди отклоняется
+    again = await manager.submit(3, logins, notify)
+    assert again is manager.get(3)
+    rejected = await manager.submit(5, logins, notify)
+    assert rejected.state is LoginState.REJECTED
+
+    logins.finish(1)
+    await _settle()
+    assert logins.started == [1, 2, 3]
+    assert (4, "queued", 1) in seen
+    assert (1, "succeeded", 0) in seen
+
+    logins.finish(2, ok=False)
+    logins.finish(3)
+    await _settle()
+    logins.finish(4)
+    await _settle()
+    assert manager.get(4) is None
+    assert (2, "failed", 0) in seen
+    assert (manager.running, manager.queued) == (0, 0)
+
+
+@pytest.mark.asyncio
+async def test_cancel_from_keyboard_but_not_from_handler_cancellation():
+    manager = LoginJobManager(concurrency=1)
+    logins = Logins()
+    states: dict[int, LoginState] = {}
+
+    async def notify(job: LoginJob) -> None:
+        states[job.tg_user_id] = job.state
+
+    async def handler() -> None:
+        await manager.submit(1, logins, notify)
+        await manager.submit(2, logins, notify)
+        await asyncio.sleep(10)
+
+    handler_task = asyncio.create_task(handler())
+    await _settle()
+    handler_task.cancel()
+    await _settle()
+    assert states[1] is LoginState.RUNNING
+
+    # отмена из очереди и во время входа
+    assert await manager.cancel(2)
+    assert states[2] is LoginState.CANCELLED
+    assert await manager.cancel(1)
+    assert states[1] is LoginState.CANCELLED
+    assert logins.cancelled == [1]
+    assert not await manager.cancel(1)
+    assert manager.running == 0
+
+
+@pytest.mark.asyncio
+async def test_cancel_during_running_status_update_frees_the_slot():
+    manager = LoginJobManager(concurrency=1)
+    logins = Logins()
+    editing = asyncio.Event()
+
+    async def slow_notify(job: LoginJob) -> None:
+        if job.state is LoginState.RUNNING:
+            editing.set()
+            # правка сообщения ждёт лимитов Telegram
+            await asyncio.sleep(10)
+
+    async def notify(job: LoginJob) -> None:
+        return None
+
+    await manager.submit(1, logins, slow_notify)
+    await editing.wait()
+    assert await manager.cancel(1)
+    assert manager.running == 0
+
+    job = await manager.submit(2, logins, notify)
+    await _settle()
+    assert job.state is LoginState.RUNNING
+    assert logins.started == [2]
+    logins.finish(2)
+    await _settle()
+    assert job.state is LoginState.SUCCEEDED
+
+
+@pytest.mark.asyncio
+async def test_slow_queue_updates_do_not_delay_the_next_login():
+    manager = LoginJobManager(concurrency=1)
+    logins = Logins()
+    release = asyncio.Event()
+    seen: list[tuple[int, int]] = []
+
+    async def notify(job: LoginJob) -> None:
+        if job.state is LoginState.QUEUED and job.tg_user_id == 3:  # noqa: PLR2004
+            seen.append((job.tg_user_id, job.position))
+            # правка сообщения ждёт лимитов Telegram
+            await release.wait()
+
+    for tg_id in (1, 2, 3):
+        await manager.submit(tg_id, logins, notify)
+    await _settle()
+
+    logins.finish(1)
+    await _settle()
+    # вход 2 стартовал, пока правка статуса входа 3 ещё висит
+    assert logins.started == [1, 2]
+    assert seen == [(3, 2)]
+    release.set()
+    await _settle()
+    assert seen == [(3, 2), (3, 1)]
+    await manager.stop()
@@ -0,0 +1,115 @@
+import aiosqlite
+import pytest
+
+from bot_wb.storage import migrations
+from bot_wb.storage.db import ensure_db
+from bot_wb.storage.pool import ConnectionPool
+
+
+async def _user_version(pool: ConnectionPool) -> int:
+    async with pool.reader() as db:
+        return await migrations.get_version(db)
+
+
+@pytest.mark.asyncio
+async def test_fresh_database_is_migrated_once(tmp_path, monkeypatch):
+    pool = ConnectionPool(tmp_path / "bot.db")
+    await pool.open()
+    try:
+        assert await ensure_db(pool) == migrations.LATEST_VERSION
+        assert await _user_version(pool) == migrations.LATEST_VERSION
+
+        calls: list[int] = []
+
+        async def _tracked(db):
+            calls.append(1)
+
+        monkeypatch.setattr(migrations, "MIGRATIONS", [(1, _tracked)])
+        assert await ensure_db(pool) == migrations.LATEST_VERSION
+        assert calls == []
+    finally:
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_legacy_database_gets_missing_columns(tmp_path):
+    db_path = tmp_path / "bot.db"
+    async with aiosqlite.connect(db_path) as db:
+        await db.execute("CREATE TABLE users (tg_user_id INTEGER PRIMARY KEY, phone TEXT)")
+        await db.commit()
+
+    pool = ConnectionPool(db_path)
+    await pool.open()
+    try:
+        await ensure_db(pool)
+        async with pool.reader() as db, db.execute("PRAGMA table_info(users)") as cur:
+            cols = {row[1] for row in await cur.fetchall()}
+        assert {"anchor_msg_id", "current_view", "active_profile_id"} <= cols
+    finally:
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_migration_is_rolled_back(tmp_path, monkeypatch):
+    async def _broken(db):
+        await db.execute("CREATE TABLE half_done (id INTEGER)")
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(
+        migrations,
+        "MIGRATIONS",
+        [*migrations.MIGRATIONS, (migrations.LATEST_VERSION + 1, _broken)],
+    )
+    monkeypatch.setattr(migrations, "LATEST_VERSION", migrations.LATEST_VERSION + 1)
+
+    pool = ConnectionPool(tmp_path / "bot.db")
+    await pool.open()
+    try:
+        with pytest.raises(RuntimeError):
+            await ensure_db(pool)
+        assert await _user_version(pool) == 0
+        async with (
+            pool.reader() as db,
+            db.execute("SELECT name FROM sqlite_master WHERE type='table'") as cur,
+        ):
+            tables = {row[0] for row in await cur.fetchall()}
+        assert tables == set()
+    finally:
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_sales_are_rekeyed_by_sale_id_and_resynced(tmp_path, monkeypatch):
+    pool = ConnectionPool(tmp_path / "bot.db")
+    await pool.open()
+    try:
+        with monkeypatch.context() as patch:
+            patch.setattr(migrations, "MIGRATIONS", migrations.MIGRATIONS[:4])
+            patch.setattr(migrations, "LATEST_VERSION", 4)
+            await ensure_db(pool)
+        async with pool.writer() as db:
+            await db.execute(
+                "INSERT INTO sales (tg_user_id, srid, sold_at, barcode, warehouse, quantity) "
+                "VALUES (1, 'order-1', 0, 'bc', 'w', -1)",
+            )
+            await db.executemany(
+                "INSERT INTO sync_cursors (tg_user_id, stream, cursor, synced_at) "
+                "VALUES (1, ?, 'c', 0)",
+                [("sales",), ("stocks",)],
+            )
+
+        assert await ensure_db(pool) == migrations.LATEST_VERSION
+        async with pool.reader() as db:
+            async with db.execute("PRAGMA table_info(sales)") as cur:
+                cols = {row[1] for row in await cur.fetchall()}
+            async with db.execute("SELECT COUNT(*) FROM sales") as cur:
+                (rows,) = await cur.fetchone()
+            async with db.execute("SELECT stream FROM sync_cursors") as cur:
+                streams = [row[0] for row in await cur.fetchall()]
+        assert "sale_id" in cols
+        assert "srid" not in cols
+        # строки, затёртые возвратами, не чинятся — продажи перечитываются с нуля
+        assert rows == 0
+        assert streams == ["stocks"]
+    finally:
+        await pool.close()
@@ -0,0 +1,152 @@
+import asyncio
+import contextlib
+import time
+
+import httpx
+import pytest
+
+from bot_wb.services.rate_limiter import RateLimitedError, RateLimiter, parse_retry_after
+from bot_wb.services.wb_http_client import WBHttpClient
+from bot_wb.storage.session import CookieStorage
+
+
+def _limiter(**overrides: float) -> RateLimiter:
+    params = {
+        "global_rate": 1000.0,
+        "global_burst": 1.0,
+        "account_rate": 1000.0,
+        "account_burst": 1.0,
+    }
+    params.update(overrides)
+    return RateLimiter(**params)
+
+
+@pytest.mark.asyncio
+async def test_waiters_are_served_round_robin_across_accounts():
+    limiter = _limiter(global_rate=200.0)
+    order: list[int] = []
+
+    async def call(account: int) -> None:
+        await limiter.acquire(account)
+        order.append(account)
+
+    await limiter.acquire(1)  # выбираем burst, дальше все встают в очередь
+    tasks = [asyncio.create_task(call(1)) for _ in range(4)]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(call(2)))
+    await asyncio.sleep(0)
+    assert limiter.queue_depth == 5  # noqa: PLR2004
+    await asyncio.gather(*tasks)
+
+    assert order.index(2) <= 1
+    assert limiter.queue_depth == 0
+    assert limiter.stats()["max_wait_ms"] >= 0
+
+
+@pytest.mark.asyncio
+async def test_penalty_delays_only_that_account():
+    limiter = _limiter(global_burst=10.0, account_burst=10.0)
+    limiter.penalize(1, 0.2)
+
+    assert await asyncio.wait_for(limiter.acquire(2), 0.1) == 0.0
+    waited = await limiter.acquire(1)
+    assert waited >= 0.15  # noqa: PLR2004
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0  # noqa: PLR2004
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after("inf") is None
+    assert parse_retry_after("nan") is None
+    assert parse_retry_after(None) is None
+
+
+@pytest.mark.asyncio
+async def test_client_retries_after_429(tmp_path):
+    statuses = iter([429, 200])
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(next(statuses), headers={"Retry-After": "0"}, text="seller")
+
+    limiter = _limiter(global_burst=10.0, account_burst=10.0)
+    client = WBHttpClient(
+        1,
+        storage=CookieStorage(1, root=tmp_path),
+        transport=httpx.MockTransport(handler),
+        limiter=limiter,
+    )
+    try:
+        assert await client.is_logged_in() is True
+    finally:
+        await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_long_retry_after_pauses_limiter_without_retrying(tmp_path):
+    calls = 0
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        status = 429 if request.method == "GET" else 503
+        return httpx.Response(status, headers={"Retry-After": "120"})
+
+    limiter = _limiter(global_burst=10.0, account_burst=10.0)
+    clients = [
+        WBHttpClient(
+            tg_id,
+            storage=CookieStorage(tg_id, root=tmp_path),
+            transport=httpx.MockTransport(handler),
+            limiter=limiter,
+        )
+        for tg_id in (1, 2)
+    ]
+    try:
+        response = await clients[0]._request("GET", "api/orders")
+        assert response.status_code == 429  # noqa: PLR2004
+        assert calls == 1
+        # запрос не повторён, но пауза WB распространяется на аккаунт
+        now = time.monotonic()
+        assert limiter._bucket(1).wait_time(now) > 100  # noqa: PLR2004
+        assert limiter._bucket(2).wait_time(now) == 0
+
+        await clients[1]._request("POST", "api/supplies")
+        assert calls == 2  # noqa: PLR2004
+        # 503 с Retry-After тормозит все аккаунты
+        assert limiter._global.wait_time(time.monotonic()) > 100  # noqa: PLR2004
+    finally:
+        for client in clients:
+            await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_huge_retry_after_is_clamped_and_fails_fast(tmp_path):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(503, headers={"Retry-After": "86400"})
+
+    limiter = _limiter(global_burst=10.0, account_burst=10.0, max_pause=60.0)
+    client = WBHttpClient(
+        1,
+        storage=CookieStorage(1, root=tmp_path),
+        transport=httpx.MockTransport(handler),
+        limiter=limiter,
+    )
+    try:
+        response = await client._request("POST", "api/supplies")
+        assert response.status_code == 503  # noqa: PLR2004
+        # сутки паузы от одного ответа не принимаем
+        assert 50 < limiter._global.wait_time(time.monotonic()) <= 60  # noqa: PLR2004
+        # обработчик не висит в лимитере, а сразу получает ошибку
+        with pytest.raises(RateLimitedError):
+            await asyncio.wait_for(client._request("GET", "api/orders"), 1)
+        # кто готов ждать дольше паузы — ждёт как раньше
+        with pytest.raises(TimeoutError):
+            await asyncio.wait_for(limiter.acquire(2, max_wait=120), 0.05)
+    finally:
+        await client.aclose()
+        # диспетчер спит до конца паузы; не оставляем его закрытому event loop
+        if limiter._dispatcher is not None:
+            limiter._dispatcher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await limiter._dispatcher
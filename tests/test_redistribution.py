@@ -0,0 +1,79 @@
+import numpy as np
+
+from bot_wb.services.redistribution import StockMatrix, plan_transfers
+
+
+def _matrix(stock, velocity) -> StockMatrix:
+    stock = np.asarray(stock, dtype=np.float32)
+    return StockMatrix(
+        [f"sku-{i}" for i in range(stock.shape[0])],
+        [f"wh-{j}" for j in range(stock.shape[1])],
+        stock,
+        np.asarray(velocity, dtype=np.float32),
+    )
+
+
+def test_surplus_is_moved_to_warehouses_short_of_target():
+    matrix = _matrix(
+        [[100, 0, 10], [5, 5, 5]],
+        [[1, 2, 3], [0, 0, 0]],
+    )
+    plan = plan_transfers(matrix, target_days=10)
+
+    # нужно 10/20/30 шт.: лишних 90, не хватает 20 + 20
+    rows = sorted(
+        zip(
+            plan.sku.tolist(),
+            plan.source.tolist(),
+            plan.target.tolist(),
+            plan.quantity.tolist(),
+            strict=True,
+        ),
+    )
+    assert rows == [(0, 0, 1, 20), (0, 0, 2, 20)]
+    assert plan.total_units == 40  # noqa: PLR2004
+    cover = matrix.days_of_cover()
+    assert cover[0, 0] == 100  # noqa: PLR2004
+    assert np.isinf(cover[1, 0])
+
+
+def test_random_plan_never_overdraws_or_overfills():
+    rng = np.random.default_rng(7)
+    shape = (500, 12)
+    stock = rng.poisson(15, shape) * rng.integers(0, 2, shape)
+    velocity = rng.gamma(0.8, 0.8, shape) * rng.integers(0, 2, shape)
+    matrix = _matrix(stock, velocity)
+    plan = plan_transfers(matrix, target_days=14, min_transfer=2)
+
+    assert len(plan) > 0
+    assert (plan.quantity >= 2).all()  # noqa: PLR2004
+    assert (plan.source != plan.target).all()
+    desired = np.ceil(matrix.velocity * np.float32(14)).astype(np.int64)
+    out = np.zeros(shape, dtype=np.int64)
+    into = np.zeros(shape, dtype=np.int64)
+    np.add.at(out, (plan.sku, plan.source), plan.quantity)
+    np.add.at(into, (plan.sku, plan.target), plan.quantity)
+    assert (out <= np.maximum(stock - desired, 0)).all()
+    assert (into <= np.maximum(desired - stock, 0)).all()
+
+
+def test_records_are_aggregated_and_plan_streams_as_csv(tmp_path):
+    matrix = StockMatrix.from_records(
+        [
+            ("A", "Коледино", 30, 0.5),
+            ("A", "Коледино", 20, 0.5),
+            ("A", "Казань", 0, 2),
+            ("B", "Казань", 3, 0),
+        ],
+    )
+    assert matrix.skus == ["A", "B"]
+    assert matrix.stock[0].tolist() == [0, 50]
+    plan = plan_transfers(matrix, target_days=7)
+
+    chunks = list(plan.iter_csv(matrix.skus, matrix.warehouses, chunk_rows=1))
+    assert "".join(chunks).splitlines() == [
+        "sku,from_warehouse,to_warehouse,quantity",
+        "A,Коледино,Казань,14",
+    ]
+    assert plan.write_csv(tmp_path / "plan.csv", matrix.skus, matrix.warehouses) == 1
+    assert plan_transfers(StockMatrix.from_records([])).total_units == 0
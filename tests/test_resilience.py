@@ -0,0 +1,141 @@
+import httpx
+import pytest
+
+from bot_wb.services.rate_limiter import RateLimiter
+from bot_wb.services.resilience import (
+    BreakerState,
+    CircuitBreaker,
+    CircuitBreakers,
+    CircuitOpenError,
+    RetryPolicy,
+)
+from bot_wb.services.wb_http_client import WBHttpClient
+from bot_wb.storage.session import CookieStorage
+
+FAST_RETRY = RetryPolicy(attempts=3, base_delay=0.0, max_delay=0.0)
+
+
+def _client(tmp_path, handler, **kwargs) -> WBHttpClient:
+    return WBHttpClient(
+        1,
+        storage=CookieStorage(1, root=tmp_path),
+        transport=httpx.MockTransport(handler),
+        limiter=RateLimiter(
+            global_rate=1000.0,
+            global_burst=100.0,
+            account_rate=1000.0,
+            account_burst=100.0,
+        ),
+        **kwargs,
+    )
+
+
+def test_backoff_is_full_jitter_and_capped():
+    policy = RetryPolicy(base_delay=1.0, max_delay=3.0)
+    delays = [policy.backoff(5) for _ in range(200)]
+    assert all(0 <= d <= 3.0 for d in delays)  # noqa: PLR2004
+    assert len(set(delays)) > 1
+
+
+def test_endpoint_rules_override_method_defaults():
+    policy = RetryPolicy(
+        endpoint_rules={
+            ("POST", "/api/search"): True,
+            ("GET", "/api/export"): False,
+        },
+    )
+    assert policy.is_idempotent("post", "/api/search/items")
+    assert not policy.is_idempotent("POST", "/api/supplies")
+    assert not policy.is_idempotent("GET", "/api/export/xlsx")
+    assert policy.is_idempotent("GET", "/api/cards")
+
+
+def test_breaker_opens_and_half_open_probe_closes(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("bot_wb.services.resilience.time.monotonic", lambda: now[0])
+    breaker = CircuitBreaker("wb", failure_threshold=2, reset_timeout=10.0)
+
+    breaker.record_failure()
+    breaker.before_request()
+    breaker.record_failure()
+    assert breaker.state is BreakerState.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+    now[0] += 10.0
+    breaker.before_request()  # пробный запрос
+    assert breaker.state is BreakerState.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()  # второй пробный не пускаем
+    breaker.record_success()
+    assert breaker.state is BreakerState.CLOSED
+
+
+def test_failed_half_open_probe_reopens(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("bot_wb.services.resilience.time.monotonic", lambda: now[0])
+    breaker = CircuitBreaker("wb", failure_threshold=1, reset_timeout=5.0)
+    breaker.record_failure()
+    now[0] += 5.0
+    breaker.before_request()
+    breaker.record_failure()
+    assert breaker.state is BreakerState.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_fails_fast_without_sending(tmp_path):
+    calls = 0
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        return httpx.Response(503)
+
+    breakers = CircuitBreakers(failure_threshold=3, reset_timeout=60.0)
+    client = _client(tmp_path, handler, retry=FAST_RETRY, breakers=breakers)
+    try:
+        response = await client._request("GET", "")
+        assert response.status_code == httpx.codes.SERVICE_UNAVAILABLE
+        assert calls == 3  # noqa: PLR2004
+        assert await client.is_logged_in() is False
+        assert calls == 3  # noqa: PLR2004
+    finally:
+        await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_non_idempotent_request_is_not_retried_after_read_error(tmp_path):
+    calls = 0
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        raise httpx.ReadTimeout("slow", request=request)
+
+    client = _client(tmp_path, handler, retry=FAST_RETRY, breakers=CircuitBreakers())
+    try:
+        with pytest.raises(httpx.ReadTimeout):
+            await client._request("POST", "api/supplies")
+        assert calls == 1
+    finally:
+        await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_connect_error_is_retried_for_any_method(tmp_path):
+    outcomes = iter([httpx.ConnectError("refused"), None])
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        exc = next(outcomes)
+        if exc is not None:
+            raise exc
+        return httpx.Response(200)
+
+    client = _client(tmp_path, handler, retry=FAST_RETRY, breakers=CircuitBreakers())
+    try:
+        response = await client._request("POST", "api/supplies")
+        assert response.status_code == httpx.codes.OK
+    finally:
+        await client.aclose()
@@ -0,0 +1,222 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from bot_wb.services import session_refresh as refresh_module
+from bot_wb.services.auth_cache import AuthStatusCache
+from bot_wb.services.auth_service import AuthService
+from bot_wb.services.session_refresh import SessionRefresher, session_expiry, with_jar
+from bot_wb.settings import settings
+from bot_wb.storage.session import BrowserStateStorage, CookieStorage
+
+NOW = 1_800_000_000.0
+HOUR = 3600.0
+
+
+def _state(refresh_expires: float, key: str = "old") -> dict:
+    return {
+        "cookies": [
+            {
+                "name": "wbx-validation-key",
+                "value": key,
+                "domain": ".wildberries.ru",
+                "expires": -1,
+            },
+            {
+                "name": "wbx-refresh",
+                "value": "r",
+                "domain": ".seller.wildberries.ru",
+                "expires": refresh_expires,
+            },
+            {"name": "_ga", "value": "x", "domain": ".wildberries.ru", "expires": NOW - HOUR},
+        ],
+        "origins": [],
+    }
+
+
+class FakePage:
+    def __init__(self) -> None:
+        self.visited: list[str] = []
+        self.timeouts: list[float] = []
+
+    async def goto(self, url: str, **kwargs) -> None:
+        self.visited.append(url)
+        self.timeouts.append(kwargs["timeout"])
+
+
+class FakeContext:
+    """Контекст, в котором скрипты кабинета уже выдали новый ключ."""
+
+    def __init__(self, state: dict) -> None:
+        self.state = with_jar(state, {"wbx-validation-key": "fresh"})
+        self.page = FakePage()
+
+    async def new_page(self) -> FakePage:
+        return self.page
+
+    async def cookies(self) -> list[dict]:
+        return self.state["cookies"]
+
+    async def storage_state(self) -> dict:
+        return self.state
+
+
+class FakePool:
+    def __init__(self) -> None:
+        self.states: list[dict] = []
+        self.timeouts: list[float] = []
+        self.full = False
+
+    @asynccontextmanager
+    async def context(self, tg_user_id: int, *, storage_state: dict | None = None):
+        assert storage_state is not None
+        self.states.append(storage_state)
+        ctx = FakeContext(storage_state)
+        yield ctx
+        self.timeouts.extend(ctx.page.timeouts)
+
+
+class FakeClients:
+    def __init__(self) -> None:
+        self.invalidated: list[int] = []
+
+    async def invalidate(self, tg_user_id: int) -> None:
+        self.invalidated.append(tg_user_id)
+
+
+def _refresher(accept: bool, monkeypatch) -> tuple[SessionRefresher, FakePool, FakeClients]:
+    async def validate(tg_user_id: int, jar: dict[str, str]) -> bool:
+        return accept
+
+    monkeypatch.setattr(refresh_module, "validate_session", validate)
+    pool, clients = FakePool(), FakeClients()
+    refresher = SessionRefresher(
+        pool=pool,
+        clients=clients,
+        status_cache=AuthStatusCache(ttl=60, stale_ttl=0),
+        lead=HOUR,
+    )
+    return refresher, pool, clients
+
+
+def test_expiry_uses_session_cookies_and_jar_overrides_values():
+    state = _state(NOW + 5 * HOUR)
+
+    assert session_expiry(state) == NOW + 5 * HOUR
+    assert session_expiry({"cookies": []}) is None
+    merged = with_jar(state, {"wbx-validation-key": "newer"})
+    assert merged["cookies"][0]["value"] == "newer"
+    assert merged["cookies"][0]["domain"] == ".wildberries.ru"
+    assert state["cookies"][0]["value"] == "old"
+
+
+@pytest.mark.asyncio
+async def test_refresh_restores_state_with_current_jar(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "sessions_dir", tmp_path)
+    BrowserStateStorage(1).save(_state(NOW + 5 * HOUR))
+    CookieStorage(1).save({"wbx-validation-key": "rotated"})
+    refresher, pool, clients = _refresher(True, monkeypatch)
+
+    assert await refresher.refresh(1) is True
+
+    assert pool.states[0]["cookies"][0]["value"] == "rotated"
+    saved = BrowserStateStorage(1).load()
+    assert saved is not None
+    assert saved["cookies"][0]["value"] == "fresh"
+    assert clients.invalidated == [1]
+    # без сохранённого состояния обновлять нечего
+    assert await refresher.refresh(2) is False
+    assert len(pool.states) == 1
+
+
+@pytest.mark.asyncio
+async def test_scheduler_picks_expiring_sessions_and_skips_failed(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "sessions_dir", tmp_path)
+    expiring = {1: NOW + HOUR / 2, 2: NOW + 10 * HOUR, 3: NOW + HOUR / 4, 4: NOW + HOUR / 8}
+    for tg_id, expires in expiring.items():
+        BrowserStateStorage(tg_id).save(_state(expires))
+        if tg_id != 3:  # noqa: PLR2004
+            CookieStorage(tg_id).save({"wbx-validation-key": "k"})
+    refresher, pool, _ = _refresher(False, monkeypatch)
+
+    assert refresher.due(NOW) == [4, 1]
+    assert await refresher.refresh_due(NOW) == 0
+    assert len(pool.states) == 2  # noqa: PLR2004
+    # неудачное обновление не повторяется, пока состояние не сменится
+    assert refresher.due(NOW) == []
+    BrowserStateStorage(1).save(_state(NOW + HOUR / 3))
+    assert refresher.due(NOW) == [1]
+
+
+@pytest.mark.asyncio
+async def test_interactive_refresh_is_short_and_skips_known_failed_state(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "sessions_dir", tmp_path)
+    BrowserStateStorage(1).save(_state(NOW + HOUR / 2))
+    CookieStorage(1).save({"wbx-validation-key": "k"})
+    refresher, pool, _ = _refresher(False, monkeypatch)
+
+    # неудача с сокращённым таймаутом ничего не доказывает: планировщик пробует снова
+    assert await refresher.refresh(1, page_timeout=2) is False
+    assert pool.timeouts == [2000]
+    assert refresher.due(NOW) == [1]
+
+    assert await refresher.refresh(1) is False
+    assert pool.timeouts == [2000, 30000]
+    # заведомо неудачное состояние не поднимаем в браузере перед окном входа
+    assert await refresher.refresh(1, page_timeout=2) is False
+    assert len(pool.states) == 2  # noqa: PLR2004
+
+
+@pytest.mark.asyncio
+async def test_interactive_refresh_does_not_queue_for_a_busy_pool(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "sessions_dir", tmp_path)
+    BrowserStateStorage(1).save(_state(NOW + 5 * HOUR))
+    CookieStorage(1).save({"wbx-validation-key": "k"})
+    refresher, pool, _ = _refresher(True, monkeypatch)
+    pool.full = True
+
+    # окно входа откроется сразу, а не после чужих обновлений
+    assert await refresher.refresh(1, page_timeout=2, wait=False) is False
+    assert pool.states == []
+    # фоновое обновление по-прежнему ждёт свой слот
+    assert await refresher.refresh(1) is True
+
+
+class FakeRepo:
+    def __init__(self) -> None:
+        self.cleared: list[int] = []
+
+    async def clear_auth(self, tg_id: int) -> None:
+        self.cleared.append(tg_id)
+
+
+@pytest.mark.asyncio
+async def test_logout_waits_for_running_refresh(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "sessions_dir", tmp_path)
+    BrowserStateStorage(1).save(_state(NOW + 5 * HOUR))
+    CookieStorage(1).save({"wbx-validation-key": "k"})
+    refresher, _, clients = _refresher(True, monkeypatch)
+    validating, release = asyncio.Event(), asyncio.Event()
+
+    async def slow_validate(tg_user_id: int, jar: dict[str, str]) -> bool:
+        validating.set()
+        await release.wait()
+        # как настоящая проверка: при успехе jar сохраняется
+        CookieStorage(tg_user_id).save(jar)
+        return True
+
+    monkeypatch.setattr(refresh_module, "validate_session", slow_validate)
+    service = AuthService(FakeRepo(), clients=clients, refresher=refresher)
+
+    refreshing = asyncio.create_task(refresher.refresh(1))
+    await validating.wait()
+    logout = asyncio.create_task(service.logout(1))
+    await asyncio.sleep(0.01)
+    assert not logout.done()
+    release.set()
+    await asyncio.gather(refreshing, logout)
+
+    # обновление закончилось раньше очистки и не вернуло удалённую сессию
+    assert not CookieStorage(1).exists()
+    assert BrowserStateStorage(1).load() is None
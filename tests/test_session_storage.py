@@ -1,3 +1,6 @@
+import os
+import threading
+
 from bot_wb.storage.session import CookieStorage
 
 
@@ -14,3 +17,61 @@ def test_cookie_storage_crud(tmp_path):
     assert storage.load() == {}
     assert not storage.cookies_path.exists()
     assert not (tmp_path / "123").exists()
+
+
+def test_cookie_storage_save_is_atomic(tmp_path):
+    storage = CookieStorage(321, root=tmp_path)
+    storage.save({"a": "1"})
+    storage.save({"a": "2"})
+
+    assert storage.load() == {"a": "2"}
+    assert [p.name for p in storage.dir.iterdir()] == ["cookies.json"]
+
+
+def _stalled_write(
+    monkeypatch,
+    storage: CookieStorage,
+    jar: dict,
+) -> tuple[threading.Thread, threading.Event]:
+    """Запускает запись в потоке, которая встаёт перед переименованием."""
+
+    release = threading.Event()
+    writing = threading.Event()
+    fsync = os.fsync
+    writer = threading.current_thread
+
+    def slow_fsync(fd: int) -> None:
+        fsync(fd)
+        if writer() is thread:
+            writing.set()
+            release.wait(5)
+
+    monkeypatch.setattr(os, "fsync", slow_fsync)
+    thread = threading.Thread(target=storage.save, args=(jar,))
+    thread.start()
+    writing.wait(5)
+    return thread, release
+
+
+def test_stale_write_does_not_replace_a_newer_one(tmp_path, monkeypatch):
+    storage = CookieStorage(7, root=tmp_path)
+    thread, release = _stalled_write(monkeypatch, storage, {"a": "old"})
+
+    storage.save({"a": "new"})
+    release.set()
+    thread.join()
+
+    assert storage.load() == {"a": "new"}
+    assert [p.name for p in storage.dir.iterdir()] == ["cookies.json"]
+
+
+def test_write_started_before_clear_is_dropped(tmp_path, monkeypatch):
+    storage = CookieStorage(8, root=tmp_path)
+    storage.save({"a": "1"})
+    thread, release = _stalled_write(monkeypatch, storage, {"a": "2"})
+
+    storage.clear()
+    release.set()
+    thread.join()
+
+    assert storage.exists() is False
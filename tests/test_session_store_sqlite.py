@@ -0,0 +1,43 @@
+import json
+
+from bot_wb.storage.session_db import SqliteCookieStorage, SqliteSessionStore
+from bot_wb.storage.session_migrate import import_directory_tree
+
+IMPORTED_USERS = 2
+
+
+def test_sqlite_cookie_storage_crud(tmp_path):
+    store = SqliteSessionStore(tmp_path / "sessions.db", cache_size=1)
+    try:
+        storage = SqliteCookieStorage(123, store)
+        assert storage.exists() is False
+        assert storage.load() == {}
+
+        storage.save({"wbx-validation-key": "token"})
+        SqliteCookieStorage(456, store).save({"other": "1"})  # вытесняет 123 из LRU
+        assert storage.exists() is True
+        assert storage.load() == {"wbx-validation-key": "token"}
+
+        storage.clear()
+        assert storage.exists() is False
+    finally:
+        store.close()
+
+
+def test_directory_tree_is_imported(tmp_path):
+    sessions_dir = tmp_path / "sessions"
+    for tg_id, jar in ((1, {"a": "1"}), (2, {"b": "2"})):
+        (sessions_dir / str(tg_id)).mkdir(parents=True)
+        (sessions_dir / str(tg_id) / "cookies.json").write_text(json.dumps(jar))
+    (sessions_dir / "junk").mkdir()
+    (sessions_dir / "junk" / "cookies.json").write_text("{}")
+
+    store = SqliteSessionStore(tmp_path / "sessions.db")
+    try:
+        count = import_directory_tree(sessions_dir, store, remove_files=True)
+        assert count == IMPORTED_USERS
+        assert store.load(1) == {"a": "1"}
+        assert store.load(2) == {"b": "2"}
+        assert not (sessions_dir / "1").exists()
+    finally:
+        store.close()
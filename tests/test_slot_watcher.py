@@ -0,0 +1,136 @@
+from datetime import date
+
+import httpx
+import pytest
+
+from bot_wb.services import slot_watcher as watcher_module
+from bot_wb.services.client_registry import WBClientRegistry
+from bot_wb.services.rate_limiter import RateLimiter
+from bot_wb.services.slot_watcher import Slot, SlotWatcher
+from bot_wb.services.wb_http_client import WBHttpClient
+from bot_wb.storage.db import ensure_db
+from bot_wb.storage.pool import ConnectionPool
+from bot_wb.storage.session import CookieStorage
+from bot_wb.storage.slots import SlotSubscription, SlotSubscriptionRepo
+
+WAREHOUSE_A = 117986
+WAREHOUSE_B = 507
+
+
+class FakeWB:
+    """Локальная заглушка ручки коэффициентов приёмки."""
+
+    def __init__(self) -> None:
+        self.requests: list[httpx.Request] = []
+        self.coefficients = {WAREHOUSE_A: 0, WAREHOUSE_B: -1}
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        ids = [int(x) for x in request.url.params["warehouseIDs"].split(",")]
+        return httpx.Response(
+            200,
+            json=[
+                {
+                    "date": "2030-05-02T00:00:00Z",
+                    "coefficient": self.coefficients[w],
+                    "warehouseID": w,
+                    "warehouseName": f"Склад {w}",
+                    "boxTypeID": 2,
+                    "boxTypeName": "Короба",
+                    "allowUnload": True,
+                }
+                for w in ids
+            ],
+        )
+
+
+def _registry(tmp_path, fake: FakeWB) -> WBClientRegistry:
+    limiter = RateLimiter(
+        global_rate=1000.0,
+        global_burst=100.0,
+        account_rate=1000.0,
+        account_burst=100.0,
+    )
+
+    def factory(tg_id: int, **kwargs) -> WBHttpClient:
+        return WBHttpClient(
+            tg_id,
+            storage=CookieStorage(tg_id, root=tmp_path),
+            limiter=limiter,
+            **kwargs,
+        )
+
+    return WBClientRegistry(factory=factory, transport=httpx.MockTransport(fake))
+
+
+def _sub(tg_user_id: int, warehouse_id: int, max_coefficient: int = 0) -> SlotSubscription:
+    return SlotSubscription(
+        tg_user_id=tg_user_id,
+        warehouse_id=warehouse_id,
+        date_from=date(2030, 5, 1),
+        date_to=date(2030, 5, 10),
+        max_coefficient=max_coefficient,
+    )
+
+
+@pytest.mark.asyncio
+async def test_subscriptions_share_polls_and_get_fanned_out(tmp_path, monkeypatch):
+    for tg_id in (1, 2, 3):
+        CookieStorage(tg_id, root=tmp_path).save({"wbx-validation-key": "k"})
+    monkeypatch.setattr(
+        watcher_module,
+        "open_cookie_storage",
+        lambda tg_id: CookieStorage(tg_id, root=tmp_path),
+    )
+    pool = ConnectionPool(tmp_path / "bot.db")
+    await pool.open()
+    fake = FakeWB()
+    registry = _registry(tmp_path, fake)
+    sent: list[tuple[int, list[Slot]]] = []
+
+    async def notify(sub: SlotSubscription, slots: list[Slot]) -> None:
+        sent.append((sub.tg_user_id, slots))
+
+    try:
+        await ensure_db(pool)
+        repo = SlotSubscriptionRepo(pool)
+        watcher = SlotWatcher(notify, repo=repo, clients=registry, batch_size=10)
+        await watcher.subscribe(_sub(1, WAREHOUSE_A))
+        await watcher.subscribe(_sub(2, WAREHOUSE_A, max_coefficient=1))
+        await watcher.subscribe(_sub(3, WAREHOUSE_B, max_coefficient=5))
+
+        assert await watcher.poll_once() == 2  # noqa: PLR2004
+        assert len(fake.requests) == 1
+        assert sorted(tg for tg, _ in sent) == [1, 2]
+        assert sent[0][1][0].date == date(2030, 5, 2)
+
+        # тот же слот повторно не шлём, новый на складе B — шлём
+        fake.coefficients[WAREHOUSE_B] = 3
+        assert await watcher.poll_once() == 1
+        assert sent[-1][0] == 3  # noqa: PLR2004
+
+        reloaded = SlotWatcher(notify, repo=repo, clients=registry)
+        assert await reloaded.load() == 3  # noqa: PLR2004
+        assert reloaded.warehouses == 2  # noqa: PLR2004
+        assert await reloaded.unsubscribe(3, 3)
+        assert reloaded.warehouses == 1
+    finally:
+        await registry.aclose()
+        await pool.close()
+
+
+def test_closed_and_malformed_slots_are_skipped():
+    slots = watcher_module.parse_slots(
+        [
+            {"date": "2030-05-02T00:00:00Z", "coefficient": -1, "warehouseID": 1},
+            {
+                "date": "2030-05-02T00:00:00Z",
+                "coefficient": 0,
+                "warehouseID": 1,
+                "allowUnload": False,
+            },
+            {"coefficient": 0, "warehouseID": 1},
+            {"date": "2030-05-03", "coefficient": 2, "warehouseID": 1},
+        ],
+    )
+    assert [(s.date, s.coefficient) for s in slots] == [(date(2030, 5, 3), 2)]
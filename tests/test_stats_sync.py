@@ -0,0 +1,169 @@
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+
+from bot_wb.services.client_registry import WBClientRegistry
+from bot_wb.services.rate_limiter import RateLimiter
+from bot_wb.services.stats_sync import StatsSync
+from bot_wb.services.wb_http_client import WBHttpClient
+from bot_wb.settings import settings
+from bot_wb.storage.db import ensure_db
+from bot_wb.storage.pool import ConnectionPool
+from bot_wb.storage.session import CookieStorage
+from bot_wb.storage.stats import StatsRepo
+
+START = datetime(2030, 5, 1)
+SALES = 25
+
+
+def _stamp(minutes: int) -> str:
+    return (START + timedelta(minutes=minutes)).strftime("%Y-%m-%dT%H:%M:%S")
+
+
+class FakeStatistics:
+    """Отдаёт записи с ``lastChangeDate >= dateFrom`` страницами по ``page`` строк."""
+
+    def __init__(self, page: int) -> None:
+        self.page = page
+        self.sales: list[dict] = []
+        self.stocks: list[dict] = []
+        self.served = 0
+        self.requests = 0
+
+    def add_sale(
+        self,
+        minute: int,
+        barcode: str,
+        *,
+        returned: bool = False,
+        srid: str | None = None,
+    ) -> None:
+        self.sales.append(
+            {
+                "date": _stamp(minute),
+                "lastChangeDate": _stamp(minute),
+                "warehouseName": "Коледино",
+                "barcode": barcode,
+                "nmId": 1,
+                "saleID": f"{'R' if returned else 'S'}{len(self.sales)}",
+                "srid": srid or f"srid-{len(self.sales)}",
+                "priceWithDisc": 100.0,
+            },
+        )
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        since = request.url.params["dateFrom"]
+        is_sales = request.url.path.endswith(settings.wb_sales_path)
+        source = self.sales if is_sales else self.stocks
+        page = sorted(
+            (r for r in source if r["lastChangeDate"] >= since),
+            key=lambda r: r["lastChangeDate"],
+        )[: self.page]
+        self.served += len(page)
+        return httpx.Response(200, json=page)
+
+
+def _registry(tmp_path, fake: FakeStatistics) -> WBClientRegistry:
+    limiter = RateLimiter(
+        global_rate=1000.0,
+        global_burst=100.0,
+        account_rate=1000.0,
+        account_burst=100.0,
+    )
+
+    def factory(tg_id: int, **kwargs) -> WBHttpClient:
+        return WBHttpClient(
+            tg_id,
+            storage=CookieStorage(tg_id, root=tmp_path),
+            limiter=limiter,
+            **kwargs,
+        )
+
+    return WBClientRegistry(factory=factory, transport=httpx.MockTransport(fake))
+
+
+@pytest.mark.asyncio
+async def test_later_syncs_fetch_only_changes(tmp_path):
+    pool = ConnectionPool(tmp_path / "bot.db")
+    await pool.open()
+    fake = FakeStatistics(page=10)
+    for minute in range(SALES):
+        fake.add_sale(minute, f"bc-{minute % 3}")
+    fake.stocks.append(
+        {
+            "lastChangeDate": _stamp(0),
+            "warehouseName": "Коледино",
+            "barcode": "bc-0",
+            "nmId": 1,
+            "quantity": 40,
+        },
+    )
+    registry = _registry(tmp_path, fake)
+    try:
+        await ensure_db(pool)
+        repo = StatsRepo(pool)
+        sync = StatsSync(repo, clients=registry, page_limit=10, initial_days=36500)
+
+        first = await sync.sync(1)
+        # остатки — одна страница; 25 продаж — страницы 10 + 10 + 7 (граница повторяется)
+        assert (first.stocks, first.sales) == (1, 27)
+        assert fake.requests == 4  # noqa: PLR2004
+        day = await repo.sales_between(1, START, START + timedelta(days=1))
+        assert len(day) == SALES
+
+        fake.served = 0
+        fake.add_sale(30, "bc-1")
+        fake.add_sale(31, "bc-1", returned=True)
+        second = await sync.sync(1)
+        # только изменения с курсора: две новые продажи и запись на границе курсора
+        assert (second.stocks, second.sales) == (1, 3)
+        assert fake.served == 4  # noqa: PLR2004
+
+        per_barcode = await repo.sales_between(
+            1,
+            START + timedelta(minutes=30),
+            START + timedelta(minutes=40),
+            barcode="bc-1",
+        )
+        assert [s.quantity for s in per_barcode] == [1, -1]
+        totals = dict(
+            ((b, w), units)
+            for b, w, units in await repo.units_sold(1, START, START + timedelta(days=1))
+        )
+        assert totals[("bc-0", "Коледино")] == 9  # noqa: PLR2004
+
+        matrix = await sync.stock_matrix(1, days=1, now=START + timedelta(days=1))
+        assert matrix.skus == ["bc-0", "bc-1", "bc-2"]
+        assert matrix.stock[0].tolist() == [40]
+        assert matrix.velocity[0].tolist() == [9]
+    finally:
+        await registry.aclose()
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_return_does_not_overwrite_its_sale(tmp_path):
+    pool = ConnectionPool(tmp_path / "bot.db")
+    await pool.open()
+    fake = FakeStatistics(page=10)
+    # WB отдаёт возврат с тем же srid, что и продажу, но saleID «R…» вместо «S…»
+    fake.add_sale(0, "bc-0", srid="order-1")
+    fake.add_sale(1, "bc-0", srid="order-1", returned=True)
+    registry = _registry(tmp_path, fake)
+    try:
+        await ensure_db(pool)
+        repo = StatsRepo(pool)
+        sync = StatsSync(repo, clients=registry, page_limit=10, initial_days=36500)
+
+        await sync.sync(1)
+
+        sales = await repo.sales_between(1, START, START + timedelta(days=1))
+        assert [s.quantity for s in sales] == [1, -1]
+        assert await repo.units_sold(1, START, START + timedelta(days=1)) == [
+            ("bc-0", "Коледино", 0),
+        ]
+    finally:
+        await registry.aclose()
+        await pool.close()
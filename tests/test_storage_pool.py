@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from bot_wb.storage.db import ensure_db
+from bot_wb.storage.pool import ConnectionPool
+from bot_wb.storage.repo import UserRepo
+
+ANCHOR_ID = 10
+
+
+@pytest.mark.asyncio
+async def test_pool_reuses_connections(tmp_path):
+    pool = ConnectionPool(tmp_path / "bot.db", readers=2)
+    await pool.open()
+    try:
+        await ensure_db(pool)
+        repo = UserRepo(pool)
+
+        await repo.set_anchor(1, ANCHOR_ID)
+        await repo.set_view(1, "home")
+
+        assert await repo.get_anchor(1) == ANCHOR_ID
+        assert await repo.get_view(1) == "home"
+        async with pool.reader() as db:
+            mode = await (await db.execute("PRAGMA journal_mode")).fetchone()
+        assert mode[0] == "wal"
+    finally:
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_bounds_readers(tmp_path):
+    pool = ConnectionPool(tmp_path / "bot.db", readers=1)
+    await pool.open()
+    try:
+        acquired = asyncio.Event()
+
+        async def second_reader() -> None:
+            async with pool.reader():
+                acquired.set()
+
+        async with pool.reader():
+            waiter = asyncio.create_task(second_reader())
+            await asyncio.sleep(0.05)
+            assert not acquired.is_set()
+        await asyncio.wait_for(waiter, 1)
+        assert acquired.is_set()
+    finally:
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_writer_rolls_back_on_error(tmp_path):
+    pool = ConnectionPool(tmp_path / "bot.db")
+    await pool.open()
+    try:
+        await ensure_db(pool)
+
+        async def failing_write() -> None:
+            async with pool.writer() as db:
+                await db.execute("INSERT INTO users (tg_user_id) VALUES (5)")
+                raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            await failing_write()
+        assert await UserRepo(pool).get(5) is None
+    finally:
+        await pool.close()
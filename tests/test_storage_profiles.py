@@ -0,0 +1,73 @@
+import json
+
+import aiosqlite
+import pytest
+
+from bot_wb.storage.db import ensure_db
+from bot_wb.storage.pool import ConnectionPool
+from bot_wb.storage.repo import UserRepo
+
+LEGACY_SQL = """
+CREATE TABLE users (
+    tg_user_id INTEGER PRIMARY KEY,
+    is_authorized INTEGER DEFAULT 0,
+    profiles_json TEXT,
+    active_profile_id TEXT
+);
+"""
+
+
+@pytest.mark.asyncio
+async def test_profiles_json_is_migrated(tmp_path):
+    db_path = tmp_path / "bot.db"
+    legacy = [{"id": "1", "name": "Org 1", "inn": "77"}, {"id": "2", "name": "Org 2"}]
+    async with aiosqlite.connect(db_path) as db:
+        await db.executescript(LEGACY_SQL)
+        await db.execute(
+            "INSERT INTO users (tg_user_id, profiles_json, active_profile_id) VALUES (?, ?, ?)",
+            (1, json.dumps(legacy), "2"),
+        )
+        await db.commit()
+
+    pool = ConnectionPool(db_path)
+    await pool.open()
+    try:
+        await ensure_db(pool)
+        repo = UserRepo(pool)
+        assert await repo.get_profiles(1) == [
+            {"id": "1", "name": "Org 1", "inn": "77"},
+            {"id": "2", "name": "Org 2", "inn": ""},
+        ]
+        assert await repo.get_active_profile_info(1) == {"id": "2", "name": "Org 2", "inn": ""}
+        assert (await repo.get(1) or {})["profiles_json"] is None
+    finally:
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_profile_partial_updates(tmp_path):
+    pool = ConnectionPool(tmp_path / "bot.db")
+    await pool.open()
+    try:
+        await _check_partial_updates(pool)
+    finally:
+        await pool.close()
+
+
+async def _check_partial_updates(pool: ConnectionPool) -> None:
+    await ensure_db(pool)
+    repo = UserRepo(pool)
+    await repo.set_profiles(1, [{"id": "a", "name": "A"}, {"id": "b", "name": "B"}])
+
+    await repo.update_profile(1, "b", inn="123")
+    await repo.update_profile(1, "c", name="C")
+    await repo.remove_profile(1, "a")
+
+    assert await repo.get_profiles(1) == [
+        {"id": "b", "name": "B", "inn": "123"},
+        {"id": "c", "name": "C", "inn": ""},
+    ]
+    assert await repo.get_active_profile_info(1) is None
+
+    await repo.clear_auth(1)
+    assert await repo.get_profiles(1) == []
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import threading
+
+import httpx
+import openpyxl
+import pytest
+
+from bot_wb.services import supply_import as import_module
+from bot_wb.services.rate_limiter import RateLimiter
+from bot_wb.services.supply_import import ImportReport, import_supplies, iter_rows, iter_table
+from bot_wb.services.wb_http_client import WBHttpClient
+from bot_wb.storage.session import CookieStorage
+
+
+class FakeWB:
+    def __init__(self) -> None:
+        self.supplies: list[dict] = []
+        self.active = 0
+        self.peak = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            self.active -= 1
+        body = json.loads(request.content)
+        if body["warehouseId"] == 13:  # noqa: PLR2004
+            return httpx.Response(400)
+        self.supplies.append(body)
+        return httpx.Response(200, json={"supplyId": f"WB-{len(self.supplies)}"})
+
+
+def _client(tmp_path, fake: FakeWB) -> WBHttpClient:
+    limiter = RateLimiter(
+        global_rate=1000.0,
+        global_burst=100.0,
+        account_rate=1000.0,
+        account_burst=100.0,
+    )
+    return WBHttpClient(
+        1,
+        storage=CookieStorage(1, root=tmp_path),
+        limiter=limiter,
+        transport=httpx.MockTransport(fake),
+    )
+
+
+@pytest.mark.asyncio
+async def test_csv_rows_are_batched_per_warehouse_with_bounded_concurrency(tmp_path):
+    lines = ["Баркод;Количество;Склад"]
+    lines += [f"{1000 + i // 4};2;{507 if i // 2 % 2 else 117986}" for i in range(120)]
+    lines += ["bad;0;507", ";1;507", "42;1;склад", "77;5;13"]
+    path = tmp_path / "supplies.csv"
+    path.write_text("\n".join(lines), encoding="utf-8")
+    fake = FakeWB()
+    client = _client(tmp_path, fake)
+    progress: list[int] = []
+
+    async def on_progress(report: ImportReport) -> None:
+        progress.append(report.rows)
+
+    try:
+        report = await import_supplies(
+            path,
+            client,
+            batch_size=4,
+            concurrency=2,
+            on_progress=on_progress,
+            progress_interval=0,
+        )
+    finally:
+        await client.aclose()
+
+    assert report.finished
+    assert report.rows == 124  # noqa: PLR2004
+    assert [e.line for e in report.errors] == [122, 123, 124]
+    # по 30 баркодов на склад → 7 пачек по 4 и одна из 2 на каждый из двух складов
+    assert len(report.supplies) == 16  # noqa: PLR2004
+    assert report.units_sent == 240  # noqa: PLR2004
+    assert report.batches_failed == 1
+    assert report.units_failed == 5  # noqa: PLR2004
+    assert fake.peak <= 2  # noqa: PLR2004
+    # повторы баркода в пачке склада суммируются
+    assert {g["quantity"] for s in fake.supplies for g in s["goods"]} == {4}
+    assert progress[-1] == 124  # noqa: PLR2004
+
+
+def test_xlsx_is_read_in_streaming_mode(tmp_path):
+    path = tmp_path / "supplies.xlsx"
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(["barcode", "quantity", "warehouse_id"])
+    sheet.append([None, None, None])
+    sheet.append([4601234567890, 3.0, 507])
+    sheet.append([4601234567891, 1.5, 507])
+    workbook.save(path)
+
+    rows = list(iter_rows(iter_table(path)))
+
+    assert rows[0].barcode == "4601234567890"
+    assert rows[0].quantity == 3  # noqa: PLR2004
+    assert rows[1].line == 4  # noqa: PLR2004
+
+
+def test_missing_columns_and_unknown_format_are_rejected(tmp_path):
+    path = tmp_path / "supplies.csv"
+    path.write_text("barcode,qty\n1,2\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="warehouse_id"):
+        list(iter_rows(iter_table(path)))
+    with pytest.raises(ValueError, match="формат"):
+        iter_table(tmp_path / "supplies.txt")
+
+
+@pytest.mark.asyncio
+async def test_cancel_while_parsing_waits_for_the_reader_thread(tmp_path, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    closed: list[bool] = []
+
+    def slow_table(path):
+        try:
+            yield ("barcode", "quantity", "warehouse_id")
+            started.set()
+            release.wait(5)
+            yield ("1", "1", "507")
+        finally:
+            closed.append(True)
+
+    monkeypatch.setattr(import_module, "iter_table", slow_table)
+    client = _client(tmp_path, FakeWB())
+    try:
+        task = asyncio.create_task(import_supplies(tmp_path / "s.csv", client))
+        await asyncio.to_thread(started.wait, 5)
+        task.cancel()
+        await asyncio.sleep(0.05)
+        # генератор ещё в потоке: закрывать его сейчас — «generator already executing»
+        assert not task.done()
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    finally:
+        release.set()
+        await client.aclose()
+    assert closed == [True]
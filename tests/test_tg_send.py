@@ -0,0 +1,96 @@
+import asyncio
+import time
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import AnswerCallbackQuery, EditMessageText, SendChatAction, SendMessage
+
+from bot_wb import metrics
+from bot_wb.middlewares.send_pacing import SendPacingMiddleware, paced_chat
+from bot_wb.services.tg_send import Lane, SendScheduler, send_lane
+
+
+def test_only_chat_messages_are_paced():
+    assert paced_chat(SendMessage(chat_id=5, text="hi")) == 5  # noqa: PLR2004
+    assert paced_chat(EditMessageText(chat_id=-7, message_id=1, text="hi")) == -7  # noqa: PLR2004
+    assert paced_chat(SendChatAction(chat_id=5, action="typing")) is None
+    assert paced_chat(AnswerCallbackQuery(callback_query_id="1")) is None
+
+
+@pytest.mark.asyncio
+async def test_chat_rate_does_not_delay_other_chats():
+    scheduler = SendScheduler(global_rate=1000, global_burst=1000, chat_rate=10, chat_burst=1)
+    done: dict[int, float] = {}
+    started = time.monotonic()
+
+    async def send(chat_id: int) -> None:
+        await scheduler.acquire(chat_id)
+        done[chat_id] = time.monotonic() - started
+
+    await asyncio.gather(*(send(1) for _ in range(3)), send(2))
+
+    assert done[1] >= 0.18  # noqa: PLR2004
+    assert done[2] < 0.05  # noqa: PLR2004
+
+
+@pytest.mark.asyncio
+async def test_interactive_lane_goes_before_alerts():
+    scheduler = SendScheduler(global_rate=20, global_burst=1, chat_rate=100, chat_burst=10)
+    order: list[str] = []
+
+    async def send(chat_id: int, lane: Lane, name: str) -> None:
+        with send_lane(lane):
+            await scheduler.acquire(chat_id)
+        order.append(name)
+
+    await scheduler.acquire(0)
+    alerts = [asyncio.create_task(send(i, Lane.ALERT, f"alert-{i}")) for i in (1, 2, 3)]
+    await asyncio.sleep(0)
+    reply = asyncio.create_task(send(4, Lane.INTERACTIVE, "reply"))
+    await asyncio.gather(*alerts, reply)
+
+    assert order[0] == "reply"
+    assert order[1:] == ["alert-1", "alert-2", "alert-3"]
+
+
+@pytest.mark.asyncio
+async def test_retry_after_pauses_chat_and_retries():
+    metrics.reset()
+    scheduler = SendScheduler(global_rate=1000, global_burst=1000, max_retry_after=5)
+    method = SendMessage(chat_id=1, text="hi")
+    calls = 0
+
+    async def call() -> str:
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=0)
+        return "sent"
+
+    assert await scheduler.send(1, call) == "sent"
+    assert calls == 2  # noqa: PLR2004
+    assert metrics.get("tg_send.retry_after") == 1
+    assert metrics.get("tg_send.sent") == 1
+
+    async def flood() -> str:
+        raise TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=30)
+
+    # паузу длиннее max_retry_after не ждём — ошибка уходит вызывающему,
+    # но чат остаётся на паузе и следующие отправки не продлевают бан
+    with pytest.raises(TelegramRetryAfter):
+        await scheduler.send(1, flood)
+    assert scheduler.paused_for(1) > 25  # noqa: PLR2004
+    assert scheduler.paused_for(2) == 0
+
+
+@pytest.mark.asyncio
+async def test_flood_outside_chat_pauses_all_sends():
+    scheduler = SendScheduler(global_rate=1000, global_burst=1000)
+    method = AnswerCallbackQuery(callback_query_id="1")
+
+    async def make_request(bot, method):
+        raise TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=10)
+
+    with pytest.raises(TelegramRetryAfter):
+        await SendPacingMiddleware(scheduler)(make_request, None, method)
+    assert scheduler.paused_for(5) > 5  # noqa: PLR2004
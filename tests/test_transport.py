@@ -0,0 +1,34 @@
+import httpx
+import pytest
+
+from bot_wb.services import transport
+from bot_wb.settings import settings
+
+
+def test_timeouts_depend_on_call_type(monkeypatch):
+    monkeypatch.setattr(settings, "wb_connect_timeout", 2.0)
+    monkeypatch.setattr(settings, "wb_probe_read_timeout", 7.0)
+    monkeypatch.setattr(settings, "wb_bulk_read_timeout", 90.0)
+
+    probe = transport.wb_timeout("probe")
+    bulk = transport.wb_timeout("bulk")
+    assert probe.connect == bulk.connect == 2.0  # noqa: PLR2004
+    assert probe.read == 7.0  # noqa: PLR2004
+    assert bulk.read == 90.0  # noqa: PLR2004
+
+
+@pytest.mark.asyncio
+async def test_http2_falls_back_without_h2(monkeypatch):
+    monkeypatch.setattr(settings, "wb_http2", True)
+    monkeypatch.setattr(transport, "http2_available", lambda: False)
+    created: list[dict] = []
+
+    class RecordingTransport(httpx.AsyncHTTPTransport):
+        def __init__(self, **kwargs):
+            created.append(kwargs)
+            super().__init__(**kwargs)
+
+    monkeypatch.setattr(transport.httpx, "AsyncHTTPTransport", RecordingTransport)
+    await transport.make_transport().aclose()
+    assert created[0]["http2"] is False
+    assert created[0]["limits"] == transport.wb_limits()
@@ -0,0 +1,86 @@
+import pytest
+
+from bot_wb.storage.db import ensure_db
+from bot_wb.storage.pool import ConnectionPool
+from bot_wb.storage.repo import UserRepo
+from bot_wb.storage.uow import unit_of_work
+
+ANCHOR_ID = 77
+
+
+class CountingRepo(UserRepo):
+    def __init__(self, pool: ConnectionPool) -> None:
+        super().__init__(pool)
+        self.batches: list[dict[int, dict]] = []
+
+    async def upsert_many(self, rows: dict[int, dict]):
+        self.batches.append(rows)
+        await super().upsert_many(rows)
+
+
+@pytest.mark.asyncio
+async def test_unit_of_work_coalesces_writes(tmp_path):
+    pool = ConnectionPool(tmp_path / "bot.db")
+    await pool.open()
+    try:
+        await ensure_db(pool)
+        repo = CountingRepo(pool)
+
+        async with unit_of_work() as uow:
+            await repo.set_anchor(1, ANCHOR_ID)
+            await repo.set_view(1, "profile")
+            await repo.set_active_profile(1, "a")
+            assert await repo.get_anchor(1) == ANCHOR_ID
+            # до конца апдейта в БД ничего не записано
+            assert await UserRepo(pool)._read(1) is None
+
+        assert repo.batches == [
+            {1: {"anchor_msg_id": ANCHOR_ID, "current_view": "profile", "active_profile_id": "a"}},
+        ]
+        assert (uow.writes, uow.rows, uow.merged) == (3, 1, 2)
+        assert await repo.get_view(1) == "profile"
+    finally:
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_unit_of_work_clear_auth_discards_pending(tmp_path):
+    pool = ConnectionPool(tmp_path / "bot.db")
+    await pool.open()
+    try:
+        await ensure_db(pool)
+        repo = UserRepo(pool)
+
+        async with unit_of_work():
+            await repo.set_authorized(1, True)
+            await repo.clear_auth(1)
+            await repo.set_view(1, "home")
+
+        assert await repo.is_authorized(1) is False
+        assert await repo.get_view(1) == "home"
+    finally:
+        await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_unit_of_work_merges_writes_of_different_repos(tmp_path):
+    pool = ConnectionPool(tmp_path / "bot.db")
+    await pool.open()
+    try:
+        await ensure_db(pool)
+        # у каждого модуля хендлеров свой репозиторий, строка users — одна
+        render_repo, profile_repo = CountingRepo(pool), CountingRepo(pool)
+
+        async with unit_of_work() as uow:
+            await render_repo.set_anchor(1, ANCHOR_ID)
+            assert await profile_repo.get_anchor(1) == ANCHOR_ID
+            await profile_repo.set_view(1, "profile")
+
+        assert render_repo.batches == [
+            {1: {"anchor_msg_id": ANCHOR_ID, "current_view": "profile"}},
+        ]
+        assert profile_repo.batches == []
+        assert (uow.writes, uow.rows, uow.merged) == (2, 1, 1)
+        assert await profile_repo.get_anchor(1) == ANCHOR_ID
+    finally:
+        await pool.close()
@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+from bot_wb.storage.cache import CachedUserRepo, UserStateCache
+
+ANCHOR_ID = 42
+
+
+class FakeBackend:
+    def __init__(self, rows: dict[int, dict] | None = None) -> None:
+        self.rows = rows or {}
+        self.reads = 0
+        self.batches: list[dict[int, dict]] = []
+        self.cleared: list[int] = []
+
+    async def get(self, tg_id: int) -> dict | None:
+        self.reads += 1
+        row = self.rows.get(tg_id)
+        return dict(row) if row else None
+
+    async def upsert_many(self, rows: dict[int, dict]) -> None:
+        self.batches.append({k: dict(v) for k, v in rows.items()})
+        for tg_id, fields in rows.items():
+            self.rows.setdefault(tg_id, {"tg_user_id": tg_id}).update(fields)
+
+    async def clear_auth(self, tg_id: int) -> None:
+        self.cleared.append(tg_id)
+
+
+@pytest.mark.asyncio
+async def test_reads_are_served_from_memory():
+    backend = FakeBackend({1: {"tg_user_id": 1, "anchor_msg_id": ANCHOR_ID}})
+    repo = CachedUserRepo(UserStateCache(backend))  # type: ignore[arg-type]
+
+    assert await repo.get_anchor(1) == ANCHOR_ID
+    assert await repo.get_view(1) is None
+    assert await repo.is_authorized(1) is False
+    assert backend.reads == 1
+
+
+@pytest.mark.asyncio
+async def test_writes_are_batched_into_one_flush():
+    backend = FakeBackend()
+    cache = UserStateCache(backend)  # type: ignore[arg-type]
+    repo = CachedUserRepo(cache)
+
+    await repo.set_anchor(1, ANCHOR_ID)
+    await repo.set_view(1, "home")
+    await repo.set_view(2, "profile")
+    assert backend.batches == []
+    assert await repo.get_view(1) == "home"
+
+    assert await cache.flush() == 2  # noqa: PLR2004
+    assert backend.batches == [
+        {1: {"anchor_msg_id": ANCHOR_ID, "current_view": "home"}, 2: {"current_view": "profile"}},
+    ]
+    assert await cache.flush() == 0
+
+
+@pytest.mark.asyncio
+async def test_evicted_dirty_entries_are_still_flushed():
+    backend = FakeBackend()
+    cache = UserStateCache(backend, max_entries=1)  # type: ignore[arg-type]
+
+    cache.update(1, current_view="home")
+    cache.update(2, current_view="profile")
+
+    assert len(cache) == 1
+    assert (await cache.get(1) or {})["current_view"] == "home"
+    await cache.flush()
+    assert backend.rows[1]["current_view"] == "home"
+    assert backend.rows[2]["current_view"] == "profile"
+
+
+@pytest.mark.asyncio
+async def test_clear_auth_drops_pending_auth_fields():
+    backend = FakeBackend({1: {"tg_user_id": 1, "is_authorized": 0}})
+    cache = UserStateCache(backend)  # type: ignore[arg-type]
+    repo = CachedUserRepo(cache)
+
+    await repo.set_authorized(1, True)
+    await repo.set_anchor(1, ANCHOR_ID)
+    await repo.clear_auth(1)
+    await cache.flush()
+
+    assert backend.cleared == [1]
+    assert await repo.is_authorized(1) is False
+    assert backend.batches == [{1: {"anchor_msg_id": ANCHOR_ID}}]
+
+
+class SnapshotBackend(FakeBackend):
+    """Чтение видит строку на момент начала запроса и отвечает по команде теста."""
+
+    def __init__(self, rows: dict[int, dict]) -> None:
+        super().__init__(rows)
+        self.release = asyncio.Event()
+
+    async def get(self, tg_id: int) -> dict | None:
+        row = await super().get(tg_id)
+        if self.reads == 1:
+            await self.release.wait()
+        return row
+
+    async def clear_auth(self, tg_id: int) -> None:
+        await super().clear_auth(tg_id)
+        self.rows[tg_id]["is_authorized"] = 0
+
+
+@pytest.mark.asyncio
+async def test_write_flushed_during_a_read_is_not_lost():
+    backend = SnapshotBackend({1: {"tg_user_id": 1, "current_view": "old"}})
+    cache = UserStateCache(backend)  # type: ignore[arg-type]
+
+    reading = asyncio.create_task(cache.get(1))
+    await asyncio.sleep(0)
+    cache.update(1, current_view="home")
+    await cache.flush()
+    backend.release.set()
+
+    assert (await reading or {})["current_view"] == "home"
+    assert (await cache.get(1) or {})["current_view"] == "home"
+
+
+@pytest.mark.asyncio
+async def test_clear_auth_during_a_read_is_not_undone():
+    backend = SnapshotBackend({1: {"tg_user_id": 1, "is_authorized": 1}})
+    cache = UserStateCache(backend)  # type: ignore[arg-type]
+
+    reading = asyncio.create_task(cache.get(1))
+    await asyncio.sleep(0)
+    await cache.clear_auth(1)
+    backend.release.set()
+
+    assert (await reading or {})["is_authorized"] == 0
+    assert (await cache.get(1) or {})["is_authorized"] == 0
+    assert backend.reads == 2  # noqa: PLR2004 - устаревшая строка перечитана